@@ -3,4 +3,6 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logging.getLogger(__name__).info("logging initialized")
 
-import src.env as _  # noqa
+from src import env, log_config  # noqa: E402
+
+log_config.configure(env.LOG_MODE, env.LOG_PAYLOAD_MAX_CHARS, env.LOG_CHUNK_SAMPLE_RATE)
@@ -7,22 +7,32 @@ Much of this file is adapted from LangChain docs.
 """
 
 import logging
-from typing import Any, AsyncIterator, TypeAlias
+from typing import Any, AsyncIterator, Optional, TypeAlias
 
 from langchain.agents import create_agent
 from langchain.messages import AnyMessage, HumanMessage
+from langchain_core.language_models import BaseChatModel
 from langchain_core.runnables import Runnable, RunnableConfig
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langgraph.checkpoint.memory import InMemorySaver
 from langsmith import utils
 
+from src import env
+from src.agent import speculation
 from src.agent.cache import IDStrippingCache
+from src.agent.rate_limiter import gemini_rate_limiter
 from src.env import AGENT_CACHE_DB_PATH, GEMINI_API_KEY
-from src.paprika.vectorstore import connect
+from src.log_config import CHUNK_LOGGER, truncated
+from src.paprika import tenants
+from src.paprika.live_index import IndexWatcher, LiveStore
+from src.paprika.tenants import TenantStores
+from src.paprika.vectorstore import VectorStore, connect
 from src.tools.mealdb_wrapper import MealDBWrapper
 from src.tools.vector_store import VectorStoreTools
+from src.tracing import TracingMiddleware
 
 logger = logging.getLogger(__name__)
+chunk_logger = logging.getLogger(CHUNK_LOGGER)
 
 Agent: TypeAlias = Runnable[Any, Any]
 SEARCH_AGENT_SYSTEM_PROMPT = """You are "Cheffy", an AI cooking assistant that helps users find recipes from 
@@ -69,59 +79,123 @@ def setup_model() -> ChatGoogleGenerativeAI:
     max_tokens=1000,
     timeout=30,
     cache=cache,
+    # shared by all sessions, waiting for a token does not count to the timeout
+    rate_limiter=gemini_rate_limiter(),
   )
 
 
-def setup_agent() -> Agent:
+def setup_agent(model: Optional[BaseChatModel] = None) -> Agent:
   """Creates and configures a LangChain agent using Google Gemini model
   and all required tools.
 
+  Args:
+      model: chat model to use instead of Gemini (i.e. a simulated one)
+
   Returns:
       the agent as a Runnable
   """
-  vectorstore = connect()
-  vectorstore_tools = VectorStoreTools(vectorstore=vectorstore, k=5)
+  # with several tenants, each session searches its own cookbook
+  vectorstore: VectorStore | TenantStores | LiveStore
+  if env.MULTI_TENANT:
+    vectorstore = TenantStores(env.TENANT_CACHE_SIZE)
+  elif env.INDEX_RELOAD_INTERVAL_S > 0:
+    # rebuilt versions are swapped in between searches
+    vectorstore = LiveStore(connect())
+    IndexWatcher(vectorstore).start(env.INDEX_RELOAD_INTERVAL_S)
+  else:
+    vectorstore = connect()
+  vectorstore_tools = VectorStoreTools(
+    vectorstore=vectorstore,
+    k=5,
+    score_threshold=env.RETRIEVAL_SCORE_THRESHOLD,
+    max_chars=env.RETRIEVAL_DOC_MAX_CHARS,
+  )
+  recipe_retriever = vectorstore_tools.recipe_retriever
   mealdb_tool = MealDBWrapper()
 
-  return create_agent(
-    model=setup_model(),
+  agent = create_agent(
+    model=model or setup_model(),
     tools=[
-      vectorstore_tools.recipe_retriever,
+      recipe_retriever,
       mealdb_tool.search_meal_by_name,
       mealdb_tool.filter_recipes,
       mealdb_tool.list_filter_options,
     ],
-    debug=True,
+    # langgraph's debug output prints every step of the graph
+    debug=env.LOG_MODE == "debug",
     system_prompt=SEARCH_AGENT_SYSTEM_PROMPT,
     checkpointer=InMemorySaver(),
+    middleware=[TracingMiddleware()] if env.LATENCY_TRACING else [],
   )
 
+  # speculative searches run outside of any turn, so they never claim
+  # themselves and go straight to the vector store
+  assert recipe_retriever.func is not None
+  speculation.register(agent, recipe_retriever.func)
+  return agent
+
 
 # has type ignore since langchain type is generic!
-async def do_inference(agent: Agent, prompt: str) -> AsyncIterator[AnyMessage]:
+async def do_inference(
+  agent: Agent,
+  prompt: str,
+  tenant: Optional[str] = None,
+  thread_id: str | int = 1,
+) -> AsyncIterator[AnyMessage]:
   """Given some agent and prompt, perform inference and log/yield the chunks
   as they come in.
 
   Args:
       agent (Runnable): the agent to use for inference
       prompt (str): the prompt to give to the agent
+      tenant (str): whose cookbook the retriever searches (default cookbook if
+        None, only used by multi-tenant agents)
+      thread_id (str | int): conversation the prompt belongs to, whose earlier
+        turns the agent remembers
 
   Yields:
       dict[str, AnyMessage]: the chunks as they come in
   """
-  config = RunnableConfig({"configurable": {"thread_id": 1}})
+  config = RunnableConfig({"configurable": {"thread_id": thread_id}})
   message = HumanMessage(content=prompt)
+  tenants.current.set(tenant)
+
+  # start searching for the prompt while the model plans its tool calls
+  turn_speculation = speculation.speculate(agent, prompt)
+  speculation.current.set(turn_speculation)
+  try:
+    async for response in _stream(agent, message, config):
+      yield response
+  finally:
+    speculation.current.set(None)
+    tenants.current.set(None)
+    if turn_speculation is not None:
+      turn_speculation.finish()
+
+
+async def _stream(
+  agent: Agent, user_message: HumanMessage, config: RunnableConfig
+) -> AsyncIterator[AnyMessage]:
+  """Streams the messages the agent makes in response to a user message.
 
+  Args:
+      agent: the agent to use for inference
+      user_message: the user message
+      config: config of the run
+
+  Yields:
+      the messages as they come in
+  """
   async for chunk in agent.astream(
     {
       "messages": [
-        message,
+        user_message,
       ]
     },
     config,
     stream_mode="updates",
   ):
-    logger.info(f"\nReceived chunk: {chunk} ({type(chunk)}) \n")
+    chunk_logger.info("received chunk: %s", truncated(chunk))
     assert isinstance(chunk, dict), "bad chunk format"
 
     # now we need to determine which key has the messages
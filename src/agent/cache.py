@@ -1,20 +1,44 @@
 import json
+import sqlite3
 from typing import Optional, Sequence
 
-from langchain_community.cache import SQLiteCache
+from langchain_community.cache import SQLAlchemyCache, SQLiteCache
 from langchain_core.outputs import Generation
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import ConnectionPoolEntry
+
+from src import tracing
+from src.executors import io_pool, run_in
+
+SQLITE_BUSY_TIMEOUT_S = 30
+"""How long a writer waits for another process holding the DB lock."""
+
+
+def _enable_wal(dbapi_connection: sqlite3.Connection, _: ConnectionPoolEntry) -> None:
+  """Puts the DB in write-ahead-log mode so that several app worker
+  processes can share the cache (readers never block the writer).
+
+  Args:
+      dbapi_connection: the new sqlite connection
+  """
+  dbapi_connection.execute("PRAGMA journal_mode=WAL")
 
 
 class IDStrippingCache(SQLiteCache):
   """A cache that ignores message IDs when caching into the DB."""
 
   def __init__(self, db_path: str) -> None:
-    """Creates a new cache instance, passing args to `SQLiteCache`.
+    """Creates a new cache instance, configuring the `SQLiteCache` engine
+    to be safe to share between processes.
 
     Args:
         db_path: path to the SQLite database file
     """
-    super().__init__(db_path)
+    engine = create_engine(
+      f"sqlite:///{db_path}", connect_args={"timeout": SQLITE_BUSY_TIMEOUT_S}
+    )
+    event.listen(engine, "connect", _enable_wal)
+    SQLAlchemyCache.__init__(self, engine)
 
   def remove_id_from_prompt(self, prompt: str) -> str:
     """Remove the UUID from the prompt string which
@@ -34,10 +58,11 @@ class IDStrippingCache(SQLiteCache):
 
   def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
     """Look up from the cache using prompt and llm_string."""
-    return super().lookup(
-      prompt=self.remove_id_from_prompt(prompt),
-      llm_string=llm_string,
-    )
+    with tracing.span("llm_cache_lookup"):
+      return super().lookup(
+        prompt=self.remove_id_from_prompt(prompt),
+        llm_string=llm_string,
+      )
 
   def update(
     self, prompt: str, llm_string: str, return_val: Sequence[Generation]
@@ -48,3 +73,15 @@ class IDStrippingCache(SQLiteCache):
       llm_string=llm_string,
       return_val=return_val,
     )
+
+  async def alookup(
+    self, prompt: str, llm_string: str
+  ) -> Optional[Sequence[Generation]]:
+    """Look up from the cache without blocking the event loop."""
+    return await run_in(io_pool(), self.lookup, prompt, llm_string)
+
+  async def aupdate(
+    self, prompt: str, llm_string: str, return_val: Sequence[Generation]
+  ) -> None:
+    """Update the cache without blocking the event loop."""
+    await run_in(io_pool(), self.update, prompt, llm_string, return_val)
@@ -0,0 +1,46 @@
+"""Process wide rate limiting of the Gemini API."""
+
+import time
+from functools import lru_cache
+from typing import Optional
+
+from langchain_core.rate_limiters import InMemoryRateLimiter
+
+from src import env, metrics
+
+
+class MeteredRateLimiter(InMemoryRateLimiter):
+  """Token bucket rate limiter which records how long callers wait for a
+  token.
+  """
+
+  def acquire(self, *, blocking: bool = True) -> bool:
+    """See `InMemoryRateLimiter.acquire`."""
+    start = time.perf_counter()
+    acquired = super().acquire(blocking=blocking)
+    metrics.histogram("gemini_rate_limit_wait_s").observe(time.perf_counter() - start)
+    return acquired
+
+  async def aacquire(self, *, blocking: bool = True) -> bool:
+    """See `InMemoryRateLimiter.aacquire`."""
+    start = time.perf_counter()
+    acquired = await super().aacquire(blocking=blocking)
+    metrics.histogram("gemini_rate_limit_wait_s").observe(time.perf_counter() - start)
+    return acquired
+
+
+@lru_cache(maxsize=1)
+def gemini_rate_limiter() -> Optional[MeteredRateLimiter]:
+  """The rate limiter shared by every model (and so every chat session) of
+  the process.
+
+  Returns:
+      the rate limiter, or None if `GEMINI_REQUESTS_PER_MINUTE` is 0
+  """
+  if env.GEMINI_REQUESTS_PER_MINUTE <= 0:
+    return None
+  return MeteredRateLimiter(
+    requests_per_second=env.GEMINI_REQUESTS_PER_MINUTE / 60,
+    check_every_n_seconds=0.1,
+    max_bucket_size=env.GEMINI_RATE_LIMIT_BURST,
+  )
@@ -0,0 +1,183 @@
+"""Speculative prefetching of recipe retrieval.
+
+The model nearly always calls `recipe_retriever` with (part of) the user's
+prompt, so when a turn starts we already embed and search the prompt in the
+background, in parallel with the first model call. If the model then calls
+the retriever with a query close enough to the prompt, the tool returns the
+prefetched result instead of searching, hiding the retrieval latency.
+
+The speculation of a turn is passed to the tool through a context variable,
+which the agent's tasks and the tool pools inherit.
+"""
+
+import contextvars
+import logging
+import re
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from contextvars import ContextVar
+from typing import Any, Callable, Optional
+
+from langchain_core.runnables import Runnable
+
+from src import env, metrics
+from src.executors import retrieval_pool
+
+logger = logging.getLogger(__name__)
+
+_searches: dict[int, Callable[[str], str]] = {}
+"""id of agent -> retrieval function to speculate with (runnables are not
+necessarily hashable)"""
+
+
+def register(agent: Runnable[Any, Any], search: Callable[[str], str]) -> None:
+  """Enables speculative retrieval for an agent.
+
+  Args:
+      agent: the agent
+      search: the retrieval function of its retriever tool
+  """
+  _searches[id(agent)] = search
+  weakref.finalize(agent, _searches.pop, id(agent), None)
+
+
+FILLER_WORDS = frozenset(
+  "a about an and are can could do find for get give how i idea ideas is like "
+  "make me my need of please recipe recipes show some the to want what with "
+  "would you".split()
+)
+"""Words of a request which say nothing about the recipes it is after"""
+
+
+def _words(text: str) -> set[str]:
+  """Lower cased words of a text, without filler words."""
+  return set(re.findall(r"\w+", text.lower())) - FILLER_WORDS
+
+
+def overlap(query: str, prompt: str) -> float:
+  """How close a query is to the prompt: the share of words they have in
+  common, relative to the larger of the two. So a query must cover most of
+  the prompt (besides filler words, as the model tends to drop them) as well
+  as be contained in it, a query on part of the prompt searches by itself.
+
+  Args:
+      query: the tool call query
+      prompt: the user prompt
+
+  Returns:
+      share of words between 0 and 1
+  """
+  query_words = _words(query)
+  prompt_words = _words(prompt)
+  if not query_words or not prompt_words:
+    return 0.0
+  return len(query_words & prompt_words) / max(len(query_words), len(prompt_words))
+
+
+class Speculation:
+  """Retrieval started for the prompt of the current turn."""
+
+  def __init__(self, prompt: str, search: Callable[[str], str]) -> None:
+    """Starts searching for the prompt in the background.
+
+    Args:
+        prompt: the user prompt
+        search: the retrieval function
+    """
+    self.prompt = prompt
+    self.started = time.perf_counter()
+    self.hit = False
+    """whether the prefetched result was used"""
+    self._claimed = False
+    self._lock = threading.Lock()
+
+    def run() -> tuple[str, float]:
+      start = time.perf_counter()
+      result = search(prompt)
+      return result, time.perf_counter() - start
+
+    # in the context of the turn, i.e. to search the cookbook of its tenant
+    self.future: Future[tuple[str, float]] = retrieval_pool().submit(
+      contextvars.copy_context().run, run
+    )
+    metrics.counter("speculative_retrieval_started").inc()
+
+  def claim(self, query: str) -> Optional[str]:
+    """Gets the prefetched result if the query is close enough to the prompt
+    (only once, later calls search normally).
+
+    Args:
+        query: the query the model called the retriever with
+
+    Returns:
+        the prefetched result, or None if it does not apply
+    """
+    with self._lock:
+      if (
+        self._claimed or overlap(query, self.prompt) < env.SPECULATIVE_RETRIEVAL_OVERLAP
+      ):
+        return None
+      self._claimed = True
+
+    claimed = time.perf_counter()
+    try:
+      result, duration = self.future.result()
+    except Exception as e:  # search normally instead
+      logger.warning(f"speculative retrieval failed: {e}")
+      return None
+    self.hit = True
+
+    # if the search is still running, the time it already ran is saved
+    saved = min(duration, claimed - self.started)
+    metrics.counter("speculative_retrieval_hits").inc()
+    metrics.histogram("speculative_retrieval_saved_s").observe(saved)
+    started = metrics.counter("speculative_retrieval_started").value
+    hits = metrics.counter("speculative_retrieval_hits").value
+    logger.info(
+      f"speculative retrieval hit for {query!r}, saved {saved * 1000:.0f}ms "
+      f"(hit rate {hits / max(started, 1):.0%})"
+    )
+    return result
+
+  def finish(self) -> None:
+    """Ends the turn, cancelling the search if it was never used."""
+    if not self.hit:
+      self.future.cancel()
+      logger.info(f"speculative retrieval miss for {self.prompt!r}")
+
+
+current: ContextVar[Optional[Speculation]] = ContextVar(
+  "speculative_retrieval", default=None
+)
+"""Speculation of the current turn, if any"""
+
+
+def speculate(agent: Runnable[Any, Any], prompt: str) -> Optional[Speculation]:
+  """Starts speculative retrieval for a turn if enabled for the agent.
+
+  Args:
+      agent: the agent running the turn
+      prompt: the user prompt
+
+  Returns:
+      the started speculation, or None if disabled
+  """
+  search = _searches.get(id(agent))
+  if not env.SPECULATIVE_RETRIEVAL or search is None:
+    return None
+  return Speculation(prompt, search)
+
+
+def claim(query: str) -> Optional[str]:
+  """Gets the prefetched result of the current turn for a retriever query.
+
+  Args:
+      query: the query the model called the retriever with
+
+  Returns:
+      the prefetched result, or None if there is none or it does not apply
+  """
+  speculation = current.get()
+  return speculation.claim(query) if speculation is not None else None
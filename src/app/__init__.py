@@ -1,18 +1,66 @@
 import logging
+import uuid
+from contextlib import aclosing
 from functools import partial
-from typing import AsyncIterator
+from typing import AsyncIterator, Optional
 
 import gradio as gr
+from gradio.events import api
 from gradio.routes import App as App
+from langchain_core.messages import AnyMessage
 
+from src import env, metrics, tracing
 from src.agent.agent import Agent, do_inference, setup_agent
+from src.app.admission import AdmissionQueue, QueueFullError
 from src.app.langchain_adapter import render
+from src.executors import watch_event_loop
 
 logger = logging.getLogger(__name__)
 
 
-async def handle_input(
-  agent: Agent, input_text: str, messages: list[gr.ChatMessage]
+async def render_turn(
+  chunks: AsyncIterator[AnyMessage], mode: Optional[str] = None
+) -> AsyncIterator[list[gr.ChatMessage]]:
+  """Renders the messages of the agent as the chat messages of the turn.
+
+  Every update holds all the chat messages of the turn so far (as the chat
+  interface expects), and Gradio re-processes the whole conversation for each
+  one, so the fewer the updates the cheaper a turn. In `per_message` mode an
+  update is made after each rendered message, in `batched` mode once per
+  agent message, i.e. all the tool calls of a model response in one update.
+  Either way, messages are only appended, so that the diffs Gradio streams
+  to the browser only carry the new ones.
+
+  Args:
+      chunks: the messages of the agent, see `do_inference`
+      mode: `per_message` or `batched` (default `APP_RENDER_MODE`)
+
+  Yields:
+      the chat messages of the turn so far
+  """
+  mode = mode or env.APP_RENDER_MODE
+  new_messages: list[gr.ChatMessage] = []
+  async for chunk in chunks:
+    with tracing.span("render", message=type(chunk).__name__):
+      rendered = list(render(chunk))
+    if mode == "batched":
+      if rendered:
+        new_messages.extend(rendered)
+        yield new_messages
+      continue
+    for chat_message in rendered:
+      new_messages.append(chat_message)
+      yield new_messages
+
+
+async def handle_input(  # noqa: PLR0913
+  agent: Agent,
+  input_text: str,
+  messages: list[gr.ChatMessage],
+  request: Optional[gr.Request] = None,
+  *,
+  admission: Optional[AdmissionQueue] = None,
+  thread_id: Optional[str] = None,
 ) -> AsyncIterator[list[gr.ChatMessage]]:
   """Gradio chat callback to handle user input + agent response.
 
@@ -20,30 +68,73 @@ async def handle_input(
       agent: the agent to use for inference
       input_text: prompt from the user
       messages: previous chat messages
+      request: the session's request (injected by gradio), whose `tenant`
+        query parameter selects the cookbook to search (i.e. `/?tenant=alice`)
+        and whose session (and tenant) the agent remembers the conversation of
+      admission: queue limiting concurrent turns (default unlimited)
+      thread_id: conversation the turn continues (default the session's)
 
   Yields:
       agent generated messages (yields as they are made)
+
+  Raises:
+      gr.Error: if the app is too busy to queue the turn
   """
-  new_messages = []
-  # approach inspired by docs:
-  # https://www.gradio.app/guides/agents-and-tool-usage#a-real-example-using-langchain-agents
-  # messages.append(gr.ChatMessage(content=input_text, role="user"))
-  async for chunk in do_inference(agent, input_text):
-    for chat_message in render(chunk):
-      new_messages.append(chat_message)
+  watch_event_loop()
+  tracing.new_turn()
+  if admission is not None:
+    try:
+      async with aclosing(admission.admit()) as positions:
+        async for position in positions:
+          yield [
+            gr.ChatMessage(
+              role="assistant",
+              content=f"Cheffy is busy, you are #{position} in line...",
+              metadata={"title": "Waiting in queue"},
+            )
+          ]
+    except QueueFullError as e:
+      err_msg = "Cheffy is too busy right now, please try again later."
+      raise gr.Error(err_msg) from e
+
+  try:
+    # approach inspired by docs:
+    # https://www.gradio.app/guides/agents-and-tool-usage#a-real-example-using-langchain-agents
+    # messages.append(gr.ChatMessage(content=input_text, role="user"))
+    tenant = request.query_params.get("tenant") if request is not None else None
+    # one conversation per browser session and tenant (so a conversation never
+    # mixes cookbooks), a turn without a session remembers none
+    if thread_id is None:
+      thread_id = (
+        f"{tenant or ''}/{request.session_hash}"
+        if request is not None and request.session_hash
+        else uuid.uuid4().hex
+      )
+    chunks = do_inference(agent, input_text, tenant, thread_id)
+    async for new_messages in render_turn(chunks):
       yield new_messages
+  finally:
+    if admission is not None:
+      admission.release()
 
 
-def launch() -> tuple[App, str, str]:
+def launch(
+  host: Optional[str] = None, port: Optional[int] = None
+) -> tuple[App, str, str]:
   """Bootstraps the agentic search chat app.
 
+  Args:
+      host: interface to bind to (default gradio's, i.e. `GRADIO_SERVER_NAME`)
+      port: port to bind to (default gradio's, i.e. `GRADIO_SERVER_PORT`)
+
   Returns:
       tuple of [gradio app, host, port]
   """
   logger.info("Starting app...")
 
+  admission = AdmissionQueue(env.APP_CONCURRENCY_LIMIT, env.APP_MAX_QUEUE_SIZE)
   demo = gr.ChatInterface(
-    partial(handle_input, setup_agent()),
+    partial(handle_input, setup_agent(), admission=admission),
     type="messages",
     flagging_mode="never",
     title="Agentic Search Chat App: the Cooking Guru",
@@ -55,6 +146,13 @@ def launch() -> tuple[App, str, str]:
       ["Give me a recipe for vegan lasagna.", ""],
     ],
     stop_btn=False,
+    # turns are limited (and queued with feedback) by the admission queue
+    concurrency_limit=None,
   )
+  with demo:
+    # JSON summary of the app metrics, i.e. queue depth, wait times and spans
+    api(metrics.snapshot, api_name="metrics")
+  if env.METRICS_DUMP_INTERVAL_S > 0:
+    tracing.start_metrics_dump(env.METRICS_DUMP_INTERVAL_S)
 
-  return demo.launch()
+  return demo.launch(server_name=host, server_port=port)
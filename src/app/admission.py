@@ -0,0 +1,89 @@
+"""Admission control for chat turns.
+
+Limits how many agent turns run at once and queues the rest in a bounded,
+first-come first-served line, so bursts of users wait (and are told their
+position) instead of all hitting the model at once and timing out.
+"""
+
+import asyncio
+import time
+from typing import AsyncGenerator
+
+from src import metrics
+
+
+class QueueFullError(RuntimeError):
+  """Raised when a turn arrives while the waiting line is full."""
+
+
+class AdmissionQueue:
+  """Bounded FIFO line in front of a fixed number of turn slots.
+
+  Must be used from a single event loop (the app's).
+  """
+
+  def __init__(self, concurrency: int, max_size: int) -> None:
+    """Creates the queue.
+
+    Args:
+        concurrency: number of turns which may run at once
+        max_size: number of turns which may wait for a slot
+    """
+    self.concurrency = concurrency
+    self.max_size = max_size
+    self.running = 0
+    self.waiting: list[object] = []
+    # replaced on every state change, waiters hold on to the one they saw
+    self._changed = asyncio.Event()
+
+  def _notify(self) -> None:
+    """Wakes up the waiters so they re-check their position."""
+    metrics.gauge("app_queue_depth").set(len(self.waiting))
+    metrics.gauge("app_running_turns").set(self.running)
+    self._changed.set()
+    self._changed = asyncio.Event()
+
+  async def admit(self) -> AsyncGenerator[int, None]:
+    """Waits for a free slot, yielding the (1-based) position in line every
+    time it changes. The slot is held once the iteration ends and must be
+    given back with `release`.
+
+    Yields:
+        position in the waiting line
+
+    Raises:
+        QueueFullError: if the waiting line is full
+    """
+    start = time.perf_counter()
+    if self.running < self.concurrency and not self.waiting:
+      self.running += 1
+      self._notify()
+      metrics.histogram("app_queue_wait_s").observe(0.0)
+      return
+    if len(self.waiting) >= self.max_size:
+      metrics.counter("app_queue_rejected").inc()
+      err_msg = f"too many requests waiting ({len(self.waiting)})"
+      raise QueueFullError(err_msg)
+
+    ticket = object()
+    self.waiting.append(ticket)
+    self._notify()
+    admitted = False
+    try:
+      while not (self.waiting[0] is ticket and self.running < self.concurrency):
+        changed = self._changed
+        yield self.waiting.index(ticket) + 1
+        await changed.wait()
+      self.waiting.pop(0)
+      self.running += 1
+      admitted = True
+    finally:
+      if not admitted:  # cancelled while waiting
+        self.waiting.remove(ticket)
+      self._notify()
+    metrics.histogram("app_queue_wait_s").observe(time.perf_counter() - start)
+
+  def release(self) -> None:
+    """Gives back a slot obtained through `admit`."""
+    self.running -= 1
+    self._notify()
@@ -2,8 +2,11 @@ import logging
 from typing import Iterator
 
 import gradio as gr
+from gradio.components.chatbot import MetadataDict
 from langchain_core.messages import AIMessage, AnyMessage, ToolMessage
 
+from src import env
+
 logger = logging.getLogger(__name__)
 
 
@@ -47,11 +50,18 @@ def _render_tool_message(message: ToolMessage) -> Iterator[gr.ChatMessage]:
       iterator of gradio chat messages
   """
   assert type(message.content) is str, f"str, got {type(message.content)}"
-  yield gr.ChatMessage(
-    role="assistant",
-    content=f"{message.content}",
-    metadata={"title": f"Done with tool '{message.name}' (#{message.tool_call_id})"},
-  )
+  metadata: MetadataDict = {
+    "title": f"Done with tool '{message.name}' (#{message.tool_call_id})"
+  }
+  content = message.content
+  max_chars = env.APP_TOOL_OUTPUT_MAX_CHARS
+  if max_chars and len(content) > max_chars:
+    # the whole output went to the agent, the user only needs a glimpse of it
+    content = (
+      f"{content[:max_chars]}\n\n... ({len(content) - max_chars} more characters)"
+    )
+    metadata["status"] = "done"  # collapsed
+  yield gr.ChatMessage(role="assistant", content=content, metadata=metadata)
 
 
 def render(message: AnyMessage) -> Iterator[gr.ChatMessage]:
@@ -0,0 +1,290 @@
+"""Batch (offline) inference: runs many prompts through the agent.
+
+Reads prompts from a JSON Lines file, one object per line::
+
+    {"id": "plan-1", "prompt": "Plan a week of vegetarian dinners", "tenant": "alice"}
+
+(`id` defaults to the line number, `tenant` to the default cookbook) and
+runs each one as its own conversation through the same agent as the app,
+a bounded number at a time. Every model call takes a token from the rate
+limiter shared by the whole process (`GEMINI_REQUESTS_PER_MINUTE`), however
+many prompts are in flight.
+
+Results are appended to the output JSON Lines file as they complete, which
+is also the checkpoint: a run which is interrupted (or whose prompts failed)
+is resumed by running it again with the same output, skipping the prompts
+already answered. Resuming drops the results of the failed prompts, which
+are retried, so the output holds one result per prompt. Throughput and
+per-prompt latency percentiles are logged as JSON at the end (and every
+`--progress-every` prompts).
+
+Example:
+    uv run -m src.cmd.batch_infer prompts.jsonl answers.jsonl --concurrency 8
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional, Sequence
+
+import numpy as np
+from langchain.messages import AIMessage
+
+from src import env
+from src.agent.agent import Agent, do_inference, setup_agent
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_EVERY = 100
+"""Number of completed prompts between two progress logs"""
+
+
+@dataclass
+class BatchPrompt:
+  """A prompt of the batch."""
+
+  id: str
+  prompt: str
+  tenant: Optional[str] = None
+
+
+@dataclass
+class BatchStats:
+  """Measurements of a batch run."""
+
+  skipped: int = 0
+  """number of prompts already answered by an earlier run"""
+  answered: int = 0
+  errors: int = 0
+  elapsed_s: float = 0.0
+
+
+def read_prompts(path: Path) -> Iterator[BatchPrompt]:
+  """Reads the prompts of a batch, one at a time.
+
+  Args:
+      path: the JSON Lines file
+
+  Yields:
+      the prompts
+
+  Raises:
+      ValueError: if a line has no prompt, or the id of an earlier one
+  """
+  seen: set[str] = set()
+  with open(path) as fd:
+    for number, line in enumerate(fd, start=1):
+      if not line.strip():
+        continue
+      record = json.loads(line)
+      if not record.get("prompt"):
+        err_msg = f"{path}:{number}: expected an object with a prompt"
+        raise ValueError(err_msg)
+      # results are matched to prompts by id
+      prompt_id = str(record.get("id", number))
+      if prompt_id in seen:
+        err_msg = f"{path}:{number}: duplicate prompt id {prompt_id!r}"
+        raise ValueError(err_msg)
+      seen.add(prompt_id)
+      yield BatchPrompt(
+        id=prompt_id,
+        prompt=str(record["prompt"]),
+        tenant=record.get("tenant"),
+      )
+
+
+def answered_ids(output: Path) -> set[str]:
+  """Ids of the prompts answered by earlier runs (the checkpoint).
+
+  A partially written last line (i.e. the run was killed while writing) is
+  cut off, so that new results are appended after the last complete one.
+  The results of failed prompts are removed, as they are retried.
+
+  Args:
+      output: the results of the earlier runs
+
+  Returns:
+      ids of the prompts answered without error
+  """
+  if not output.exists():
+    return set()
+  content = output.read_bytes()
+  lines = content[: content.rfind(b"\n") + 1].splitlines(keepends=True)
+  answered = [line for line in lines if json.loads(line).get("error") is None]
+  if len(answered) < len(lines) or sum(map(len, lines)) < len(content):
+    temp = output.with_name(f".{output.name}.tmp")
+    temp.write_bytes(b"".join(answered))
+    os.replace(temp, output)
+  return {json.loads(line)["id"] for line in answered}
+
+
+async def answer(agent: Agent, item: BatchPrompt) -> dict[str, Any]:
+  """Runs a prompt through the agent, as its own conversation.
+
+  Args:
+      agent: the agent
+      item: the prompt
+
+  Returns:
+      the result record: the final answer, the tool calls and the latency
+  """
+  thread_id = f"batch-{item.id}"
+  start = time.perf_counter()
+  text = ""
+  tool_calls: list[str] = []
+  error = None
+  try:
+    async for message in do_inference(agent, item.prompt, item.tenant, thread_id):
+      if isinstance(message, AIMessage):
+        tool_calls.extend(call["name"] for call in message.tool_calls)
+        if not message.tool_calls:
+          text = message.text
+  except Exception as e:  # recorded, so the prompt is retried on resume
+    error = f"{type(e).__name__}: {e}"
+  finally:
+    # every prompt is its own conversation, which is not continued
+    checkpointer = getattr(agent, "checkpointer", None)
+    if checkpointer is not None:
+      checkpointer.delete_thread(thread_id)
+
+  return {
+    "id": item.id,
+    "prompt": item.prompt,
+    "tenant": item.tenant,
+    "answer": text,
+    "tool_calls": tool_calls,
+    "latency_s": round(time.perf_counter() - start, 3),
+    "error": error,
+  }
+
+
+def _summary(
+  stats: BatchStats, latencies: list[float], concurrency: int
+) -> dict[str, float | int]:
+  """Throughput and latency percentiles of a run (so far)."""
+
+  def pct(q: int) -> float:
+    return round(float(np.percentile(latencies, q)), 3) if latencies else 0.0
+
+  completed = stats.answered + stats.errors
+  return {
+    "concurrency": concurrency,
+    "skipped": stats.skipped,
+    "answered": stats.answered,
+    "errors": stats.errors,
+    "elapsed_s": round(stats.elapsed_s, 3),
+    "prompts_per_s": round(completed / stats.elapsed_s, 3) if stats.elapsed_s else 0.0,
+    "latency_p50_s": pct(50),
+    "latency_p95_s": pct(95),
+    "latency_p99_s": pct(99),
+  }
+
+
+async def run_batch(
+  agent: Agent,
+  prompts: Iterable[BatchPrompt],
+  output: Path,
+  *,
+  concurrency: int,
+  progress_every: int = PROGRESS_EVERY,
+) -> dict[str, float | int]:
+  """Runs the prompts through the agent, appending the results to the output
+  as they complete (skipping the prompts it already holds answers to).
+
+  Args:
+      agent: the agent
+      prompts: the prompts (consumed as the run progresses)
+      output: the JSON Lines file of the results
+      concurrency: number of prompts in flight at once
+      progress_every: number of completed prompts between two progress logs
+
+  Returns:
+      summary statistics of the run
+  """
+  done = answered_ids(output)
+  stats = BatchStats()
+  latencies: list[float] = []
+  start = time.perf_counter()
+
+  def pending() -> Iterator[BatchPrompt]:
+    for item in prompts:
+      if item.id in done:
+        stats.skipped += 1
+        continue
+      yield item
+
+  queue = pending()
+  output.parent.mkdir(parents=True, exist_ok=True)
+  with open(output, "a") as fd:
+
+    async def worker() -> None:
+      # the workers share the generator, pulling the next prompt when free
+      for item in queue:
+        result = await answer(agent, item)
+        fd.write(json.dumps(result) + "\n")
+        fd.flush()
+        latencies.append(result["latency_s"])
+        if result["error"] is None:
+          stats.answered += 1
+        else:
+          stats.errors += 1
+          logger.warning(f"prompt {item.id} failed: {result['error']}")
+        if progress_every and len(latencies) % progress_every == 0:
+          stats.elapsed_s = time.perf_counter() - start
+          logger.info(json.dumps({"progress": _summary(stats, latencies, concurrency)}))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+  stats.elapsed_s = time.perf_counter() - start
+  return _summary(stats, latencies, concurrency)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+  """Runs a batch of prompts through the agent.
+
+  Args:
+      argv: command line arguments (default `sys.argv`)
+  """
+  parser = argparse.ArgumentParser("Runs a batch of prompts through the agent")
+  parser.add_argument("input", type=Path, help="prompts, as JSON Lines")
+  parser.add_argument(
+    "output", type=Path, help="results, as JSON Lines (resumed if it exists)"
+  )
+  parser.add_argument("--concurrency", type=int, default=4)
+  parser.add_argument(
+    "--requests-per-minute",
+    type=float,
+    default=None,
+    help="model requests per minute shared by all prompts "
+    "(default GEMINI_REQUESTS_PER_MINUTE, 0 unlimited)",
+  )
+  parser.add_argument("--progress-every", type=int, default=PROGRESS_EVERY)
+  parser.add_argument("--summary", type=Path, default=None, help="write JSON here")
+  args = parser.parse_args(argv)
+
+  if args.requests_per_minute is not None:
+    # read when the (process wide) rate limiter is created by the model
+    env.GEMINI_REQUESTS_PER_MINUTE = args.requests_per_minute
+  agent = setup_agent()
+
+  summary = asyncio.run(
+    run_batch(
+      agent,
+      read_prompts(args.input),
+      args.output,
+      concurrency=args.concurrency,
+      progress_every=args.progress_every,
+    )
+  )
+  logger.info(json.dumps(summary))
+  if args.summary is not None:
+    args.summary.write_text(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,161 @@
+"""Benchmark of the ETL: streaming pipeline vs sequential stages.
+
+Builds a synthetic export by copying the recipes of an export (with new ids
+and names) until it holds the requested number of recipes, then runs the ETL
+over it in both modes and reports the total build time and the peak resident
+memory. Every run happens in a fresh process (so the peaks do not mix) and
+writes to a temporary vector store.
+
+The embedding model dominates the build time. To measure the pipeline
+without it, `--embed-ms-per-doc` replaces the model with fake embeddings
+which take that long per document (like the model, they do not hold the GIL
+while "embedding").
+
+Example:
+    uv run -m src.cmd.bench_etl --recipes 1000 10000 --embed-ms-per-doc 2
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import multiprocessing
+import resource
+import sys
+import tempfile
+import time
+import zipfile
+from itertools import cycle, islice
+from pathlib import Path
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src import env
+from src.cmd import paprika_etl
+from src.paprika import vectorstore
+from src.paprika.parser import parse
+
+logger = logging.getLogger(__name__)
+
+MODES = ["sequential", "pipeline"]
+EMBEDDING_SIZE = 768  # all-mpnet-base-v2
+
+
+class _SlowFakeEmbeddings(DeterministicFakeEmbedding):
+  """Fake embeddings which take a fixed time per document."""
+
+  seconds_per_doc: float
+
+  def embed_documents(self, texts: list[str]) -> list[list[float]]:
+    """Sleeps for the texts, then embeds them."""
+    time.sleep(self.seconds_per_doc * len(texts))
+    return super().embed_documents(texts)
+
+
+def make_export(source: Path, output: Path, recipes: int) -> None:
+  """Writes an export with the given number of recipes, copied from another one.
+
+  Args:
+      source: the export to copy the recipes from
+      output: where to write the export
+      recipes: number of recipes
+  """
+  with zipfile.ZipFile(output, "w") as archive:
+    for i, recipe in enumerate(islice(cycle(parse(source)), recipes)):
+      copy = recipe.model_copy(
+        update={"uid": f"bench-{i}", "name": f"{recipe.name} {i}"}
+      )
+      archive.writestr(
+        f"{copy.uid}.paprikarecipe", gzip.compress(copy.model_dump_json().encode())
+      )
+
+
+def _peak_rss_mb() -> float:
+  """Peak resident memory of this process in MB."""
+  maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  # bytes on macOS, kB elsewhere
+  return maxrss / 1e6 if sys.platform == "darwin" else maxrss / 1e3
+
+
+def _build(
+  export: Path, root: Path, mode: str, embed_ms_per_doc: float
+) -> dict[str, float]:
+  """Runs the ETL once (in a fresh process, see `run`)."""
+  env.PAPRIKA_EXPORT_PATH = export
+  vectorstore.CHROMA_ROOT = root / "chroma"
+  vectorstore.MATRIX_ROOT = root / "matrix"
+  vectorstore.SNAPSHOT_PATH = root / "snapshot" / "recipes.snapshot"
+  if embed_ms_per_doc > 0:
+    embeddings = _SlowFakeEmbeddings(
+      size=EMBEDDING_SIZE, seconds_per_doc=embed_ms_per_doc / 1e3
+    )
+    vectorstore._embeddings = lambda: embeddings  # type: ignore[assignment]  # noqa: SLF001
+
+  start = time.perf_counter()
+  paprika_etl.main(["--sequential"] if mode == "sequential" else [])
+  return {
+    "build_s": round(time.perf_counter() - start, 3),
+    "peak_rss_mb": round(_peak_rss_mb(), 1),
+  }
+
+
+def run(
+  sizes: list[int], source: Path, embed_ms_per_doc: float
+) -> list[dict[str, float | int | str]]:
+  """Runs the benchmark.
+
+  Args:
+      sizes: number of recipes per export
+      source: the export to copy the recipes from
+      embed_ms_per_doc: time the fake embeddings take per document,
+        0 uses the embedding model
+
+  Returns:
+      one result row per (size, mode)
+  """
+  results: list[dict[str, float | int | str]] = []
+  spawn = multiprocessing.get_context("spawn")
+  for size in sizes:
+    with tempfile.TemporaryDirectory() as tmp:
+      export = Path(tmp) / "export.paprikarecipes"
+      make_export(source, export, size)
+
+      for mode in MODES:
+        with spawn.Pool(1) as pool:
+          measured = pool.apply(
+            _build, (export, Path(tmp) / mode, mode, embed_ms_per_doc)
+          )
+        row: dict[str, float | int | str] = {"recipes": size, "mode": mode, **measured}
+        logger.info(json.dumps(row))
+        results.append(row)
+  return results
+
+
+def main() -> None:
+  """Runs the ETL benchmark."""
+  parser = argparse.ArgumentParser(
+    "Benchmarks the streaming ETL against sequential stages"
+  )
+  parser.add_argument("--recipes", type=int, nargs="+", default=[1_000, 10_000])
+  parser.add_argument(
+    "--source",
+    type=Path,
+    default=env.PAPRIKA_EXPORT_PATH,
+    help="export to copy the recipes from",
+  )
+  parser.add_argument(
+    "--embed-ms-per-doc",
+    type=float,
+    default=0.0,
+    help="use fake embeddings taking this long per document (0 uses the model)",
+  )
+  parser.add_argument("--output", type=Path, default=None, help="write JSON here")
+  args = parser.parse_args()
+
+  results = run(args.recipes, args.source, args.embed_ms_per_doc)
+  if args.output is not None:
+    args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,151 @@
+"""Streaming throughput benchmark of the logging modes.
+
+Streams turns of canned chunks (model messages and large tool outputs, like
+retrieved recipes) through `do_inference` under each logging mode, with the
+log written to a file, and reports the chunks streamed per second. The
+`debug` mode formats and writes every chunk in full on the streaming path,
+as the app always did; `production` queues sampled and truncated records
+for a background writer.
+
+Example:
+    uv run -m src.cmd.bench_logging --turns 200 --tool-output-chars 20000
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator
+
+from langchain_core.messages import AIMessage, ToolCall, ToolMessage
+from langchain_core.runnables import RunnableGenerator
+
+from src import env, log_config
+from src.agent.agent import Agent, do_inference
+
+logger = logging.getLogger(__name__)
+
+TOOL_CALLS_PER_TURN = 3
+
+
+def _fake_agent(tool_output_chars: int) -> Agent:
+  """Creates an agent streaming a canned turn: a model message calling tools,
+  the (large) tool outputs and the final answer.
+
+  Args:
+      tool_output_chars: length of each tool output
+
+  Returns:
+      the agent
+  """
+  tool_calls = [
+    ToolCall(name="recipe_retriever", args={"query": "cookies"}, id=f"call-{i}")
+    for i in range(TOOL_CALLS_PER_TURN)
+  ]
+  tool_output = ("Chocolate chip cookies: butter, sugar, flour. " * 1000)[
+    :tool_output_chars
+  ]
+
+  async def stream(
+    _: AsyncIterator[Any], **_kwargs: object
+  ) -> AsyncIterator[dict[str, Any]]:
+    yield {"model": {"messages": [AIMessage(content="", tool_calls=tool_calls)]}}
+    for call in tool_calls:
+      message = ToolMessage(content=tool_output, tool_call_id=call["id"])
+      yield {"tools": {"messages": [message]}}
+    yield {"model": {"messages": [AIMessage(content="Here are some cookies!")]}}
+
+  return RunnableGenerator(stream)
+
+
+async def _stream_turns(agent: Agent, turns: int) -> int:
+  """Streams turns through the agent.
+
+  Args:
+      agent: the agent
+      turns: number of turns
+
+  Returns:
+      the number of chunks streamed
+  """
+  chunks = 0
+  for _ in range(turns):
+    async for _message in do_inference(agent, "I want to make cookies"):
+      chunks += 1
+  return chunks
+
+
+def run(
+  modes: list[str], turns: int, tool_output_chars: int, log_path: Path
+) -> list[dict[str, float | int | str]]:
+  """Runs the benchmark.
+
+  Args:
+      modes: logging modes to benchmark
+      turns: number of turns streamed per mode
+      tool_output_chars: length of each tool output
+      log_path: file the logs are written to
+
+  Returns:
+      one result row per mode
+  """
+  agent = _fake_agent(tool_output_chars)
+  root = logging.getLogger()
+  console_handlers = root.handlers
+  results: list[dict[str, float | int | str]] = []
+  for mode in modes:
+    log_path.unlink(missing_ok=True)
+    file_handler = logging.FileHandler(log_path)
+    file_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    root.handlers = [file_handler]
+    try:
+      log_config.configure(mode, env.LOG_PAYLOAD_MAX_CHARS, env.LOG_CHUNK_SAMPLE_RATE)
+      start = time.perf_counter()
+      chunks = asyncio.run(_stream_turns(agent, turns))
+      stream_s = time.perf_counter() - start
+      # the background writer may still be busy once streaming is done
+      log_config.flush()
+      total_s = time.perf_counter() - start
+    finally:
+      file_handler.close()
+      root.handlers = console_handlers
+
+    row: dict[str, float | int | str] = {
+      "mode": mode,
+      "chunks": chunks,
+      "chunks_per_s": round(chunks / stream_s, 1),
+      "stream_s": round(stream_s, 3),
+      "total_s": round(total_s, 3),
+      "log_mb": round(log_path.stat().st_size / 1e6, 2),
+    }
+    logger.info(json.dumps(row))
+    results.append(row)
+
+  log_config.configure(
+    env.LOG_MODE, env.LOG_PAYLOAD_MAX_CHARS, env.LOG_CHUNK_SAMPLE_RATE
+  )
+  return results
+
+
+def main() -> None:
+  """Runs the logging benchmark."""
+  parser = argparse.ArgumentParser(
+    "Benchmarks streaming throughput under each logging mode"
+  )
+  parser.add_argument("--modes", nargs="+", default=["debug", "production"])
+  parser.add_argument("--turns", type=int, default=200)
+  parser.add_argument("--tool-output-chars", type=int, default=20_000)
+  parser.add_argument("--output", type=Path, default=None, help="write JSON here")
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as tmp:
+    results = run(args.modes, args.turns, args.tool_output_chars, Path(tmp) / "log")
+  if args.output is not None:
+    args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,199 @@
+"""Benchmark of the bytes sent and time spent rendering a chat turn.
+
+Streams a canned turn (model responses calling tools in parallel, large
+tool outputs like retrieved recipes, and the final answer) through
+`handle_input`, after earlier turns of conversation, under each rendering
+mode and tool output limit. Every update is processed the way Gradio's chat
+interface does: appended to the history, post-processed by the chatbot and
+serialized, both in full (what a client without a streaming session gets)
+and as the diff against the previous update (what the browser gets). Reports
+per turn the number of updates, the bytes of both and the time spent.
+
+Example:
+    uv run -m src.cmd.bench_render --tool-calls 12 --tool-output-chars 20000
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, cast
+
+import gradio as gr
+from gradio import utils
+from gradio.components.chatbot import Message, MessageDict
+from langchain_core.messages import AIMessage, ToolCall, ToolMessage
+from langchain_core.runnables import RunnableGenerator
+
+from src import env
+from src.agent.agent import Agent
+from src.app import handle_input
+
+logger = logging.getLogger(__name__)
+
+HISTORY_MESSAGE_CHARS = 500
+
+
+def _fake_agent(tool_calls: int, parallel: int, tool_output_chars: int) -> Agent:
+  """Creates an agent streaming a canned turn: model messages each calling
+  tools in parallel, their (large) outputs and the final answer.
+
+  Args:
+      tool_calls: number of tool calls of the turn
+      parallel: number of tool calls per model message
+      tool_output_chars: length of each tool output
+
+  Returns:
+      the agent
+  """
+  calls = [
+    ToolCall(name="recipe_retriever", args={"query": f"cookies {i}"}, id=f"call-{i}")
+    for i in range(tool_calls)
+  ]
+  tool_output = ("Chocolate chip cookies: butter, sugar, flour. " * 1000)[
+    :tool_output_chars
+  ]
+
+  async def stream(
+    _: AsyncIterator[Any], **_kwargs: object
+  ) -> AsyncIterator[dict[str, Any]]:
+    for start in range(0, len(calls), parallel):
+      batch = calls[start : start + parallel]
+      yield {"model": {"messages": [AIMessage(content="", tool_calls=batch)]}}
+      for call in batch:
+        message = ToolMessage(
+          content=tool_output, name=call["name"], tool_call_id=call["id"]
+        )
+        yield {"tools": {"messages": [message]}}
+    yield {"model": {"messages": [AIMessage(content="Here are some cookies!")]}}
+
+  return RunnableGenerator(stream)
+
+
+async def _render_turn(agent: Agent, history: list[MessageDict]) -> dict[str, int]:
+  """Streams a turn through `handle_input`, processing every update like
+  Gradio's chat interface.
+
+  Args:
+      agent: the agent
+      history: the earlier messages of the conversation
+
+  Returns:
+      the number of updates, and the bytes sent in full and as diffs
+  """
+  chatbot = gr.Chatbot(type="messages")
+  history = [*history, {"role": "user", "content": "I want to make cookies"}]
+  previous = None
+  updates = full_bytes = diff_bytes = 0
+  # (the chat interface passes the history, which `handle_input` does not use)
+  async for new_messages in handle_input(agent, "I want to make cookies", []):
+    # (the chat interface appends the update to the history as dicts)
+    messages: list[MessageDict | Message] = [
+      *history,
+      *(cast(MessageDict, dataclasses.asdict(message)) for message in new_messages),
+    ]
+    payload = chatbot.postprocess(messages).model_dump()
+    full_bytes += len(json.dumps(payload))
+    if previous is not None:
+      diff = utils.diff(previous, payload)  # type: ignore[no-untyped-call]
+      diff_bytes += len(json.dumps(diff))
+    else:
+      diff_bytes += len(json.dumps(payload))
+    previous = payload
+    updates += 1
+  return {"updates": updates, "full_bytes": full_bytes, "diff_bytes": diff_bytes}
+
+
+def run(  # noqa: PLR0913
+  modes: list[str],
+  max_chars: list[int],
+  *,
+  turns: int,
+  tool_calls: int,
+  parallel: int,
+  tool_output_chars: int,
+  history_messages: int,
+) -> list[dict[str, float | int | str]]:
+  """Runs the benchmark.
+
+  Args:
+      modes: rendering modes to benchmark
+      max_chars: tool output limits to benchmark (0 unlimited)
+      turns: number of turns rendered per configuration
+      tool_calls: number of tool calls per turn
+      parallel: number of tool calls per model message
+      tool_output_chars: length of each tool output
+      history_messages: number of earlier messages of the conversation
+
+  Returns:
+      one result row per mode and limit
+  """
+  agent = _fake_agent(tool_calls, parallel, tool_output_chars)
+  history: list[MessageDict] = [
+    {
+      "role": "user" if i % 2 == 0 else "assistant",
+      "content": "x" * HISTORY_MESSAGE_CHARS,
+    }
+    for i in range(history_messages)
+  ]
+  results: list[dict[str, float | int | str]] = []
+  for mode in modes:
+    for limit in max_chars:
+      env.APP_RENDER_MODE = mode
+      env.APP_TOOL_OUTPUT_MAX_CHARS = limit
+      start = time.perf_counter()
+      turn = {}
+      for _ in range(turns):
+        turn = asyncio.run(_render_turn(agent, history))
+      elapsed = time.perf_counter() - start
+
+      row: dict[str, float | int | str] = {
+        "mode": mode,
+        "tool_output_max_chars": limit,
+        **turn,
+        "render_ms_per_turn": round(elapsed / turns * 1000, 2),
+      }
+      logger.info(json.dumps(row))
+      results.append(row)
+  return results
+
+
+def main() -> None:
+  """Runs the rendering benchmark."""
+  parser = argparse.ArgumentParser(
+    "Benchmarks bytes sent and render time per chat turn"
+  )
+  parser.add_argument("--modes", nargs="+", default=["per_message", "batched"])
+  parser.add_argument(
+    "--max-chars",
+    nargs="+",
+    type=int,
+    default=[0, env.APP_TOOL_OUTPUT_MAX_CHARS],
+    help="tool output limits to benchmark (0 unlimited)",
+  )
+  parser.add_argument("--turns", type=int, default=20)
+  parser.add_argument("--tool-calls", type=int, default=12)
+  parser.add_argument("--parallel", type=int, default=3)
+  parser.add_argument("--tool-output-chars", type=int, default=20_000)
+  parser.add_argument("--history", type=int, default=20)
+  parser.add_argument("--output", type=Path, default=None, help="write JSON here")
+  args = parser.parse_args()
+
+  results = run(
+    args.modes,
+    args.max_chars,
+    turns=args.turns,
+    tool_calls=args.tool_calls,
+    parallel=args.parallel,
+    tool_output_chars=args.tool_output_chars,
+    history_messages=args.history,
+  )
+  if args.output is not None:
+    args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+  main()
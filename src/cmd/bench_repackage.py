@@ -0,0 +1,141 @@
+"""Benchmark of paprika_repackage: in-memory vs streaming repackaging.
+
+Builds a synthetic cookbook JSON by copying the recipes of a cookbook (with
+new ids and names) until it holds the requested number of recipes, then
+repackages it in memory (`json.load`, serial compression) and streaming
+(incremental reading, compression in a process pool) and reports the time
+and the peak resident memory (of the main process, and of the largest pool
+process). Every run happens in a fresh process so the peaks do not mix.
+
+Example:
+    uv run -m src.cmd.bench_repackage --recipes 50000 --workers 4
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import cycle, islice
+from pathlib import Path
+from typing import Optional
+
+from src import env
+from src.cmd.paprika_repackage import repackage, repackage_streaming
+
+logger = logging.getLogger(__name__)
+
+MODES = ["in_memory", "streaming"]
+DEFAULT_SOURCE = env.REPO_ROOT / "tests" / "fixtures" / "paprika" / "export.json"
+
+
+def make_cookbook(source: Path, output: Path, recipes: int) -> None:
+  """Writes a cookbook JSON with the given number of recipes, copied from
+  another one (one recipe at a time, so it can be larger than memory).
+
+  Args:
+      source: the cookbook to copy the recipes from
+      output: where to write the cookbook
+      recipes: number of recipes
+  """
+  with open(source) as fd:
+    originals = json.load(fd)
+  with open(output, "w") as fd:
+    fd.write("[")
+    for i, recipe in enumerate(islice(cycle(originals), recipes)):
+      copy = {**recipe, "uid": f"bench-{i}", "name": f"{recipe['name']} {i}"}
+      fd.write(("," if i else "") + json.dumps(copy))
+    fd.write("]")
+
+
+def _peak_rss_mb(who: int) -> float:
+  """Peak resident memory in MB, of this process or of its largest child."""
+  maxrss = resource.getrusage(who).ru_maxrss
+  # bytes on macOS, kB elsewhere
+  return maxrss / 1e6 if sys.platform == "darwin" else maxrss / 1e3
+
+
+def _repackage(
+  cookbook: Path, output: Path, mode: str, workers: Optional[int]
+) -> dict[str, float]:
+  """Repackages the cookbook once (in a fresh process, see `run`)."""
+  start = time.perf_counter()
+  if mode == "streaming":
+    repackage_streaming(cookbook, output, workers=workers)
+  else:
+    repackage(cookbook, output)
+  return {
+    "seconds": round(time.perf_counter() - start, 3),
+    "peak_rss_mb": round(_peak_rss_mb(resource.RUSAGE_SELF), 1),
+    "peak_worker_rss_mb": round(_peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+    "output_mb": round(output.stat().st_size / 1e6, 1),
+  }
+
+
+def run(
+  sizes: list[int], source: Path, workers: Optional[int]
+) -> list[dict[str, float | int | str]]:
+  """Runs the benchmark.
+
+  Args:
+      sizes: number of recipes per cookbook
+      source: the cookbook to copy the recipes from
+      workers: number of compressing processes (default one per CPU)
+
+  Returns:
+      one result row per (size, mode)
+  """
+  results: list[dict[str, float | int | str]] = []
+  spawn = multiprocessing.get_context("spawn")
+  for size in sizes:
+    with tempfile.TemporaryDirectory() as tmp:
+      cookbook = Path(tmp) / "cookbook.json"
+      make_cookbook(source, cookbook, size)
+      input_mb = round(cookbook.stat().st_size / 1e6, 1)
+
+      for mode in MODES:
+        output = Path(tmp) / f"{mode}.paprikarecipes"
+        # not a multiprocessing pool, whose daemonic processes cannot start one
+        with ProcessPoolExecutor(1, mp_context=spawn) as fresh:
+          measured = fresh.submit(_repackage, cookbook, output, mode, workers)
+          row: dict[str, float | int | str] = {
+            "recipes": size,
+            "mode": mode,
+            "input_mb": input_mb,
+            **measured.result(),
+          }
+        logger.info(json.dumps(row))
+        results.append(row)
+        output.unlink(missing_ok=True)
+  return results
+
+
+def main() -> None:
+  """Runs the repackaging benchmark."""
+  parser = argparse.ArgumentParser(
+    "Benchmarks streaming paprika_repackage against the in-memory one"
+  )
+  parser.add_argument("--recipes", type=int, nargs="+", default=[50_000])
+  parser.add_argument(
+    "--source",
+    type=Path,
+    default=DEFAULT_SOURCE,
+    help="cookbook JSON to copy the recipes from",
+  )
+  parser.add_argument(
+    "--workers", type=int, default=None, help="compressing processes (default CPUs)"
+  )
+  parser.add_argument("--output", type=Path, default=None, help="write JSON here")
+  args = parser.parse_args()
+
+  results = run(args.recipes, args.source, args.workers)
+  if args.output is not None:
+    args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+  main()
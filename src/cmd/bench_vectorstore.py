@@ -0,0 +1,214 @@
+"""Scaling benchmark for the vector store backends.
+
+Builds every backend over synthetic, clustered embeddings at several corpus
+sizes and reports build time, query latency, recall@k against exact search
+and on-disk size. Synthetic embeddings are used so that the benchmark
+measures the index and not the embedding model.
+
+Example:
+    uv run -m src.cmd.bench_vectorstore --sizes 1000 10000 100000
+"""
+
+import argparse
+import json
+import logging
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+from chromadb.config import Settings
+from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
+
+from src.paprika.matrix_store import MatrixVectorStore
+from src.paprika.vectorstore import (
+  LOAD_BATCH_SIZE,
+  VectorStore,
+  hnsw_collection_metadata,
+)
+
+logger = logging.getLogger(__name__)
+
+N_CLUSTERS = 256
+
+
+class _SyntheticEmbeddings(Embeddings):
+  """Embeds `doc-<i>` and `query-<i>` texts by looking up pre-made vectors."""
+
+  def __init__(self, docs: np.ndarray, queries: np.ndarray) -> None:
+    """Creates the lookup embeddings.
+
+    Args:
+        docs: vector of document i is docs[i]
+        queries: vector of query i is queries[i]
+    """
+    self.docs = docs
+    self.queries = queries
+
+  def embed_documents(self, texts: list[str]) -> list[list[float]]:
+    """Looks up the vectors for `doc-<i>` texts."""
+    vectors: list[list[float]] = self.docs[
+      [int(text.split("-")[1]) for text in texts]
+    ].tolist()
+    return vectors
+
+  def embed_query(self, text: str) -> list[float]:
+    """Looks up the vector for a `query-<i>` text."""
+    vector: list[float] = self.queries[int(text.split("-")[1])].tolist()
+    return vector
+
+
+def _make_corpus(
+  size: int, n_queries: int, dim: int, seed: int = 0
+) -> tuple[np.ndarray, np.ndarray]:
+  """Creates unit length document vectors drawn around random cluster centers,
+  and queries which are noisy copies of random documents.
+
+  Args:
+      size: number of documents
+      n_queries: number of queries
+      dim: dimension of the vectors
+      seed: random seed
+
+  Returns:
+      tuple of [documents, queries]
+  """
+  rng = np.random.default_rng(seed)
+  centers = rng.normal(size=(N_CLUSTERS, dim)).astype(np.float32)
+  docs = centers[rng.integers(N_CLUSTERS, size=size)]
+  docs += rng.normal(scale=0.6, size=docs.shape).astype(np.float32)
+  docs /= np.linalg.norm(docs, axis=1, keepdims=True)
+
+  queries = docs[rng.integers(size, size=n_queries)]
+  queries = queries + rng.normal(scale=0.02, size=queries.shape).astype(np.float32)
+  queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+  return docs, queries
+
+
+def _exact_top_k(docs: np.ndarray, queries: np.ndarray, k: int) -> list[set[int]]:
+  """Finds the true k nearest documents of each query (cosine similarity)."""
+  scores = queries @ docs.T
+  return [set(row) for row in np.argsort(-scores, axis=1)[:, :k].tolist()]
+
+
+def _dir_size_mb(path: Path) -> float:
+  """Total size of all files under path in MB."""
+  return sum(f.stat().st_size for f in path.rglob("*") if f.is_file()) / 1e6
+
+
+def _backends(
+  embeddings: Embeddings,
+) -> dict[str, Callable[[Path], VectorStore]]:
+  """Creates factories for every backend configuration to benchmark."""
+
+  def chroma(path: Path) -> VectorStore:
+    return Chroma(
+      collection_name="bench",
+      embedding_function=embeddings,
+      client_settings=Settings(anonymized_telemetry=False),
+      persist_directory=str(path),
+      # recall is measured against cosine similarity
+      collection_metadata={**hnsw_collection_metadata(), "hnsw:space": "cosine"},
+    )
+
+  def matrix(dtype: str, index: str) -> Callable[[Path], VectorStore]:
+    return lambda path: MatrixVectorStore(
+      embedding_function=embeddings,
+      persist_directory=path,
+      dtype="int8" if dtype == "int8" else "float16",
+      index="ivf" if index == "ivf" else "flat",
+    )
+
+  return {
+    "chroma-hnsw": chroma,
+    "matrix-float16-flat": matrix("float16", "flat"),
+    "matrix-int8-flat": matrix("int8", "flat"),
+    "matrix-float16-ivf": matrix("float16", "ivf"),
+    "matrix-int8-ivf": matrix("int8", "ivf"),
+  }
+
+
+def run(
+  sizes: list[int], n_queries: int, dim: int, k: int, backends: list[str] | None
+) -> list[dict[str, float | int | str]]:
+  """Runs the benchmark.
+
+  Args:
+      sizes: corpus sizes to benchmark
+      n_queries: number of queries per corpus
+      dim: dimension of the vectors
+      k: number of results per query
+      backends: backends to benchmark, None for all of them
+
+  Returns:
+      one result row per (size, backend)
+  """
+  results: list[dict[str, float | int | str]] = []
+  for size in sizes:
+    docs, queries = _make_corpus(size, n_queries, dim)
+    truth = _exact_top_k(docs, queries, k)
+    embeddings = _SyntheticEmbeddings(docs, queries)
+    texts = [f"doc-{i}" for i in range(size)]
+
+    for name, factory in _backends(embeddings).items():
+      if backends is not None and name not in backends:
+        continue
+
+      with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / name
+
+        # 1. build
+        start = time.perf_counter()
+        store = factory(path)
+        for batch_start in range(0, size, LOAD_BATCH_SIZE):
+          store.add_texts(texts[batch_start : batch_start + LOAD_BATCH_SIZE])
+        if isinstance(store, MatrixVectorStore):
+          store.persist()
+        build_s = time.perf_counter() - start
+
+        # 2. query (re-open so that the measured store is the persisted one)
+        store = factory(path)
+        latencies, hits = [], 0
+        for i in range(n_queries):
+          query = embeddings.embed_query(f"query-{i}")
+          start = time.perf_counter()
+          found = store.similarity_search_by_vector(query, k=k)
+          latencies.append(time.perf_counter() - start)
+          hits += len(truth[i] & {int(d.page_content.split("-")[1]) for d in found})
+
+        row: dict[str, float | int | str] = {
+          "size": size,
+          "backend": name,
+          "build_s": round(build_s, 3),
+          "query_p50_ms": round(float(np.percentile(latencies, 50)) * 1e3, 3),
+          "query_p95_ms": round(float(np.percentile(latencies, 95)) * 1e3, 3),
+          f"recall@{k}": round(hits / (n_queries * k), 4),
+          "disk_mb": round(_dir_size_mb(path), 2),
+        }
+        logger.info(json.dumps(row))
+        results.append(row)
+  return results
+
+
+def main() -> None:
+  """Runs the vector store scaling benchmark."""
+  parser = argparse.ArgumentParser(
+    "Benchmarks vector store backends across corpus sizes"
+  )
+  parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+  parser.add_argument("--queries", type=int, default=200)
+  parser.add_argument("--dim", type=int, default=768)  # all-mpnet-base-v2
+  parser.add_argument("--k", type=int, default=5)
+  parser.add_argument("--backends", nargs="+", default=None)
+  parser.add_argument("--output", type=Path, default=None, help="write JSON here")
+  args = parser.parse_args()
+
+  results = run(args.sizes, args.queries, args.dim, args.k, args.backends)
+  if args.output is not None:
+    args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,206 @@
+"""Calibrates the relevance threshold of adaptive-k retrieval.
+
+Runs a labelled query set, one JSON object per line::
+
+    {"query": "a chocolate dessert", "relevant": ["Brownies", "Chocolate Mousse"]}
+
+(the names of the recipes relevant to the query) through the vector store,
+keeping the `k` nearest chunks with their relevance, then sweeps the
+threshold. For each threshold it reports how many chunks would be returned,
+how many of the relevant chunks (those of a relevant recipe) found by the
+top `k` are kept (recall, relative to always returning `k`), which share of
+the returned chunks is relevant (precision) and how many prompt tokens are
+saved. The recommended threshold is the highest keeping `--target-recall` of
+the relevant chunks, to set as `RETRIEVAL_SCORE_THRESHOLD`.
+
+Example:
+    uv run -m src.cmd.calibrate_retrieval queries.jsonl --target-recall 0.95
+"""
+
+import argparse
+import json
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional, Sequence
+
+import numpy as np
+
+from src.paprika.vectorstore import VectorStore, connect, search_with_relevance
+from src.tools.vector_store import CHARS_PER_TOKEN
+
+logger = logging.getLogger(__name__)
+
+THRESHOLD_STEP = 0.01
+"""Difference between two thresholds of the sweep"""
+
+
+@dataclass
+class LabelledQuery:
+  """A query, and the recipes relevant to it."""
+
+  query: str
+  relevant: set[str]
+  """names of the relevant recipes"""
+
+
+@dataclass
+class ScoredChunk:
+  """A chunk found for a labelled query."""
+
+  relevance: float
+  relevant: bool
+  """whether the chunk belongs to a relevant recipe"""
+  chars: int
+
+
+def read_queries(path: Path) -> list[LabelledQuery]:
+  """Reads a labelled query set.
+
+  Args:
+      path: the JSON Lines file
+
+  Returns:
+      the queries
+
+  Raises:
+      ValueError: if a line has no query
+  """
+  queries = []
+  with open(path) as fd:
+    for number, line in enumerate(fd, start=1):
+      if not line.strip():
+        continue
+      record = json.loads(line)
+      if not record.get("query"):
+        err_msg = f"{path}:{number}: expected an object with a query"
+        raise ValueError(err_msg)
+      queries.append(LabelledQuery(record["query"], set(record.get("relevant", []))))
+  return queries
+
+
+def score_queries(
+  store: VectorStore, queries: list[LabelledQuery], k: int
+) -> list[list[ScoredChunk]]:
+  """Searches the `k` nearest chunks of every query.
+
+  Args:
+      store: the vector store
+      queries: the labelled queries
+      k: number of chunks retrieved per query
+
+  Returns:
+      the chunks found for each query, most relevant first
+  """
+  embeddings = store.embeddings
+  assert embeddings is not None, "vector store has no embedding model"
+  vectors = embeddings.embed_documents([query.query for query in queries])
+  return [
+    [
+      ScoredChunk(
+        relevance=score,
+        relevant=doc.metadata.get("name") in query.relevant,
+        chars=len(doc.page_content),
+      )
+      for doc, score in search_with_relevance(store, vector, k)
+    ]
+    for query, vector in zip(queries, vectors, strict=True)
+  ]
+
+
+def sweep(
+  results: list[list[ScoredChunk]], thresholds: Sequence[float]
+) -> list[dict[str, float]]:
+  """Measures what each threshold would return for the queries.
+
+  Args:
+      results: the chunks found for each query, see `score_queries()`
+      thresholds: the thresholds to measure
+
+  Returns:
+      one row of measurements per threshold
+  """
+  chunks = [chunk for found in results for chunk in found]
+  n_relevant = sum(chunk.relevant for chunk in chunks)
+  rows = []
+  for threshold in thresholds:
+    kept = [chunk for chunk in chunks if chunk.relevance >= threshold]
+    kept_relevant = sum(chunk.relevant for chunk in kept)
+    saved_chars = sum(chunk.chars for chunk in chunks) - sum(
+      chunk.chars for chunk in kept
+    )
+    empty = sum(
+      all(chunk.relevance < threshold for chunk in found) for found in results
+    )
+    rows.append(
+      {
+        "threshold": round(float(threshold), 4),
+        "docs_per_query": round(len(kept) / len(results), 3),
+        # nothing to lose when the top k found nothing relevant
+        "recall": round(kept_relevant / n_relevant, 4) if n_relevant else 1.0,
+        "precision": round(kept_relevant / len(kept), 4) if kept else 1.0,
+        "empty_share": round(empty / len(results), 4),
+        "tokens_saved_per_query": round(
+          saved_chars / CHARS_PER_TOKEN / len(results), 1
+        ),
+      }
+    )
+  return rows
+
+
+def recommend(rows: list[dict[str, float]], target_recall: float) -> dict[str, float]:
+  """Picks the highest threshold keeping enough of the relevant chunks.
+
+  Args:
+      rows: the sweep, see `sweep()`
+      target_recall: share of the relevant chunks to keep
+
+  Returns:
+      the row of the recommended threshold
+  """
+  eligible = [row for row in rows if row["recall"] >= target_recall]
+  return max(eligible or rows[:1], key=lambda row: row["threshold"])
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+  """Calibrates the retrieval threshold on a labelled query set.
+
+  Args:
+      argv: command line arguments (default `sys.argv`)
+  """
+  parser = argparse.ArgumentParser(
+    "Calibrates the relevance threshold of adaptive-k retrieval"
+  )
+  parser.add_argument("queries", type=Path, help="labelled queries, as JSON Lines")
+  parser.add_argument("--backend", default=None, help="default VECTOR_BACKEND")
+  parser.add_argument("-k", type=int, default=5, help="chunks retrieved per query")
+  parser.add_argument("--target-recall", type=float, default=0.95)
+  parser.add_argument("--step", type=float, default=THRESHOLD_STEP)
+  parser.add_argument("--output", type=Path, default=None, help="write JSON here")
+  args = parser.parse_args(argv)
+
+  queries = read_queries(args.queries)
+  results = score_queries(connect(args.backend), queries, args.k)
+  rows = sweep(results, np.arange(0.0, 1.0 + args.step / 2, args.step).tolist())
+  best = recommend(rows, args.target_recall)
+
+  report: dict[str, Any] = {
+    "queries": len(queries),
+    "k": args.k,
+    "target_recall": args.target_recall,
+    "recommended": best,
+    "sweep": rows,
+  }
+  for row in rows:
+    logger.info(json.dumps(row))
+  logger.info(
+    f"RETRIEVAL_SCORE_THRESHOLD={best['threshold']} keeps {best['recall']:.1%} of "
+    f"the relevant chunks with {best['docs_per_query']} chunks per query "
+    f"(~{best['tokens_saved_per_query']} prompt tokens saved per query)"
+  )
+  if args.output is not None:
+    args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,347 @@
+"""Offline load generator for the chat app.
+
+Runs concurrent simulated chat sessions through the app's chat callback
+(`handle_input`) in-process, without spending Gemini quota: the model is
+simulated (it calls the retriever and MealDB, then answers, each call taking
+an injected latency), while the recipe retriever is the real one and the
+MealDB tools call a local stub server serving a MealDB snapshot. Reports
+turns/sec, turn latency percentiles, memory growth and event loop lag, so
+scaling changes can be evaluated offline.
+
+Example:
+    uv run -m src.cmd.load_sim --sessions 200 --concurrency 32 --model-latency-ms 800
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import re
+import resource
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Iterator, Optional, Sequence
+from urllib.parse import parse_qsl, urlparse
+
+import numpy as np
+from langchain_core.callbacks import (
+  AsyncCallbackManagerForLLMRun,
+  CallbackManagerForLLMRun,
+)
+from langchain_core.language_models import BaseChatModel, LanguageModelInput
+from langchain_core.messages import (
+  AIMessage,
+  BaseMessage,
+  HumanMessage,
+  ToolCall,
+  ToolMessage,
+)
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import Runnable
+
+from src import env, metrics
+from src.agent.agent import Agent, setup_agent
+from src.app import handle_input
+from src.app.admission import AdmissionQueue
+from src.tools.mealdb_mirror import MealDBMirror, write_mirror
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROMPTS = [
+  "I want to make a chicken curry.",
+  "How do I cook baked salmon?",
+  "Give me a recipe for penne.",
+]
+DEFAULT_SNAPSHOT = env.REPO_ROOT / "tests/fixtures/mealdb/snapshot.json"
+LATENCY_JITTER = 0.5
+"""Injected latencies are drawn uniformly within +-50% of their mean"""
+
+
+def _jittered(mean_s: float) -> float:
+  """Draws a latency around a mean."""
+  return mean_s * random.uniform(1 - LATENCY_JITTER, 1 + LATENCY_JITTER)  # noqa: S311
+
+
+class SimulatedChatModel(BaseChatModel):
+  """Chat model playing a typical turn: given a user prompt, it calls the
+  recipe retriever and searches MealDB for the prompt's last word, and given
+  tool results, it answers. Each call takes an injected latency.
+  """
+
+  latency_s: float = 0.5
+  """mean latency of a model call"""
+
+  @property
+  def _llm_type(self) -> str:
+    """Type of the model (for LangChain)."""
+    return "simulated"
+
+  def bind_tools(
+    self,
+    tools: Sequence[Any],
+    **kwargs: Any,  # noqa: ANN401
+  ) -> Runnable[LanguageModelInput, AIMessage]:
+    """Accepts (and ignores) the tools, the calls are scripted."""
+    return self
+
+  @staticmethod
+  def _respond(messages: list[BaseMessage]) -> AIMessage:
+    """Scripted response to the conversation so far."""
+    last = messages[-1]
+    if isinstance(last, HumanMessage):
+      prompt = str(last.content)
+      words = re.findall(r"\w+", prompt)
+      return AIMessage(
+        content="",
+        tool_calls=[
+          ToolCall(
+            name="recipe_retriever",
+            args={"query": prompt},
+            id=f"call-{uuid.uuid4().hex}",
+          ),
+          ToolCall(
+            name="search_meal_by_name",
+            args={"meal_name": words[-1] if words else prompt},
+            id=f"call-{uuid.uuid4().hex}",
+          ),
+        ],
+      )
+
+    results = sum(
+      len(str(message.content))
+      for message in messages
+      if isinstance(message, ToolMessage)
+    )
+    return AIMessage(content=f"Here is what I found ({results} chars of results).")
+
+  def _generate(
+    self,
+    messages: list[BaseMessage],
+    stop: Optional[list[str]] = None,
+    run_manager: Optional[CallbackManagerForLLMRun] = None,
+    **kwargs: Any,  # noqa: ANN401
+  ) -> ChatResult:
+    """Responds after the injected latency."""
+    time.sleep(_jittered(self.latency_s))
+    return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+  async def _agenerate(
+    self,
+    messages: list[BaseMessage],
+    stop: Optional[list[str]] = None,
+    run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+    **kwargs: Any,  # noqa: ANN401
+  ) -> ChatResult:
+    """Responds after the injected latency, without blocking the loop."""
+    await asyncio.sleep(_jittered(self.latency_s))
+    return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+
+@contextmanager
+def mealdb_stub(mirror: MealDBMirror, latency_s: float) -> Iterator[str]:
+  """Serves the MealDB API endpoints used by the tools from a mirror.
+
+  Args:
+      mirror: the MealDB data to serve
+      latency_s: mean latency injected into every request
+
+  Yields:
+      the base URL of the stub API
+  """
+
+  class Handler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:  # noqa: N802
+      url = urlparse(self.path)
+      params = dict(parse_qsl(url.query))
+      endpoint = url.path.rsplit("/", 1)[-1]
+      time.sleep(_jittered(latency_s))
+      if endpoint == "search.php":
+        data = mirror.search_meal_by_name(params.get("s", ""))
+      elif endpoint == "filter.php":
+        data = mirror.filter_recipes(params)
+      elif endpoint == "list.php" and params:
+        data = mirror.list_filter_options(next(iter(params)))
+      else:
+        self.send_error(HTTPStatus.NOT_FOUND)
+        return
+
+      body = json.dumps(data).encode()
+      self.send_response(HTTPStatus.OK)
+      self.send_header("Content-Type", "application/json")
+      self.send_header("Content-Length", str(len(body)))
+      self.end_headers()
+      self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002, ANN401
+      """Keeps the requests out of the logs."""
+
+  server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+  thread = threading.Thread(target=server.serve_forever, daemon=True)
+  thread.start()
+  try:
+    yield f"http://127.0.0.1:{server.server_port}/api/json/v1/1"
+  finally:
+    server.shutdown()
+    server.server_close()
+
+
+def _rss_mb() -> float:
+  """Current resident memory of the process in MB (peak if unavailable)."""
+  statm = Path("/proc/self/statm")
+  if statm.exists():
+    pages = int(statm.read_text().split()[1])
+    return pages * resource.getpagesize() / 1e6
+  return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+async def _run_session(
+  agent: Agent, prompts: list[str], admission: Optional[AdmissionQueue]
+) -> list[float]:
+  """Runs one chat session to completion.
+
+  Args:
+      agent: the agent
+      prompts: the user turns of the session
+      admission: the app's admission queue, if any
+
+  Returns:
+      latency of each turn in seconds
+  """
+  # the session's own conversation, like a browser session of the app
+  thread_id = uuid.uuid4().hex
+  latencies = []
+  for prompt in prompts:
+    start = time.perf_counter()
+    async for _messages in handle_input(
+      agent, prompt, [], admission=admission, thread_id=thread_id
+    ):
+      pass
+    latencies.append(time.perf_counter() - start)
+  return latencies
+
+
+async def run_sim(  # noqa: PLR0913
+  agent: Agent,
+  sessions: int,
+  concurrency: int,
+  turns: int,
+  prompts: list[str],
+  *,
+  admission: Optional[AdmissionQueue] = None,
+) -> dict[str, float | int]:
+  """Runs concurrent simulated sessions and summarizes them.
+
+  Args:
+      agent: the agent
+      sessions: total number of sessions
+      concurrency: sessions in flight at once
+      turns: number of user turns per session
+      prompts: prompts to cycle through
+      admission: the app's admission queue, if any
+
+  Returns:
+      summary statistics of the run
+  """
+  in_flight = asyncio.Semaphore(concurrency)
+  latencies: list[float] = []
+  errors = 0
+
+  async def session(i: int) -> None:
+    nonlocal errors
+    session_prompts = [prompts[(i + turn) % len(prompts)] for turn in range(turns)]
+    async with in_flight:
+      try:
+        latencies.extend(await _run_session(agent, session_prompts, admission))
+      except Exception as e:  # keep going, failed sessions are reported
+        logger.warning(f"session failed: {e}")
+        errors += 1
+
+  # the lag of this run only, not of earlier ones (i.e. other concurrencies)
+  metrics.histogram("event_loop_lag_s").reset()
+  rss_start = _rss_mb()
+  start = time.perf_counter()
+  await asyncio.gather(*(session(i) for i in range(sessions)))
+  elapsed = time.perf_counter() - start
+  rss_end = _rss_mb()
+
+  def pct(q: int) -> float:
+    return round(float(np.percentile(latencies, q)), 3) if latencies else 0.0
+
+  lag = metrics.histogram("event_loop_lag_s").summary()
+  return {
+    "sessions": sessions,
+    "concurrency": concurrency,
+    "errors": errors,
+    "turns": len(latencies),
+    "elapsed_s": round(elapsed, 3),
+    "turns_per_s": round(len(latencies) / elapsed, 3),
+    "turn_p50_s": pct(50),
+    "turn_p95_s": pct(95),
+    "turn_p99_s": pct(99),
+    "rss_start_mb": round(rss_start, 1),
+    "rss_end_mb": round(rss_end, 1),
+    "rss_growth_mb": round(rss_end - rss_start, 1),
+    "loop_lag_p95_s": lag.get("p95", 0.0),
+    "loop_lag_max_s": lag.get("max", 0.0),
+  }
+
+
+def main() -> None:
+  """Runs the simulated load."""
+  parser = argparse.ArgumentParser(
+    "Load tests the chat app offline with a simulated model and a stub MealDB"
+  )
+  parser.add_argument("--sessions", type=int, default=100)
+  parser.add_argument("--concurrency", type=int, nargs="+", default=[8])
+  parser.add_argument("--turns", type=int, default=1)
+  parser.add_argument("--prompt", action="append", default=None)
+  parser.add_argument("--model-latency-ms", type=float, default=500)
+  parser.add_argument("--mealdb-latency-ms", type=float, default=100)
+  parser.add_argument("--mealdb-snapshot", type=Path, default=DEFAULT_SNAPSHOT)
+  parser.add_argument(
+    "--admission",
+    action="store_true",
+    help="queue turns like the app (APP_CONCURRENCY_LIMIT, APP_MAX_QUEUE_SIZE)",
+  )
+  parser.add_argument("--output", type=Path, default=None, help="write JSON here")
+  args = parser.parse_args()
+  prompts: list[str] = args.prompt or DEFAULT_PROMPTS
+
+  with tempfile.TemporaryDirectory() as tmp:
+    mirror_path = Path(tmp) / "mealdb.db"
+    write_mirror(mirror_path, json.loads(args.mealdb_snapshot.read_text()))
+    # keep the responses of the stub out of the app's API cache
+    env.API_CACHE_DB_PATH = Path(tmp) / "api_cache.db"
+    env.MEALDB_BACKEND = "api"
+
+    results = []
+    with mealdb_stub(MealDBMirror(mirror_path), args.mealdb_latency_ms / 1e3) as url:
+      env.MEALDB_BASE_URL = url
+      agent = setup_agent(SimulatedChatModel(latency_s=args.model_latency_ms / 1e3))
+      for concurrency in args.concurrency:
+        admission = (
+          AdmissionQueue(env.APP_CONCURRENCY_LIMIT, env.APP_MAX_QUEUE_SIZE)
+          if args.admission
+          else None
+        )
+        summary = asyncio.run(
+          run_sim(
+            agent, args.sessions, concurrency, args.turns, prompts, admission=admission
+          )
+        )
+        logger.info(json.dumps(summary))
+        results.append(summary)
+
+  if args.output is not None:
+    args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,170 @@
+"""Load test for the (multi-worker) chat app.
+
+For each worker count, starts `src.cmd.serve` with that many workers (or
+uses an already running server with `--url`), runs a number of concurrent
+chat sessions through the gradio API and reports sessions/sec and turn
+latency percentiles.
+
+Example:
+    uv run -m src.cmd.load_test --workers 1 2 4 --sessions 40 --concurrency 8
+"""
+
+import argparse
+import json
+import logging
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import httpx
+import numpy as np
+from gradio_client import Client  # type: ignore[import-untyped]
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROMPTS = [
+  "I want to make a chocolate chip cookies.",
+  "How do I cook a perfect steak?",
+  "Give me a recipe for vegan lasagna.",
+]
+SERVER_STARTUP_TIMEOUT_S = 600
+
+
+def _run_session(url: str, prompts: list[str]) -> list[float]:
+  """Runs one chat session (a new gradio session) to completion.
+
+  Args:
+      url: URL of the app
+      prompts: the user turns of the session
+
+  Returns:
+      latency of each turn in seconds
+  """
+  client = Client(url, verbose=False)
+  latencies = []
+  for prompt in prompts:
+    start = time.perf_counter()
+    client.predict(prompt, api_name="/chat")
+    latencies.append(time.perf_counter() - start)
+  return latencies
+
+
+def run_load(
+  url: str, sessions: int, concurrency: int, turns: int, prompts: list[str]
+) -> dict[str, float | int]:
+  """Runs concurrent sessions against the app and summarizes them.
+
+  Args:
+      url: URL of the app
+      sessions: total number of sessions
+      concurrency: sessions in flight at once
+      turns: number of user turns per session
+      prompts: prompts to cycle through
+
+  Returns:
+      summary statistics of the run
+  """
+  session_prompts = [
+    [prompts[(i + turn) % len(prompts)] for turn in range(turns)]
+    for i in range(sessions)
+  ]
+
+  latencies: list[float] = []
+  errors = 0
+  start = time.perf_counter()
+  with ThreadPoolExecutor(max_workers=concurrency) as pool:
+    futures = [pool.submit(_run_session, url, p) for p in session_prompts]
+    for future in futures:
+      try:
+        latencies.extend(future.result())
+      except Exception as e:  # keep going, failed sessions are reported
+        logger.warning(f"session failed: {e}")
+        errors += 1
+  elapsed = time.perf_counter() - start
+
+  def pct(q: int) -> float:
+    return round(float(np.percentile(latencies, q)), 3) if latencies else 0.0
+
+  return {
+    "sessions": sessions,
+    "errors": errors,
+    "elapsed_s": round(elapsed, 3),
+    "sessions_per_s": round((sessions - errors) / elapsed, 3),
+    "turn_p50_s": pct(50),
+    "turn_p95_s": pct(95),
+    "turn_p99_s": pct(99),
+  }
+
+
+def _start_server(workers: int, port: int) -> subprocess.Popen[bytes]:
+  """Starts `src.cmd.serve` and waits for it to accept requests.
+
+  Args:
+      workers: number of app workers
+      port: port of the balancer
+
+  Returns:
+      the server process
+  """
+  server = subprocess.Popen(
+    [
+      sys.executable,
+      "-m",
+      "src.cmd.serve",
+      "--workers",
+      str(workers),
+      "--port",
+      str(port),
+    ]
+  )
+  deadline = time.monotonic() + SERVER_STARTUP_TIMEOUT_S
+  while time.monotonic() < deadline:
+    if server.poll() is not None:
+      err_msg = f"server exited with {server.returncode}"
+      raise RuntimeError(err_msg)
+    try:
+      httpx.get(f"http://127.0.0.1:{port}", timeout=1).raise_for_status()
+    except httpx.HTTPError:
+      time.sleep(1)
+    else:
+      return server
+  server.terminate()
+  err_msg = f"server did not start in {SERVER_STARTUP_TIMEOUT_S}s"
+  raise RuntimeError(err_msg)
+
+
+def main() -> None:
+  """Runs the load test for each requested worker count."""
+  parser = argparse.ArgumentParser("Load tests the chat app as workers scale")
+  parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+  parser.add_argument("--url", default=None, help="test a running server instead")
+  parser.add_argument("--port", type=int, default=7900)
+  parser.add_argument("--sessions", type=int, default=20)
+  parser.add_argument("--concurrency", type=int, default=8)
+  parser.add_argument("--turns", type=int, default=1)
+  parser.add_argument("--prompt", action="append", default=None)
+  args = parser.parse_args()
+  prompts: list[str] = args.prompt or DEFAULT_PROMPTS
+
+  worker_counts: list[Optional[int]] = [None] if args.url else args.workers
+  for workers in worker_counts:
+    server = None if args.url else _start_server(workers or 1, args.port)
+    try:
+      summary = run_load(
+        args.url or f"http://127.0.0.1:{args.port}",
+        args.sessions,
+        args.concurrency,
+        args.turns,
+        prompts,
+      )
+    finally:
+      if server is not None:
+        server.terminate()
+        server.wait()
+    logger.info(json.dumps({"workers": workers, **summary}))
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,48 @@
+"""Mirrors MealDB into the local SQLite database used by `MEALDB_BACKEND=local`.
+
+Example:
+    uv run -m src.cmd.mealdb_sync
+    # offline, from / to a json snapshot of MealDB
+    uv run -m src.cmd.mealdb_sync --save-snapshot mealdb.json
+    uv run -m src.cmd.mealdb_sync --from-snapshot mealdb.json
+"""
+
+import argparse
+import json
+import logging
+from pathlib import Path
+
+from src import env
+from src.tools.mealdb_mirror import MealDBSnapshot, fetch_snapshot, write_mirror
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+  """Downloads (or loads) MealDB and writes the local mirror."""
+  parser = argparse.ArgumentParser("Mirrors MealDB into a local SQLite database")
+  parser.add_argument("--output", type=Path, default=env.MEALDB_MIRROR_PATH)
+  parser.add_argument(
+    "--from-snapshot", type=Path, default=None, help="json snapshot to mirror"
+  )
+  parser.add_argument(
+    "--save-snapshot", type=Path, default=None, help="also save a json snapshot"
+  )
+  args = parser.parse_args()
+
+  snapshot: MealDBSnapshot
+  if args.from_snapshot is not None:
+    logger.info(f"loading MealDB snapshot {args.from_snapshot}")
+    snapshot = json.loads(args.from_snapshot.read_text())
+  else:
+    logger.info("downloading MealDB...")
+    snapshot = fetch_snapshot()
+
+  if args.save_snapshot is not None:
+    args.save_snapshot.write_text(json.dumps(snapshot, indent=2, ensure_ascii=False))
+
+  write_mirror(args.output, snapshot)
+
+
+if __name__ == "__main__":
+  main()
@@ -1,41 +1,228 @@
 # from src.paprika.parser import parse
+import argparse
 import logging
-
-from pydantic import TypeAdapter
+import sys
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Optional, Sequence
 
 from src import env
+from src.paprika import tenants
 from src.paprika.chunker import Chunker
 from src.paprika.cleanse_and_enrich import clean_and_enrich_recipes
-from src.paprika.parser import Recipe, parse
-from src.paprika.vectorstore import load_chunks
+from src.paprika.parsed_dump import ParsedDumpWriter
+from src.paprika.parser import Recipe, archive_digest, parse
+from src.paprika.photos import PhotoStore
+from src.paprika.pipeline import run_pipeline
+from src.paprika.vectorstore import (
+  EMBEDDINGS_MAX_TOKENS,
+  SplitReport,
+  load_documents,
+  save_snapshot,
+  split_chunks,
+)
+from src.profiling import StageProfiler
 
 logger = logging.getLogger(__name__)
 
 
-def main() -> None:
-  """Bootstraps the vector DB by importing paprika data and creating DB."""
-  logger.info("Importing paprika data...")
+def main(argv: Optional[Sequence[str]] = None) -> None:
+  """Bootstraps the vector DB by importing paprika data and creating DB.
 
-  # 2. parse and save parsed json
-  logger.info(f"E - parsing export archive {str(env.PAPRIKA_EXPORT_PATH)}")
-  recipes = parse(env.PAPRIKA_EXPORT_PATH)
-  save_path = (
-    env.PAPRIKA_EXPORT_PATH.parent / f".{env.PAPRIKA_EXPORT_PATH.name}.parsed.json"
+  Args:
+      argv: command line arguments (default none)
+  """
+  parser = argparse.ArgumentParser("Builds the vector DB from the paprika export")
+  parser.add_argument(
+    "--profile",
+    action="store_true",
+    help="record wall/CPU time, peak RSS and item counts per stage",
+  )
+  parser.add_argument(
+    "--profile-report",
+    type=Path,
+    default=env.PAPRIKA_EXPORT_PATH.parent / "etl_profile.json",
+    help="where to write the JSON profile report",
+  )
+  parser.add_argument(
+    "--cprofile",
+    type=Path,
+    default=None,
+    help="also capture a cProfile per stage into this directory",
+  )
+  parser.add_argument(
+    "--dump-parsed",
+    action="store_true",
+    help="write the parsed recipes (without photos) as JSON Lines, for debugging",
+  )
+  parser.add_argument(
+    "--photos",
+    action="store_true",
+    help="move the recipe photos into the content-addressed store in PHOTOS_DIR "
+    "as they are parsed (deduplicated), so later stages only carry their hashes",
+  )
+  parser.add_argument(
+    "--sequential",
+    action="store_true",
+    help="run each stage over all recipes before the next one (instead of "
+    "streaming micro-batches through concurrent stages)",
+  )
+  parser.add_argument(
+    "--fresh",
+    action="store_true",
+    help="rebuild from scratch, even if an interrupted build of the same export "
+    "could be resumed",
+  )
+  parser.add_argument(
+    "--tenant",
+    action="append",
+    default=None,
+    help="build the cookbook of this tenant, from "
+    "TENANT_EXPORTS_DIR/NAME.paprikarecipes (repeatable)",
   )
-  with open(save_path, "wb") as output:
-    output.write(TypeAdapter(list[Recipe]).dump_json(recipes, indent=2))
+  parser.add_argument(
+    "--all-tenants",
+    action="store_true",
+    help="build the cookbook of every tenant with an export in TENANT_EXPORTS_DIR",
+  )
+  args = parser.parse_args([] if argv is None else argv)
+  profiler = StageProfiler(args.profile, cprofile_dir=args.cprofile)
+
+  targets: list[Optional[str]] = [None]
+  if args.all_tenants:
+    targets = list(tenants.list_tenants())
+  elif args.tenant:
+    targets = list(args.tenant)
+
+  for tenant in targets:
+    _build(tenant, args, profiler)
+
+  profiler.write(args.profile_report)
+
+
+def _build(
+  tenant: Optional[str], args: argparse.Namespace, profiler: StageProfiler
+) -> None:
+  """Builds the vector DB (and snapshot) of a cookbook.
+
+  Args:
+      tenant: whose cookbook to build, None for the default one
+      args: the command line arguments
+      profiler: profiles the stages
+  """
+  export_path = tenants.export_path(tenant)
+  # stages of the tenants are profiled separately
+  prefix = "" if tenant is None else f"{tenant}/"
+  logger.info(f"Importing paprika data{'' if tenant is None else f' of {tenant}'}...")
 
+  # an interrupted build of the same export (split the same way) is resumed
+  build_id = (
+    None
+    if args.fresh
+    else f"{archive_digest(export_path)}"
+    f"/{env.SPLITTER_MODE}/{env.SPLITTER_TOKEN_OVERLAP}"
+  )
+
+  photos = PhotoStore() if args.photos else None
+
+  with ExitStack() as stack:
+    dump = None
+    if args.dump_parsed:
+      save_path = export_path.parent / f".{export_path.name}.parsed.jsonl"
+      dump = stack.enter_context(ParsedDumpWriter(save_path))
+
+    if args.sequential:
+      # 2. parse (and optionally dump the parsed recipes in the background)
+      logger.info(f"E - parsing export archive {str(export_path)}")
+      with profiler.stage(f"{prefix}parse") as stage:
+        recipes = parse(export_path)
+        stage.items = len(recipes)
+      if dump is not None:
+        for recipe in recipes:
+          dump.write(recipe)
+      if photos is not None:
+        with profiler.stage(f"{prefix}photos") as stage:
+          recipes = [photos.extract(recipe) for recipe in recipes]
+          stage.items = photos.written
+
+      _transform_and_load(recipes, profiler, build_id, tenant)
+    else:
+      # 2-4. stream the recipes from the archive through all the stages
+      logger.info(f"ETL - streaming export archive {str(export_path)}")
+      with profiler.stage(f"{prefix}pipeline") as stage:
+        stats = run_pipeline(
+          export_path,
+          on_parsed=dump.write if dump is not None else None,
+          build_id=build_id,
+          tenant=tenant,
+          photos=photos,
+        )
+        stage.items = stats.documents
+      if stats.split is not None:
+        _log_split_report(stats.split)
+
+    # 5. export the read-only snapshot shared by app workers
+    logger.info("L: export vector snapshot")
+    with profiler.stage(f"{prefix}export_snapshot"):
+      save_snapshot(tenant=tenant)
+
+    # wait for the dump (if any) to be written
+    with profiler.stage(f"{prefix}dump_parsed"):
+      stack.close()
+
+
+def _transform_and_load(
+  recipes: list[Recipe],
+  profiler: StageProfiler,
+  build_id: Optional[str],
+  tenant: Optional[str] = None,
+) -> None:
+  """Cleans and chunks the parsed recipes, then loads them into the vector DB.
+
+  Args:
+      recipes: the parsed recipes
+      profiler: profiles the stages
+      build_id: identifies the build, to resume it if interrupted
+      tenant: whose cookbook to load, None for the default one
+  """
+  prefix = "" if tenant is None else f"{tenant}/"
   # 3. do basic data cleaning
   logger.info("T - initial data cleaning & preprocessing (1/2)")
-  enriched_recipes = clean_and_enrich_recipes(recipes)
+  with profiler.stage(f"{prefix}clean_and_enrich") as stage:
+    enriched_recipes = clean_and_enrich_recipes(recipes)
+    stage.items = len(enriched_recipes)
 
   logger.info("T - user space chunking (2/2)")
-  chunks = Chunker.make_chunks(enriched_recipes)
+  with profiler.stage(f"{prefix}chunk") as stage:
+    chunks = Chunker.make_chunks(enriched_recipes)
+    stage.items = len(chunks)
 
   # 4. load the data to the vector db
   logger.info("L: load to DB")
-  load_chunks(chunks)
+  with profiler.stage(f"{prefix}split") as stage:
+    report = SplitReport() if env.SPLITTER_MODE == "tokens" else None
+    docs = split_chunks(chunks, report=report)
+    stage.items = len(docs)
+  if report is not None:
+    _log_split_report(report)
+  with profiler.stage(f"{prefix}embed_and_load") as stage:
+    load_documents(docs, build_id=build_id, tenant=tenant)
+    stage.items = len(docs)
+
+
+def _log_split_report(report: SplitReport) -> None:
+  """Logs how many chunks exceeded the sequence limit of the embedding model.
+
+  Args:
+      report: the report of the splitting
+  """
+  logger.info(
+    f"T: split {report.chunks} chunks into {report.documents} documents, "
+    f"{report.over_limit} chunks over the {EMBEDDINGS_MAX_TOKENS} token limit "
+    f"were split by tokens ({report.truncated_by_characters} documents were "
+    f"truncated when splitting by characters, {report.truncated} now)"
+  )
 
 
 if __name__ == "__main__":
-  main()
+  main(sys.argv[1:])
@@ -1,27 +1,199 @@
 import argparse
 import gzip
 import json
+import multiprocessing
+import os
 import zipfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
+from typing import Any, Iterator, Optional, Sequence, TextIO
 
+READ_CHUNK_SIZE = 1 << 16
+"""Number of characters read from the cookbook JSON at a time when streaming"""
+BATCH_SIZE = 32
+"""Number of recipes compressed per process pool task when streaming"""
 
-def main() -> None:
-  """Converts paprika cookbook JSON to paprika export format."""
+
+def iter_json_array(fd: TextIO, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Any]:
+  """Decodes the items of a JSON array one by one, reading the file
+  incrementally (so only the items being decoded are in memory).
+
+  Args:
+      fd: the file, holding a JSON array
+      chunk_size: number of characters to read at a time
+
+  Yields:
+      the decoded items
+
+  Raises:
+      ValueError: if the file is not a JSON array
+  """
+  decoder = json.JSONDecoder()
+  buffer = ""
+  eof = False
+
+  def read() -> None:
+    nonlocal buffer, eof
+    # an item longer than the buffer is read in growing chunks, so that it is
+    # decoded a logarithmic (rather than linear) number of times
+    chunk = fd.read(max(chunk_size, len(buffer)))
+    eof = not chunk
+    buffer += chunk
+
+  def next_char() -> str:
+    """Drops whitespace, reading until a character is buffered ("" at the end)."""
+    nonlocal buffer
+    while True:
+      buffer = buffer.lstrip()
+      if buffer or eof:
+        return buffer[:1]
+      read()
+
+  if next_char() != "[":
+    err_msg = "expected a JSON array"
+    raise ValueError(err_msg)
+  buffer = buffer[1:]
+  if next_char() == "]":
+    return
+
+  while True:
+    try:
+      item, end = decoder.raw_decode(buffer)
+    except json.JSONDecodeError:
+      if eof:
+        raise
+      read()
+      continue
+    if end == len(buffer) and not eof:
+      # the item may continue in the next chunk (i.e. a number)
+      read()
+      continue
+    yield item
+
+    buffer = buffer[end:]
+    separator = next_char()
+    if separator == "]":
+      return
+    if separator != ",":
+      err_msg = f"expected ',' or ']' after an array item, got {separator!r}"
+      raise ValueError(err_msg)
+    buffer = buffer[1:]
+    next_char()
+
+
+def _compress(recipes: list[dict[str, Any]]) -> list[tuple[str, bytes]]:
+  """Compresses recipes into zip members (in a pool process).
+
+  Args:
+      recipes: the recipes
+
+  Returns:
+      name and content of the member of each recipe
+  """
+  return [
+    (f"{recipe['uid']}.json", gzip.compress(json.dumps(recipe).encode()))
+    for recipe in recipes
+  ]
+
+
+def repackage(input_path: Path, output_path: Path) -> None:
+  """Converts a cookbook JSON file into a paprika export, in memory.
+
+  Args:
+      input_path: the cookbook JSON (an array of recipes)
+      output_path: where to write the export
+  """
+  with open(input_path, "r") as fd:
+    recipes = json.load(fd)
+
+  with zipfile.ZipFile(output_path, "w") as archive:
+    for name, content in _compress(recipes):
+      archive.writestr(name, content)
+
+
+def repackage_streaming(
+  input_path: Path,
+  output_path: Path,
+  *,
+  workers: Optional[int] = None,
+  batch_size: int = BATCH_SIZE,
+) -> None:
+  """Converts a cookbook JSON file into a paprika export, streaming the
+  recipes through a process pool which compresses them.
+
+  Members are written in the order of the recipes. At most two batches per
+  worker are in flight, so memory stays bounded however large the cookbook.
+
+  Args:
+      input_path: the cookbook JSON (an array of recipes)
+      output_path: where to write the export
+      workers: number of compressing processes (default one per CPU)
+      batch_size: number of recipes per process pool task
+  """
+  workers = workers or os.cpu_count() or 1
+  pending: deque[Future[list[tuple[str, bytes]]]] = deque()
+
+  with (
+    open(input_path, "r") as fd,
+    zipfile.ZipFile(output_path, "w") as archive,
+    # spawned, since forking a process with threads may deadlock the children
+    ProcessPoolExecutor(
+      workers, mp_context=multiprocessing.get_context("spawn")
+    ) as pool,
+  ):
+
+    def write_oldest() -> None:
+      for name, content in pending.popleft().result():
+        archive.writestr(name, content)
+
+    recipes = iter_json_array(fd)
+    while batch := list(islice(recipes, batch_size)):
+      pending.append(pool.submit(_compress, batch))
+      if len(pending) >= 2 * workers:
+        write_oldest()
+    while pending:
+      write_oldest()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+  """Converts paprika cookbook JSON to paprika export format.
+
+  Args:
+      argv: command line arguments (default `sys.argv`)
+  """
   parser = argparse.ArgumentParser(
     "Converts paprika cookbook JSON to paprika export format"
   )
   parser.add_argument("input", type=Path)
   parser.add_argument("output", type=Path)
-  args = parser.parse_args()
-
-  with open(args.input, "r") as fd:
-    recipes = json.load(fd)
+  parser.add_argument(
+    "--stream",
+    action="store_true",
+    help="read the recipes incrementally and compress them in a process pool "
+    "(bounded memory, for large cookbooks)",
+  )
+  parser.add_argument(
+    "--workers",
+    type=int,
+    default=None,
+    help="number of compressing processes when streaming (default one per CPU)",
+  )
+  parser.add_argument(
+    "--batch-size",
+    type=int,
+    default=BATCH_SIZE,
+    help="number of recipes per compression task when streaming",
+  )
+  args = parser.parse_args(argv)
 
-  with zipfile.ZipFile(args.output, "w") as archive:
-    for recipe in recipes:
-      archive.writestr(
-        f"{recipe['uid']}.json", gzip.compress(json.dumps(recipe).encode())
-      )
+  if args.stream:
+    repackage_streaming(
+      args.input, args.output, workers=args.workers, batch_size=args.batch_size
+    )
+  else:
+    repackage(args.input, args.output)
 
 
 if __name__ == "__main__":
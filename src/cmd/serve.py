@@ -0,0 +1,250 @@
+"""Serves the chat app from several worker processes behind a local,
+session-sticky load balancer.
+
+Each worker is a full app process (own event loop, agent and embedding
+model), so CPU bound embedding work scales past a single Python process.
+The balancer pins every browser session to one worker with a cookie, since
+gradio keeps the chat state of a session in the worker that created it.
+
+Workers share the on-disk caches and, unless `VECTOR_BACKEND` says otherwise,
+map the read-only vector snapshot so the index is held in memory only once.
+
+Example:
+    uv run -m src.cmd.serve --workers 4 --port 7860
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import time
+from contextlib import asynccontextmanager
+from multiprocessing.process import BaseProcess
+from typing import AsyncIterator, Optional
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+
+from src import env
+
+logger = logging.getLogger(__name__)
+
+STICKY_COOKIE = "cheffy_worker"
+"""Cookie holding the index of the worker a session is pinned to"""
+HOP_BY_HOP_HEADERS = {
+  "connection",
+  "keep-alive",
+  "proxy-authenticate",
+  "proxy-authorization",
+  "te",
+  "trailer",
+  "transfer-encoding",
+  "upgrade",
+  "host",
+}
+WORKER_STARTUP_TIMEOUT_S = 300
+
+
+class Balancer:
+  """Reverse proxy which pins sessions to workers, sending new sessions to
+  the worker with the fewest requests in flight.
+  """
+
+  def __init__(
+    self,
+    upstreams: list[str],
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+  ) -> None:
+    """Creates the balancer.
+
+    Args:
+        upstreams: base URLs of the workers
+        transport: transport used to reach the workers (default network)
+    """
+    self.upstreams = upstreams
+    self.in_flight = [0] * len(upstreams)
+    # no timeout since gradio streams responses for the whole agent turn
+    self.client = httpx.AsyncClient(timeout=None, transport=transport)
+
+  def pick(self, request: Request) -> tuple[int, bool]:
+    """Picks the worker for a request.
+
+    Args:
+        request: the incoming request
+
+    Returns:
+        tuple of [worker index, whether the session is new]
+    """
+    sticky = request.cookies.get(STICKY_COOKIE, "")
+    if sticky.isdigit() and int(sticky) < len(self.upstreams):
+      return int(sticky), False
+    return min(range(len(self.upstreams)), key=self.in_flight.__getitem__), True
+
+  async def proxy(self, request: Request) -> Response:
+    """Forwards a request to its worker and streams back the response.
+
+    Args:
+        request: the incoming request
+
+    Returns:
+        the (streaming) response of the worker
+    """
+    worker, is_new_session = self.pick(request)
+    url = httpx.URL(
+      self.upstreams[worker],
+      path=request.url.path,
+      query=request.url.query.encode() or None,
+    )
+    headers = [
+      (name, value)
+      for name, value in request.headers.raw
+      if name.decode().lower() not in HOP_BY_HOP_HEADERS
+    ]
+    # workers build absolute URLs (i.e. of files) from the host and scheme of
+    # the client, which talks to the balancer, unless a proxy in front did
+    forwarded = {name.decode().lower() for name, _ in headers}
+    if "x-forwarded-host" not in forwarded and "host" in request.headers:
+      headers.append((b"x-forwarded-host", request.headers["host"].encode()))
+    if "x-forwarded-proto" not in forwarded:
+      headers.append((b"x-forwarded-proto", request.url.scheme.encode()))
+
+    self.in_flight[worker] += 1
+    try:
+      upstream = await self.client.send(
+        self.client.build_request(
+          request.method, url, headers=headers, content=request.stream()
+        ),
+        stream=True,
+      )
+    except httpx.HTTPError as e:
+      self.in_flight[worker] -= 1
+      logger.warning(f"worker {worker} unreachable: {e}")
+      return Response(status_code=502, content=f"worker {worker} unreachable")
+
+    async def release() -> None:
+      await upstream.aclose()
+      self.in_flight[worker] -= 1
+
+    async def body() -> AsyncIterator[bytes]:
+      async for chunk in upstream.aiter_raw():
+        yield chunk
+
+    response = StreamingResponse(
+      body(), status_code=upstream.status_code, background=BackgroundTask(release)
+    )
+    # keep raw headers so repeated ones (i.e. set-cookie) survive
+    response.raw_headers = [
+      (name, value)
+      for name, value in upstream.headers.raw
+      if name.decode().lower() not in HOP_BY_HOP_HEADERS
+    ]
+    if is_new_session:
+      response.set_cookie(STICKY_COOKIE, str(worker), httponly=True, samesite="lax")
+    return response
+
+  def app(self) -> Starlette:
+    """Creates the ASGI app of the balancer.
+
+    Returns:
+        the starlette app
+    """
+
+    @asynccontextmanager
+    async def lifespan(_: Starlette) -> AsyncIterator[None]:
+      yield
+      await self.client.aclose()
+
+    methods = ["GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"]
+    return Starlette(
+      routes=[Route("/{path:path}", self.proxy, methods=methods)],
+      lifespan=lifespan,
+    )
+
+
+def _run_worker(port: int) -> None:
+  """Entrypoint of a worker process.
+
+  Args:
+      port: the port the worker's app listens on
+  """
+  from src.app import launch
+
+  launch(host="127.0.0.1", port=port)
+
+
+def _wait_until_ready(url: str, process: BaseProcess) -> None:
+  """Blocks until a worker answers HTTP requests.
+
+  Args:
+      url: base URL of the worker
+      process: the worker process
+
+  Raises:
+      RuntimeError: if the worker dies or does not start in time
+  """
+  deadline = time.monotonic() + WORKER_STARTUP_TIMEOUT_S
+  while time.monotonic() < deadline:
+    if not process.is_alive():
+      err_msg = f"worker at {url} exited with {process.exitcode}"
+      raise RuntimeError(err_msg)
+    try:
+      httpx.get(url, timeout=1)
+    except httpx.HTTPError:
+      time.sleep(0.5)
+    else:
+      return
+  err_msg = f"worker at {url} did not start in {WORKER_STARTUP_TIMEOUT_S}s"
+  raise RuntimeError(err_msg)
+
+
+def main() -> None:
+  """Starts the workers and the load balancer in front of them."""
+  parser = argparse.ArgumentParser(
+    "Serves the chat app from several workers behind a sticky load balancer"
+  )
+  parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+  parser.add_argument("--host", default="127.0.0.1")
+  parser.add_argument("--port", type=int, default=7860)
+  parser.add_argument(
+    "--worker-port", type=int, default=None, help="first worker port (port + 1)"
+  )
+  args = parser.parse_args()
+
+  # workers are spawned (fresh interpreters), so they pick this up on import
+  os.environ.setdefault("VECTOR_BACKEND", "snapshot")
+  # each worker has its own Gemini rate limiter, so split the budget
+  os.environ["GEMINI_REQUESTS_PER_MINUTE"] = str(
+    env.GEMINI_REQUESTS_PER_MINUTE / args.workers
+  )
+
+  first_port = args.worker_port or args.port + 1
+  ports = [first_port + i for i in range(args.workers)]
+  context = multiprocessing.get_context("spawn")
+  processes = [
+    context.Process(target=_run_worker, args=(port,), name=f"worker-{port}")
+    for port in ports
+  ]
+  upstreams = [f"http://127.0.0.1:{port}" for port in ports]
+
+  try:
+    for process in processes:
+      process.start()
+    for url, process in zip(upstreams, processes, strict=True):
+      _wait_until_ready(url, process)
+    logger.info(f"{len(processes)} workers ready, serving on {args.host}:{args.port}")
+
+    uvicorn.run(Balancer(upstreams).app(), host=args.host, port=args.port)
+  finally:
+    for process in processes:
+      process.terminate()
+    for process in processes:
+      process.join()
+
+
+if __name__ == "__main__":
+  main()
@@ -46,3 +46,122 @@ API_CACHE_DB_PATH = Path(
 )
 
 GEMINI_API_KEY = _get_or_fail("GEMINI_API_KEY")
+
+# vector store backend selection and index tuning
+VECTOR_BACKEND = get("VECTOR_BACKEND", "chroma")
+"""Which vector store `connect()` opens: `chroma`, `matrix` or `snapshot`"""
+
+CHROMA_HNSW_SPACE = get("CHROMA_HNSW_SPACE", "l2")
+CHROMA_HNSW_CONSTRUCTION_EF = int(get("CHROMA_HNSW_CONSTRUCTION_EF", "100"))
+CHROMA_HNSW_SEARCH_EF = int(get("CHROMA_HNSW_SEARCH_EF", "100"))
+CHROMA_HNSW_M = int(get("CHROMA_HNSW_M", "16"))
+CHROMA_HNSW_BATCH_SIZE = int(get("CHROMA_HNSW_BATCH_SIZE", "100"))
+CHROMA_HNSW_SYNC_THRESHOLD = int(get("CHROMA_HNSW_SYNC_THRESHOLD", "1000"))
+CHROMA_HNSW_NUM_THREADS = int(get("CHROMA_HNSW_NUM_THREADS", "0"))
+"""Number of threads used to build the index, 0 lets chroma decide"""
+
+MATRIX_DTYPE = get("MATRIX_DTYPE", "float16")
+"""Storage type of the `matrix` backend vectors: `float16` or `int8`"""
+MATRIX_INDEX = get("MATRIX_INDEX", "flat")
+"""Search strategy of the `matrix` backend: `flat` (brute force) or `ivf`"""
+MATRIX_IVF_NLIST = int(get("MATRIX_IVF_NLIST", "0"))
+"""Number of IVF partitions, 0 picks sqrt(# of vectors)"""
+MATRIX_IVF_NPROBE = int(get("MATRIX_IVF_NPROBE", "8"))
+"""Number of IVF partitions scanned per query"""
+
+# ETL pipeline
+ETL_BATCH_SIZE = int(get("ETL_BATCH_SIZE", "64"))
+"""Number of recipes per micro-batch flowing through the ETL pipeline"""
+ETL_QUEUE_SIZE = int(get("ETL_QUEUE_SIZE", "4"))
+"""Number of micro-batches buffered between two ETL stages"""
+SPLITTER_MODE = get("SPLITTER_MODE", "characters")
+"""How the ETL splits long chunks: `characters` (by length) or `tokens` (by the
+embedding model's tokenizer, at its sequence limit)"""
+SPLITTER_TOKEN_OVERLAP = int(get("SPLITTER_TOKEN_OVERLAP", "32"))
+"""Number of tokens shared by consecutive pieces of a chunk split by tokens"""
+PHOTOS_DIR = Path(get("PHOTOS_DIR", str(REPO_ROOT / "resources/photos")))
+"""Content-addressed store the ETL moves the recipe photos to (see
+`src.paprika.photos`)"""
+VECTOR_STORE_KEEP_VERSIONS = int(get("VECTOR_STORE_KEEP_VERSIONS", "2"))
+"""Number of built vector db versions kept (the live one included), so that apps
+still serving the previous one keep it until they reconnect"""
+INDEX_RELOAD_INTERVAL_S = float(get("INDEX_RELOAD_INTERVAL_S", "0"))
+"""How often the app checks for a new vector db version to swap in, 0 never"""
+INDEX_REBUILD_ON_EXPORT_CHANGE = get(
+  "INDEX_REBUILD_ON_EXPORT_CHANGE", "false"
+).lower() in {"1", "true"}
+"""Whether the app also rebuilds the vector db when the export changes"""
+
+# tenants
+MULTI_TENANT = get("MULTI_TENANT", "false").lower() in {"1", "true"}
+"""Whether every session searches the cookbook of its own tenant"""
+TENANT_EXPORTS_DIR = Path(
+  get("TENANT_EXPORTS_DIR", str(REPO_ROOT / "resources/paprika/tenants"))
+)
+"""Directory holding the paprika export of each tenant (`<tenant>.paprikarecipes`)"""
+TENANT_CACHE_SIZE = int(get("TENANT_CACHE_SIZE", "8"))
+"""Number of idle tenant vector stores kept open"""
+
+# serving limits
+APP_CONCURRENCY_LIMIT = int(get("APP_CONCURRENCY_LIMIT", "4"))
+"""Number of chat turns a worker runs at once"""
+APP_MAX_QUEUE_SIZE = int(get("APP_MAX_QUEUE_SIZE", "32"))
+"""Number of chat turns which may wait for a free slot before new ones are refused"""
+APP_RENDER_MODE = get("APP_RENDER_MODE", "per_message")
+"""How often a turn updates the chat: `per_message` after each rendered
+message, `batched` once per agent message (see `render_turn`)"""
+APP_TOOL_OUTPUT_MAX_CHARS = int(get("APP_TOOL_OUTPUT_MAX_CHARS", "2000"))
+"""Maximum number of characters of a tool output shown in the chat (longer ones
+are cut and collapsed), 0 unlimited"""
+GEMINI_REQUESTS_PER_MINUTE = float(get("GEMINI_REQUESTS_PER_MINUTE", "15"))
+"""Gemini requests per minute of a worker (token bucket refill rate), 0 disables"""
+GEMINI_RATE_LIMIT_BURST = int(get("GEMINI_RATE_LIMIT_BURST", "3"))
+"""Number of Gemini requests which may be sent back to back (bucket size)"""
+
+# blocking work offloaded from the event loop
+IO_POOL_THREADS = int(get("IO_POOL_THREADS", "16"))
+"""Threads for blocking network and SQLite calls (MealDB, caches)"""
+RETRIEVAL_POOL_THREADS = int(get("RETRIEVAL_POOL_THREADS", "2"))
+"""Threads for query embedding + vector search"""
+EVENT_LOOP_LAG_INTERVAL_S = float(get("EVENT_LOOP_LAG_INTERVAL_S", "0.5"))
+"""How often the event loop lag is measured, 0 disables the monitor"""
+EVENT_LOOP_LAG_WARN_S = float(get("EVENT_LOOP_LAG_WARN_S", "0.1"))
+"""Event loop lag above which a warning is logged"""
+
+MEALDB_BASE_URL = get("MEALDB_BASE_URL", "https://www.themealdb.com/api/json/v1/1")
+"""MealDB API the tools (and the mirror sync) call"""
+MEALDB_MAX_RESULTS = int(get("MEALDB_MAX_RESULTS", "10"))
+"""Maximum number of meals a MealDB tool returns to the agent"""
+MEALDB_BACKEND = get("MEALDB_BACKEND", "api")
+"""Where the MealDB tools get their data: `api` (network) or `local` (mirror)"""
+MEALDB_MIRROR_PATH = Path(
+  get("MEALDB_MIRROR_PATH", str(REPO_ROOT / "resources/tools/mealdb.db"))
+)
+MEALDB_REFRESH_INTERVAL_S = float(get("MEALDB_REFRESH_INTERVAL_S", "86400"))
+"""Maximum age of the local MealDB mirror before it is re-synced, 0 never"""
+
+RETRIEVAL_SCORE_THRESHOLD = float(get("RETRIEVAL_SCORE_THRESHOLD", "0"))
+"""Minimum relevance (0 to 1) of a retrieved chunk, so that between 0 and k are
+returned, 0 always returns k (see `src.cmd.calibrate_retrieval`)"""
+RETRIEVAL_DOC_MAX_CHARS = int(get("RETRIEVAL_DOC_MAX_CHARS", "0"))
+"""Maximum number of characters of each retrieved chunk passed to the agent, 0
+unlimited"""
+
+SPECULATIVE_RETRIEVAL = get("SPECULATIVE_RETRIEVAL", "false").lower() in {"1", "true"}
+"""Whether to search for the prompt while the model plans its first call"""
+SPECULATIVE_RETRIEVAL_OVERLAP = float(get("SPECULATIVE_RETRIEVAL_OVERLAP", "0.75"))
+"""Share of words a retriever query and the prompt must have in common (of
+the larger of the two) to use the prefetched result"""
+
+LATENCY_TRACING = get("LATENCY_TRACING", "false").lower() in {"1", "true"}
+"""Whether to time and log the phases (spans) of every chat turn"""
+METRICS_DUMP_INTERVAL_S = float(get("METRICS_DUMP_INTERVAL_S", "0"))
+"""How often the app logs all metrics as JSON, 0 never"""
+
+LOG_MODE = get("LOG_MODE", "debug")
+"""`debug` logs everything as it happens, `production` keeps logging off the
+streaming hot path (background writer, sampled and truncated chunk logs)"""
+LOG_PAYLOAD_MAX_CHARS = int(get("LOG_PAYLOAD_MAX_CHARS", "500"))
+"""Maximum length of logged payloads (i.e. chunks) in production mode"""
+LOG_CHUNK_SAMPLE_RATE = float(get("LOG_CHUNK_SAMPLE_RATE", "0.05"))
+"""Share of streamed chunks logged in production mode"""
@@ -0,0 +1,145 @@
+"""Dedicated thread pools for blocking work, and an event loop lag monitor.
+
+The app serves every session from one event loop, so blocking calls (HTTP
+requests, SQLite, embedding + vector search) must not run on it. Tools and
+caches hand that work to one of the pools below, sized independently so a
+burst of slow MealDB requests cannot starve retrieval and vice versa:
+
+- `io_pool`: network and SQLite calls (MealDB, API cache, LLM cache)
+- `retrieval_pool`: query embedding + vector search, which is CPU bound but
+  releases the GIL in torch/numpy, so threads run it in parallel while
+  sharing the one embedding model and index of the process
+"""
+
+import asyncio
+import contextvars
+import inspect
+import logging
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import lru_cache, partial
+from typing import Any, Callable, TypeVar
+
+from langchain_core.tools import BaseTool, StructuredTool
+
+from src import env, metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+ToolT = TypeVar("ToolT", bound=BaseTool)
+
+
+@lru_cache(maxsize=1)
+def io_pool() -> ThreadPoolExecutor:
+  """Pool for blocking network and SQLite calls."""
+  return ThreadPoolExecutor(env.IO_POOL_THREADS, thread_name_prefix="io")
+
+
+@lru_cache(maxsize=1)
+def retrieval_pool() -> ThreadPoolExecutor:
+  """Pool for query embedding and vector search."""
+  return ThreadPoolExecutor(env.RETRIEVAL_POOL_THREADS, thread_name_prefix="retrieval")
+
+
+async def run_in(
+  pool: Executor, func: Callable[..., T], *args: object, **kwargs: object
+) -> T:
+  """Runs a blocking function on a pool without blocking the event loop.
+
+  Unlike `loop.run_in_executor`, the function runs in a copy of the caller's
+  context, so langchain callbacks and tracing still see the current run.
+
+  Args:
+      pool: the pool to run on
+      func: the blocking function
+      *args: positional arguments of the function
+      **kwargs: keyword arguments of the function
+
+  Returns:
+      the return value of the function
+  """
+  context = contextvars.copy_context()
+  loop = asyncio.get_running_loop()
+  return await loop.run_in_executor(pool, partial(context.run, func, *args, **kwargs))
+
+
+def run_on(pool: Callable[[], Executor]) -> Callable[[ToolT], ToolT]:
+  """Decorator making async invocations of a sync tool run on a pool (by
+  default langchain runs them on the loop's shared default executor).
+
+  Args:
+      pool: function returning the pool, called on first use
+
+  Returns:
+      decorator which sets the coroutine of the tool
+  """
+
+  def decorator(tool: ToolT) -> ToolT:
+    assert isinstance(tool, StructuredTool) and tool.func is not None, (
+      f"wanted a sync structured tool, got {tool!r}"
+    )
+    func = tool.func
+
+    async def coroutine(*args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+      return await run_in(pool(), func, *args, **kwargs)
+
+    # langchain inspects the signature to decide whether to pass callbacks
+    coroutine.__signature__ = inspect.signature(func)  # type: ignore[attr-defined]
+    tool.coroutine = coroutine
+    return tool
+
+  return decorator
+
+
+class EventLoopLagMonitor(threading.Thread):
+  """Background thread which periodically schedules a no-op on an event loop
+  and measures how late it runs, i.e. how long the loop was blocked.
+  """
+
+  def __init__(self, loop: asyncio.AbstractEventLoop, interval_s: float) -> None:
+    """Creates the (not yet started) monitor.
+
+    Args:
+        loop: the loop to monitor
+        interval_s: time between two measurements
+    """
+    super().__init__(name="event-loop-lag", daemon=True)
+    self.loop = loop
+    self.interval_s = interval_s
+
+  def run(self) -> None:
+    """Measures the lag until the loop is closed."""
+    while not self.loop.is_closed():
+      ran = threading.Event()
+      start = time.perf_counter()
+      try:
+        self.loop.call_soon_threadsafe(ran.set)
+      except RuntimeError:  # closed in the meantime
+        return
+      while not ran.wait(self.interval_s):
+        if self.loop.is_closed():
+          return
+
+      lag = time.perf_counter() - start
+      metrics.histogram("event_loop_lag_s").observe(lag)
+      if lag > env.EVENT_LOOP_LAG_WARN_S:
+        logger.warning(f"event loop was blocked for {lag * 1000:.0f}ms")
+      time.sleep(self.interval_s)
+
+
+_watched_lock = threading.Lock()
+_watched_loops: set[int] = set()
+
+
+def watch_event_loop() -> None:
+  """Starts monitoring the lag of the running event loop (once per loop)."""
+  if env.EVENT_LOOP_LAG_INTERVAL_S <= 0:
+    return
+  loop = asyncio.get_running_loop()
+  with _watched_lock:
+    if id(loop) in _watched_loops:
+      return
+    _watched_loops.add(id(loop))
+  EventLoopLagMonitor(loop, env.EVENT_LOOP_LAG_INTERVAL_S).start()
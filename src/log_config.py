@@ -0,0 +1,136 @@
+"""Logging modes of the app.
+
+- `debug` (default): every record is formatted and written by the thread
+  which logs it, and streamed chunks are logged in full.
+- `production`: keeps logging off the streaming hot path. Records are put on
+  a queue and formatted and written by a background listener thread, chunk
+  logs are sampled, and their payloads are truncated.
+
+Payloads (i.e. streamed chunks) are logged with `truncated`, which defers
+formatting them until the record is actually written, so a record which is
+filtered out never formats its payload.
+"""
+
+import atexit
+import logging
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+CHUNK_LOGGER = "src.agent.chunks"
+"""Logger of the chunks streamed by the agent (sampled in production mode)"""
+
+_payload_max_chars = 0
+_listener: Optional[QueueListener] = None
+
+
+class Truncated:
+  """Payload of a log record, only formatted (and truncated) when written."""
+
+  __slots__ = ("max_chars", "payload")
+
+  def __init__(self, payload: object, max_chars: int) -> None:
+    """Wraps the payload.
+
+    Args:
+        payload: the object to log
+        max_chars: maximum length of the formatted payload, 0 for no limit
+    """
+    self.payload = payload
+    self.max_chars = max_chars
+
+  def __str__(self) -> str:
+    """Formats the payload, truncating it if too long."""
+    text = str(self.payload)
+    if self.max_chars <= 0 or len(text) <= self.max_chars:
+      return text
+    return f"{text[: self.max_chars]}... ({len(text) - self.max_chars} more chars)"
+
+
+def truncated(payload: object) -> Truncated:
+  """Wraps a payload for a log record (as argument, not in an f-string).
+
+  Args:
+      payload: the object to log
+
+  Returns:
+      the lazily formatted payload, truncated in production mode
+  """
+  return Truncated(payload, _payload_max_chars)
+
+
+class SampleFilter(logging.Filter):
+  """Lets a random share of the records through."""
+
+  def __init__(self, rate: float) -> None:
+    """Creates the filter.
+
+    Args:
+        rate: share of records to keep, between 0 and 1
+    """
+    super().__init__()
+    self.rate = rate
+
+  def filter(self, record: logging.LogRecord) -> bool:
+    """Whether to keep the record."""
+    return random.random() < self.rate  # noqa: S311
+
+
+class _LazyQueueHandler(QueueHandler):
+  """Queue handler leaving the formatting of records to the listener.
+
+  The default handler formats every record before queueing it, which would
+  keep formatting on the logging thread.
+  """
+
+  def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+    """Queues the record as is."""
+    return record
+
+
+def configure(mode: str, payload_max_chars: int, chunk_sample_rate: float) -> None:
+  """(Re)configures logging for a mode, keeping the handlers of the root logger.
+
+  Args:
+      mode: `debug` or `production`
+      payload_max_chars: maximum length of logged payloads in production mode
+      chunk_sample_rate: share of chunk records logged in production mode
+
+  Raises:
+      ValueError: if the mode is unknown
+  """
+  global _listener, _payload_max_chars  # noqa: PLW0603
+  if mode not in {"debug", "production"}:
+    err_msg = f"unknown logging mode {mode}"
+    raise ValueError(err_msg)
+
+  # undo the previous configuration
+  flush()
+  root = logging.getLogger()
+  chunk_logger = logging.getLogger(CHUNK_LOGGER)
+  for chunk_filter in list(chunk_logger.filters):
+    chunk_logger.removeFilter(chunk_filter)
+  _payload_max_chars = 0
+
+  if mode == "production":
+    records: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    _listener = QueueListener(records, *root.handlers, respect_handler_level=True)
+    root.handlers = [_LazyQueueHandler(records)]
+    _listener.start()
+    chunk_logger.addFilter(SampleFilter(chunk_sample_rate))
+    _payload_max_chars = payload_max_chars
+
+
+def flush() -> None:
+  """Writes out the queued records (in production mode) and stops the
+  listener, restoring the handlers of the root logger.
+  """
+  global _listener  # noqa: PLW0603
+  if _listener is not None:
+    _listener.stop()
+    logging.getLogger().handlers = list(_listener.handlers)
+    _listener = None
+
+
+atexit.register(flush)
@@ -0,0 +1,164 @@
+"""Minimal in-process metrics (counters, gauges and latency histograms).
+
+Metrics are created on first use by name and live for the lifetime of the
+process, e.g.::
+
+    metrics.counter("mealdb_requests").inc()
+    metrics.gauge("queue_depth").set(3)
+    metrics.histogram("queue_wait_s").observe(0.25)
+
+`snapshot()` summarizes every metric into a JSON-friendly dict, which the
+app exposes through its `metrics` API endpoint.
+"""
+
+import threading
+from collections import deque
+from typing import Any
+
+import numpy as np
+
+HISTOGRAM_WINDOW = 2048
+"""Number of most recent observations a histogram keeps for percentiles"""
+
+
+class Counter:
+  """Monotonically increasing count."""
+
+  def __init__(self) -> None:
+    """Creates a counter at 0."""
+    self._lock = threading.Lock()
+    self.value = 0
+
+  def inc(self, amount: int = 1) -> None:
+    """Increments the counter.
+
+    Args:
+        amount: how much to add
+    """
+    with self._lock:
+      self.value += amount
+
+  def summary(self) -> int:
+    """Current count."""
+    return self.value
+
+
+class Gauge:
+  """Value which goes up and down, also tracking its peak."""
+
+  def __init__(self) -> None:
+    """Creates a gauge at 0."""
+    self.value = 0.0
+    self.peak = 0.0
+
+  def set(self, value: float) -> None:
+    """Sets the current value.
+
+    Args:
+        value: the new value
+    """
+    self.value = value
+    self.peak = max(self.peak, value)
+
+  def summary(self) -> dict[str, float]:
+    """Current and peak value."""
+    return {"value": self.value, "peak": self.peak}
+
+
+class Histogram:
+  """Distribution of observations (i.e. latencies) over a sliding window."""
+
+  def __init__(self) -> None:
+    """Creates an empty histogram."""
+    self._lock = threading.Lock()
+    self._window: deque[float] = deque(maxlen=HISTOGRAM_WINDOW)
+    self.count = 0
+    self.total = 0.0
+
+  def observe(self, value: float) -> None:
+    """Records an observation.
+
+    Args:
+        value: the observed value
+    """
+    with self._lock:
+      self._window.append(value)
+      self.count += 1
+      self.total += value
+
+  def reset(self) -> None:
+    """Forgets all observations, i.e. to measure a run on its own."""
+    with self._lock:
+      self._window.clear()
+      self.count = 0
+      self.total = 0.0
+
+  def summary(self) -> dict[str, float]:
+    """Count, mean and p50/p95/p99/max of the recent observations."""
+    with self._lock:
+      window = np.fromiter(self._window, dtype=np.float64)
+      count, total = self.count, self.total
+    if count == 0:
+      return {"count": 0}
+    p50, p95, p99 = np.percentile(window, [50, 95, 99])
+    return {
+      "count": count,
+      "mean": round(total / count, 6),
+      "p50": round(float(p50), 6),
+      "p95": round(float(p95), 6),
+      "p99": round(float(p99), 6),
+      "max": round(float(window.max()), 6),
+    }
+
+
+_lock = threading.Lock()
+_metrics: dict[str, Counter | Gauge | Histogram] = {}
+
+
+def _get[M: (Counter, Gauge, Histogram)](name: str, kind: type[M]) -> M:
+  """Gets or creates the metric with the given name.
+
+  Args:
+      name: name of the metric
+      kind: type of the metric
+
+  Returns:
+      the metric
+
+  Raises:
+      TypeError: if the name is already used by another kind of metric
+  """
+  with _lock:
+    metric = _metrics.get(name)
+    if metric is None:
+      metric = _metrics[name] = kind()
+  if not isinstance(metric, kind):
+    err_msg = f"metric {name} is a {type(metric).__name__}, not a {kind.__name__}"
+    raise TypeError(err_msg)
+  return metric
+
+
+def counter(name: str) -> Counter:
+  """Gets or creates the counter with the given name."""
+  return _get(name, Counter)
+
+
+def gauge(name: str) -> Gauge:
+  """Gets or creates the gauge with the given name."""
+  return _get(name, Gauge)
+
+
+def histogram(name: str) -> Histogram:
+  """Gets or creates the histogram with the given name."""
+  return _get(name, Histogram)
+
+
+def snapshot() -> dict[str, Any]:
+  """Summarizes all metrics.
+
+  Returns:
+      metric name -> summary of the metric
+  """
+  with _lock:
+    metrics = dict(_metrics)
+  return {name: metric.summary() for name, metric in sorted(metrics.items())}
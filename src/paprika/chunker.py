@@ -2,7 +2,7 @@ from pydantic import BaseModel
 
 from src.paprika.cleanse_and_enrich import Recipe
 
-SECTIONS_TO_CHUNK = {
+SECTIONS_TO_CHUNK = (
   "description",
   "name_cleaned",
   "ingredients",
@@ -11,8 +11,9 @@ SECTIONS_TO_CHUNK = {
   "nutritional_info",
   "difficulty",
   "categories_cleaned",
-}
-"""These are fields in the recipe which we want to embed."""
+)
+"""These are fields in the recipe which we want to embed (in the order the
+chunks of a recipe are made)."""
 
 
 class ChunkMetadata(BaseModel):
@@ -21,11 +22,15 @@ class ChunkMetadata(BaseModel):
   section: str
   name: str
   tags: str
+  photo_hash: str = ""
+  """Key of the recipe's photo in the photo store, empty if it has none"""
 
 
 class Chunk(BaseModel):
   """Represents a chunk content which will be embedded in RAG system."""
 
+  id: str
+  """Stable id of the chunk: `<recipe uid>/<section>`"""
   content: str
   metadata: ChunkMetadata
 
@@ -44,7 +49,7 @@ class Chunker:
         recipes: the recipes to chunk
 
     Returns:
-        the chunks of all the recipes in no particular order
+        the chunks of all the recipes, in order of the recipes and sections
     """
     chunks = []
     for recipe in recipes:
@@ -72,9 +77,13 @@ class Chunker:
       # create the chunk!
       chunks.append(
         Chunk(
+          id=f"{recipe.uid}/{section}",
           content=f"{section}: {recipe_obj[section]}",
           metadata=ChunkMetadata(
-            name=recipe.name, tags=str(recipe.categories_cleaned), section=section
+            name=recipe.name,
+            tags=str(recipe.categories_cleaned),
+            section=section,
+            photo_hash=recipe.photo_hash or "",
           ),
         )
       )
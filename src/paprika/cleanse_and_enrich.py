@@ -20,6 +20,8 @@ logger = logging.getLogger(__name__)
 class Recipe(BaseModel):
   """Represents a cleaned recipe."""
 
+  uid: str
+  """Id of the recipe in paprika, stable across exports"""
   created: datetime
 
   name: str
@@ -54,6 +56,9 @@ class Recipe(BaseModel):
   categories: list[str]
   categories_cleaned: list[str]
 
+  photo_hash: Optional[str] = None
+  """sha256 of the photo, its key in the photo store (see `src.paprika.photos`)"""
+
 
 def _2d_unique(series: pd.Series) -> np.ndarray:
   """Does numpy across 2-dimensional series.
@@ -65,6 +70,8 @@ def _2d_unique(series: pd.Series) -> np.ndarray:
       numpy array of unique elements
   """
   # inspired by method in https://stackoverflow.com/a/55189967
+  if series.empty:
+    return np.array([])
   return np.unique(np.concatenate(series.values))
 
 
@@ -139,9 +146,15 @@ def clean_and_enrich_recipes(recipes: list[RawRecipe]) -> list[Recipe]:
   Returns:
       the cleaned recipes
   """
+  if not recipes:
+    return []
+
   # convert JSON format into pandas dataframe
+  # (no date inference: columns like `prep_time` hold durations, and a small
+  # batch of recipes can look like dates)
   df = pd.read_json(
-    io.StringIO(TypeAdapter(list[RawRecipe]).dump_json(recipes).decode())
+    io.StringIO(TypeAdapter(list[RawRecipe]).dump_json(recipes).decode()),
+    convert_dates=False,
   )
   df = df.replace(r"^\s*$", pd.NA, regex=True)  # replace blanks with NA
 
@@ -152,17 +165,21 @@ def clean_and_enrich_recipes(recipes: list[RawRecipe]) -> list[Recipe]:
   # 2.1. drop useless columns
   df = df.drop(
     columns=[
-      "photo_hash",
       "photos",
       "photo",
       "image_url",
       "photo_large",
       "photo_data",
       "hash",
-      "uid",
     ]
   )
 
+  # (photos are referred to by their hash, case insensitive; in a batch
+  # without photos the column is all missing, so not of strings)
+  df["photo_hash"] = df["photo_hash"].map(
+    lambda h: h.lower() if isinstance(h, str) else None
+  )
+
   # 2.2. add column for "been tried"
   df["been_tried"] = df["rating"].apply(
     lambda x: False if x is None or x == "0" else True
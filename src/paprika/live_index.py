@@ -0,0 +1,223 @@
+"""Hot reload of the vector store served by the app.
+
+The app connects to the vector store once, and a rebuild swaps in a new
+version of it (see `DocumentWriter`) which that connection never sees.
+`LiveStore` holds the served store, and `IndexWatcher` polls for a new
+version in the background: it opens the new version, warms it with a search
+(so the first real query does not page in the index), and swaps it in. Each
+search leases the store it started with, so in-flight searches finish on the
+old version, which is closed once the last of them is done.
+
+Optionally, the watcher also rebuilds the vector store when the export
+changes, streaming it through the ETL pipeline into a new version while the
+app keeps serving the live one. With several app processes (see `serve`),
+only one of them rebuilds, the others reload the version it built.
+
+Example::
+
+    live = LiveStore()
+    IndexWatcher(live).start(env.INDEX_RELOAD_INTERVAL_S)
+    with live.use() as store:
+        docs = store.similarity_search("pancakes")
+"""
+
+import fcntl
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+from src import env, metrics
+from src.paprika.pipeline import run_pipeline
+from src.paprika.vectorstore import (
+  VectorStore,
+  close,
+  connect,
+  index_version,
+  location,
+  save_snapshot,
+)
+
+logger = logging.getLogger(__name__)
+
+WARMUP_QUERY = "easy weeknight dinner recipe"
+"""Searched on a new version before it is swapped in"""
+
+
+class LiveStore:
+  """The vector store served by the app, replaced by `IndexWatcher` with
+  new versions between searches.
+  """
+
+  def __init__(
+    self, store: Optional[VectorStore] = None, backend: Optional[str] = None
+  ) -> None:
+    """Connects to the vector store.
+
+    Args:
+        store: the store already connected to (default `connect()`)
+        backend: which vector store it is, see `connect()`
+    """
+    self.backend = backend or env.VECTOR_BACKEND
+    # read before connecting, so a version swapped in meanwhile is reloaded
+    self.version = index_version(self.backend)
+    self.store = store or connect(self.backend)
+    self._lock = threading.Lock()
+    self._leases: dict[int, int] = {}
+    """id of store -> number of searches using it"""
+    self._retired: dict[int, VectorStore] = {}
+    """replaced stores still in use, by id"""
+
+  @contextmanager
+  def use(self) -> Iterator[VectorStore]:
+    """Leases the current store for a search.
+
+    Yields:
+        the store, which is not closed until the lease ends
+    """
+    with self._lock:
+      store = self.store
+      self._leases[id(store)] = self._leases.get(id(store), 0) + 1
+    try:
+      yield store
+    finally:
+      with self._lock:
+        self._leases[id(store)] -= 1
+        retired = None
+        if not self._leases[id(store)]:
+          del self._leases[id(store)]
+          retired = self._retired.pop(id(store), None)
+      if retired is not None:
+        close(retired)
+
+  def swap(self, store: VectorStore, version: Optional[str]) -> None:
+    """Serves another store from the next search on.
+
+    Args:
+        store: the new store
+        version: its version, see `index_version()`
+    """
+    with self._lock:
+      old, self.store, self.version = self.store, store, version
+      in_use = id(old) in self._leases
+      if in_use:
+        self._retired[id(old)] = old
+    if not in_use:
+      close(old)
+
+
+class IndexWatcher:
+  """Swaps new versions of the vector store into a `LiveStore`."""
+
+  def __init__(
+    self,
+    live: LiveStore,
+    *,
+    rebuild: Optional[bool] = None,
+    export_path: Optional[Path] = None,
+  ) -> None:
+    """Creates the watcher.
+
+    Args:
+        live: the store to keep up to date
+        rebuild: whether to rebuild the vector store when the export changes
+          (default `INDEX_REBUILD_ON_EXPORT_CHANGE`)
+        export_path: the export (default `PAPRIKA_EXPORT_PATH`)
+    """
+    self.live = live
+    self.rebuild = env.INDEX_REBUILD_ON_EXPORT_CHANGE if rebuild is None else rebuild
+    self.export_path = export_path or env.PAPRIKA_EXPORT_PATH
+    self._export = self._export_version()
+
+  def _export_version(self) -> Optional[tuple[int, int]]:
+    """Modification time and size of the export, None if it is missing."""
+    if not self.export_path.exists():
+      return None
+    stat = self.export_path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+  def check(self) -> bool:
+    """Checks once for a new version (rebuilding first if the export changed),
+    and swaps it in after warming it.
+
+    Returns:
+        whether a new version was swapped in
+    """
+    # a failed rebuild is not retried until the export changes again
+    export = self._export_version()
+    changed, self._export = export != self._export, export
+    if self.rebuild and export is not None and changed:
+      self._rebuild(export)
+
+    version = index_version(self.live.backend)
+    if version is None or version == self.live.version:
+      return False
+
+    start = time.perf_counter()
+    store = connect(self.live.backend)
+    store.similarity_search(WARMUP_QUERY, k=1)
+    self.live.swap(store, version)
+    metrics.counter("index_reloads").inc()
+    logger.info(
+      f"swapped in vector store version {version} "
+      f"(opened and warmed in {time.perf_counter() - start:.2f}s)"
+    )
+    return True
+
+  def _rebuild(self, export: tuple[int, int]) -> None:
+    """Rebuilds the vector store from the export, unless another process
+    is rebuilding it or already rebuilt it from this export.
+
+    Builds of a store must not overlap, as each removes the versions of the
+    others (see `DocumentWriter`), so the rebuild holds a lock on a file
+    next to the store, which records the export the store was built from.
+
+    Args:
+        export: modification time and size of the export
+    """
+    root = location(self.live.backend)
+    lock_path = root.with_name(f".{root.name}.rebuild")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    stamp = f"{self.export_path} {export[0]} {export[1]}"
+    with open(lock_path, "a+") as fd:
+      try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+      except BlockingIOError:
+        logger.info("another process is rebuilding the vector store")
+        return
+      fd.seek(0)
+      if fd.read() == stamp:
+        return
+
+      logger.info(f"export {self.export_path} changed, rebuilding the vector store")
+      run_pipeline(self.export_path, self.live.backend)
+      if self.live.backend == "snapshot":
+        save_snapshot(self.live.backend)
+      metrics.counter("index_rebuilds").inc()
+      fd.truncate(0)
+      fd.write(stamp)
+    # (closing the file releases the lock)
+
+  def start(self, interval_s: float) -> threading.Thread:
+    """Starts a daemon thread checking for new versions periodically.
+
+    Args:
+        interval_s: seconds between two checks
+
+    Returns:
+        the thread
+    """
+
+    def watch() -> None:
+      while True:
+        time.sleep(interval_s)
+        try:
+          self.check()
+        except Exception:  # keep serving the live version
+          logger.exception("failed to reload the vector store")
+
+    thread = threading.Thread(target=watch, name="index-watcher", daemon=True)
+    thread.start()
+    return thread
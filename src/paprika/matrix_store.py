@@ -0,0 +1,578 @@
+"""An in-process vector store which keeps all embeddings in a single
+(optionally quantized) matrix on disk.
+
+The matrix is memory-mapped when loaded, so opening the store is cheap and
+the operating system only pages in the rows a query actually touches. Search
+is either exact (brute force over the whole matrix) or approximate using an
+inverted file index (IVF), where vectors are bucketed by their nearest
+k-means centroid and only the `nprobe` closest buckets are scanned.
+"""
+
+import json
+import logging
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Iterable, Literal, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore as BaseVectorStore
+
+logger = logging.getLogger(__name__)
+
+MatrixDType = Literal["float16", "int8"]
+MatrixIndex = Literal["flat", "ivf"]
+
+_BLOCK_ROWS = 65_536
+"""Rows scored at once, bounds the float32 scratch space used per query"""
+_KMEANS_ITERATIONS = 10
+_KMEANS_SAMPLES_PER_CENTROID = 64
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+  """L2 normalizes each row so that dot product == cosine similarity.
+
+  Args:
+      vectors: 2d array of vectors
+
+  Returns:
+      float32 copy of the vectors with unit length rows
+  """
+  vectors = np.asarray(vectors, dtype=np.float32)
+  norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+  norms[norms == 0] = 1.0
+  normalized: np.ndarray = vectors / norms
+  return normalized
+
+
+def _quantize(vectors: np.ndarray, dtype: MatrixDType) -> tuple[np.ndarray, np.ndarray]:
+  """Converts normalized float32 vectors into the storage representation.
+
+  int8 uses symmetric per-row scaling, so `row ~= quantized_row * scale`.
+
+  Args:
+      vectors: unit length float32 vectors
+      dtype: the storage type
+
+  Returns:
+      tuple of [stored matrix, per row scales]
+  """
+  if dtype == "float16":
+    return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+
+  scales = np.abs(vectors).max(axis=1) / 127.0
+  scales[scales == 0] = 1.0
+  quantized = np.rint(vectors / scales[:, None]).astype(np.int8)
+  return quantized, scales.astype(np.float32)
+
+
+def _spherical_kmeans(vectors: np.ndarray, nlist: int, seed: int = 0) -> np.ndarray:
+  """Trains centroids for the IVF index on a sample of the vectors.
+
+  Args:
+      vectors: unit length float32 vectors
+      nlist: the number of centroids
+      seed: seed for sampling and initialization
+
+  Returns:
+      unit length centroids with shape (nlist, dim)
+  """
+  rng = np.random.default_rng(seed)
+  n_samples = min(len(vectors), nlist * _KMEANS_SAMPLES_PER_CENTROID)
+  sample = vectors[rng.choice(len(vectors), n_samples, replace=False)]
+  centroids = sample[rng.choice(n_samples, nlist, replace=False)].copy()
+
+  for _ in range(_KMEANS_ITERATIONS):
+    assignment = np.argmax(sample @ centroids.T, axis=1)
+    for i in range(nlist):
+      members = sample[assignment == i]
+      # re-seed empty clusters with a random point so none are wasted
+      centroids[i] = (
+        members.sum(axis=0) if len(members) else sample[rng.integers(n_samples)]
+      )
+    centroids = _normalize(centroids)
+  return centroids
+
+
+class MatrixVectorStore(BaseVectorStore):
+  """Vector store backed by a memory-mapped float16/int8 matrix.
+
+  Similarity is always cosine similarity. Writes are buffered in memory
+  and only reach disk on `persist()`: added rows are kept as blocks, which
+  are appended to the matrix in one copy when it is next read (instead of
+  copying the whole matrix on every add).
+  """
+
+  VECTORS_FILE = "vectors.npy"
+  SCALES_FILE = "scales.npy"
+  CENTROIDS_FILE = "ivf_centroids.npy"
+  ASSIGNMENTS_FILE = "ivf_assignments.npy"
+  RECORDS_FILE = "records.jsonl"
+  META_FILE = "meta.json"
+
+  def __init__(  # noqa: PLR0913
+    self,
+    embedding_function: Embeddings,
+    persist_directory: Path,
+    *,
+    dtype: MatrixDType = "float16",
+    index: MatrixIndex = "flat",
+    nlist: int = 0,
+    nprobe: int = 8,
+  ) -> None:
+    """Opens (or creates) the store in the given directory.
+
+    Args:
+        embedding_function: model used to embed documents and queries
+        persist_directory: directory the matrix and records live in
+        dtype: storage type of the vectors, used when (re)writing the matrix
+        index: `flat` for exact search or `ivf` for approximate search
+        nlist: number of IVF partitions, 0 picks sqrt(# of vectors)
+        nprobe: number of IVF partitions scanned per query
+    """
+    self._embedding_function = embedding_function
+    self.persist_directory = persist_directory
+    self.dtype: MatrixDType = dtype
+    self.index: MatrixIndex = index
+    self.nlist = nlist
+    self.nprobe = nprobe
+
+    self._vectors: np.ndarray = np.zeros((0, 0), dtype=np.float16)
+    self._scales: np.ndarray = np.zeros(0, dtype=np.float32)
+    self._centroids: Optional[np.ndarray] = None
+    self._lists: list[np.ndarray] = []
+    self._records: list[dict[str, Any]] = []
+    self._id_to_row: dict[str, int] = {}
+    self._pending: list[tuple[np.ndarray, np.ndarray]] = []
+    """added (vectors, scales) blocks, not appended to the matrix yet"""
+    self._dirty = False
+
+    self._recover()
+    if (persist_directory / self.META_FILE).exists():
+      self._load()
+
+  @property
+  def embeddings(self) -> Embeddings:
+    """The embedding model used by this store."""
+    return self._embedding_function
+
+  def __len__(self) -> int:
+    """Number of vectors in the store."""
+    return len(self._records)
+
+  def _record(self, row: int) -> dict[str, Any]:
+    """The id, page_content and metadata stored for a row of the matrix."""
+    return self._records[row]
+
+  def _retired(self) -> list[Path]:
+    """Previous directories of the store, set aside while persisting."""
+    return sorted(
+      self.persist_directory.parent.glob(f".{self.persist_directory.name}.*.old")
+    )
+
+  def _recover(self) -> None:
+    """Restores the previous directory of the store if a crash while
+    persisting left none (see `persist()`).
+    """
+    retired = self._retired()
+    if retired and not self.persist_directory.exists():
+      logger.warning(f"restoring {self.persist_directory} from {retired[-1]}")
+      os.replace(retired[-1], self.persist_directory)
+
+  def _consolidate(self) -> None:
+    """Appends the added blocks to the matrix, in a single copy."""
+    if not self._pending:
+      return
+    blocks = [vectors for vectors, _ in self._pending]
+    scales = [block_scales for _, block_scales in self._pending]
+    if len(self._vectors):
+      blocks.insert(0, self._vectors)
+      scales.insert(0, self._scales)
+    self._vectors = np.concatenate(blocks)
+    self._scales = np.concatenate(scales)
+    self._pending = []
+
+  def _load(self) -> None:
+    """Memory-maps the persisted matrix and reads the records."""
+    meta = json.loads((self.persist_directory / self.META_FILE).read_text())
+    self.dtype = meta["dtype"]
+    self._vectors = np.load(self.persist_directory / self.VECTORS_FILE, mmap_mode="r")
+    self._scales = np.load(self.persist_directory / self.SCALES_FILE)
+
+    with open(self.persist_directory / self.RECORDS_FILE, "r") as fd:
+      self._records = [json.loads(line) for line in fd]
+    self._id_to_row = {record["id"]: i for i, record in enumerate(self._records)}
+
+    self._centroids = None
+    if meta["index"] == "ivf" and self.index == "ivf":
+      self._centroids = np.load(self.persist_directory / self.CENTROIDS_FILE)
+      assignments = np.load(self.persist_directory / self.ASSIGNMENTS_FILE)
+      self._lists = self._invert(assignments, len(self._centroids))
+
+    logger.info(
+      f"opened matrix store with {len(self)} vectors "
+      f"({meta['dtype']}, {meta['index']}) from {self.persist_directory}"
+    )
+
+  def persist(self, *, train_index: bool = True) -> None:
+    """Writes pending changes to disk and re-maps the written matrix.
+
+    Files are written to a temporary sibling directory which then replaces
+    the old one, so a crash while writing never leaves a half written store.
+    The old directory is renamed aside before the swap and removed after it,
+    and restored when the store is opened if the swap did not happen.
+
+    Args:
+        train_index: whether to train the IVF index, else the store is
+          written (and re-opened) as flat until the next persist which does,
+          i.e. to checkpoint a store which is still being loaded
+    """
+    if not self._dirty:
+      return
+    self._consolidate()
+
+    staging = self.persist_directory.with_name(
+      f".{self.persist_directory.name}.{uuid.uuid4().hex}"
+    )
+    staging.mkdir(parents=True)
+
+    assignments = None
+    if self.index == "ivf" and len(self) > 0 and train_index:
+      assignments = self._train_ivf()
+
+    np.save(staging / self.VECTORS_FILE, np.ascontiguousarray(self._vectors))
+    np.save(staging / self.SCALES_FILE, self._scales)
+    if assignments is not None and self._centroids is not None:
+      np.save(staging / self.CENTROIDS_FILE, self._centroids)
+      np.save(staging / self.ASSIGNMENTS_FILE, assignments)
+    with open(staging / self.RECORDS_FILE, "w") as fd:
+      for record in self._records:
+        fd.write(json.dumps(record) + "\n")
+    (staging / self.META_FILE).write_text(
+      json.dumps(
+        {
+          "dtype": self.dtype,
+          "index": "ivf" if assignments is not None else "flat",
+          "count": len(self),
+          "dim": int(self._vectors.shape[1]) if len(self) else 0,
+        }
+      )
+    )
+
+    if self.persist_directory.exists():
+      os.replace(
+        self.persist_directory,
+        self.persist_directory.with_name(
+          f".{self.persist_directory.name}.{uuid.uuid4().hex}.old"
+        ),
+      )
+    os.replace(staging, self.persist_directory)
+    for path in self._retired():
+      shutil.rmtree(path)
+
+    self._dirty = False
+    self._load()
+
+  def _train_ivf(self) -> np.ndarray:
+    """Trains the IVF centroids and assigns every stored vector to one.
+
+    Returns:
+        the partition of each row of the matrix
+    """
+    nlist = self.nlist or max(1, int(np.sqrt(len(self))))
+    nlist = min(nlist, len(self))
+    logger.info(f"training IVF index with {nlist=} over {len(self)} vectors")
+
+    self._centroids = _spherical_kmeans(self._dequantize(0, len(self)), nlist)
+    assignments = np.empty(len(self), dtype=np.int32)
+    for start in range(0, len(self), _BLOCK_ROWS):
+      stop = min(start + _BLOCK_ROWS, len(self))
+      block = self._dequantize(start, stop)
+      assignments[start:stop] = np.argmax(block @ self._centroids.T, axis=1)
+
+    self._lists = self._invert(assignments, nlist)
+    return assignments
+
+  @staticmethod
+  def _invert(assignments: np.ndarray, nlist: int) -> list[np.ndarray]:
+    """Turns row -> partition assignments into partition -> rows lists."""
+    order = np.argsort(assignments, kind="stable")
+    bounds = np.searchsorted(assignments[order], np.arange(nlist + 1))
+    return [order[bounds[i] : bounds[i + 1]] for i in range(nlist)]
+
+  def _dequantize(self, start: int, stop: int) -> np.ndarray:
+    """Reads rows [start, stop) of the matrix back as float32 vectors."""
+    self._consolidate()
+    block = self._vectors[start:stop].astype(np.float32)
+    if self.dtype == "int8":
+      block *= self._scales[start:stop, None]
+    return block
+
+  def add_texts(
+    self,
+    texts: Iterable[str],
+    metadatas: Optional[list[dict[str, Any]]] = None,
+    *,
+    ids: Optional[list[str]] = None,
+    **kwargs: object,
+  ) -> list[str]:
+    """Embeds and upserts texts into the store (see `persist()`).
+
+    Args:
+        texts: the texts to add
+        metadatas: optional metadata per text
+        ids: optional ids per text, existing ids are overwritten
+        **kwargs: unused, accepted for compatibility
+
+    Returns:
+        the ids of the added texts
+    """
+    texts = list(texts)
+    if len(texts) == 0:
+      return []
+    ids = ids or [str(uuid.uuid4()) for _ in texts]
+    metadatas = metadatas or [{} for _ in texts]
+
+    vectors = _normalize(np.array(self._embedding_function.embed_documents(texts)))
+    quantized, scales = _quantize(vectors, self.dtype)
+
+    new_rows = []
+    updated: dict[int, int] = {}
+    """row of the matrix -> index of its new vector"""
+    for i, (doc_id, text, metadata) in enumerate(
+      zip(ids, texts, metadatas, strict=True)
+    ):
+      record = {"id": doc_id, "page_content": text, "metadata": metadata}
+      if doc_id in self._id_to_row:
+        row = self._id_to_row[doc_id]
+        updated[row] = i
+        self._records[row] = record
+      else:
+        self._id_to_row[doc_id] = len(self._records)
+        self._records.append(record)
+        new_rows.append(i)
+    if new_rows:
+      self._pending.append((quantized[new_rows], scales[new_rows]))
+
+    if updated:
+      # overwriting rows (i.e. re-loading documents) needs the whole matrix,
+      # materialized if it is memory-mapped
+      self._consolidate()
+      if not self._vectors.flags.writeable:
+        self._vectors = np.array(self._vectors)
+        self._scales = np.array(self._scales)
+      rows = list(updated)
+      self._vectors[rows] = quantized[list(updated.values())]
+      self._scales[rows] = scales[list(updated.values())]
+    self._centroids = None
+    self._dirty = True
+    return ids
+
+  def delete(self, ids: Optional[list[str]] = None, **kwargs: object) -> Optional[bool]:
+    """Deletes the given ids from the store (see `persist()`).
+
+    Args:
+        ids: ids to delete
+        **kwargs: unused, accepted for compatibility
+
+    Returns:
+        True if anything was deleted
+    """
+    rows = {self._id_to_row[i] for i in ids or [] if i in self._id_to_row}
+    if not rows:
+      return False
+    self._consolidate()
+
+    keep = np.array([i for i in range(len(self)) if i not in rows], dtype=np.int64)
+    self._vectors = np.array(self._vectors)[keep]
+    self._scales = np.array(self._scales)[keep]
+    self._records = [self._records[i] for i in keep]
+    self._id_to_row = {record["id"]: i for i, record in enumerate(self._records)}
+    self._centroids = None
+    self._dirty = True
+    return True
+
+  @classmethod
+  def from_texts(  # noqa: PLR0913
+    cls,
+    texts: list[str],
+    embedding: Embeddings,
+    metadatas: Optional[list[dict[str, Any]]] = None,
+    *,
+    ids: Optional[list[str]] = None,
+    persist_directory: Optional[Path] = None,
+    dtype: MatrixDType = "float16",
+    index: MatrixIndex = "flat",
+    nlist: int = 0,
+    nprobe: int = 8,
+    **kwargs: object,
+  ) -> "MatrixVectorStore":
+    """Creates a persisted store from the given texts.
+
+    Args:
+        texts: the texts to add
+        embedding: model used to embed documents and queries
+        metadatas: optional metadata per text
+        ids: optional ids per text
+        persist_directory: directory to persist to (required)
+        dtype: see constructor
+        index: see constructor
+        nlist: see constructor
+        nprobe: see constructor
+        **kwargs: unused, accepted for compatibility
+
+    Returns:
+        the populated store
+    """
+    if persist_directory is None:
+      err_msg = "persist_directory is required for the matrix store"
+      raise ValueError(err_msg)
+
+    store = cls(
+      embedding_function=embedding,
+      persist_directory=persist_directory,
+      dtype=dtype,
+      index=index,
+      nlist=nlist,
+      nprobe=nprobe,
+    )
+    store.add_texts(texts, metadatas, ids=ids)
+    store.persist()
+    return store
+
+  def get(
+    self,
+    ids: Optional[Sequence[str]] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    include: Sequence[str] = ("documents", "metadatas"),
+  ) -> dict[str, Any]:
+    """Gets stored items, mirrors the shape of `Chroma.get`.
+
+    Args:
+        ids: only return these ids (default all)
+        limit: maximum number of items to return
+        offset: number of items to skip (for paging)
+        include: any of `documents`, `metadatas`, `embeddings`
+
+    Returns:
+        dict of ids and the requested fields
+    """
+    if ids is None:
+      rows = list(range(len(self)))
+    else:
+      rows = [self._id_to_row[i] for i in ids if i in self._id_to_row]
+    rows = rows[offset : offset + limit] if limit is not None else rows[offset:]
+
+    records = [self._record(i) for i in rows]
+    result: dict[str, Any] = {
+      "ids": [record["id"] for record in records],
+      "included": list(include),
+    }
+    if "documents" in include:
+      result["documents"] = [record["page_content"] for record in records]
+    if "metadatas" in include:
+      result["metadatas"] = [record["metadata"] for record in records]
+    if "embeddings" in include:
+      result["embeddings"] = [self._dequantize(i, i + 1)[0] for i in rows]
+    return result
+
+  def _candidates(self, query: np.ndarray) -> Optional[np.ndarray]:
+    """Picks the rows to score for a query, None means all rows."""
+    if self._centroids is None:
+      return None
+    nprobe = min(self.nprobe, len(self._centroids))
+    probes = np.argpartition(-(self._centroids @ query), nprobe - 1)[:nprobe]
+    # sorted, since sequential access is kinder to the page cache
+    return np.sort(np.concatenate([self._lists[i] for i in probes]))
+
+  def _score(self, query: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+    """Cosine similarity between the query and the given rows."""
+    self._consolidate()
+    if rows is not None:
+      block = self._vectors[rows].astype(np.float32)
+      selected: np.ndarray = (block @ query) * self._scales[rows]
+      return selected
+
+    scores = np.empty(len(self), dtype=np.float32)
+    for start in range(0, len(self), _BLOCK_ROWS):
+      stop = min(start + _BLOCK_ROWS, len(self))
+      block = self._vectors[start:stop].astype(np.float32)
+      scores[start:stop] = (block @ query) * self._scales[start:stop]
+    return scores
+
+  def similarity_search_by_vector_with_score(
+    self, embedding: list[float], k: int = 4
+  ) -> list[tuple[Document, float]]:
+    """Finds the k nearest documents to the given vector.
+
+    Args:
+        embedding: the query vector
+        k: number of documents to return
+
+    Returns:
+        list of (document, cosine distance) tuples, closest first
+    """
+    if len(self) == 0:
+      return []
+    query = _normalize(np.array([embedding]))[0]
+    rows = self._candidates(query)
+    scores = self._score(query, rows)
+
+    k = min(k, len(scores))
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+
+    results = []
+    for i in top:
+      row = int(rows[i]) if rows is not None else int(i)
+      record = self._record(row)
+      results.append(
+        (
+          Document(
+            id=record["id"],
+            page_content=record["page_content"],
+            metadata=record["metadata"],
+          ),
+          1.0 - float(scores[i]),
+        )
+      )
+    return results
+
+  def similarity_search_with_score(
+    self, query: str, k: int = 4, **kwargs: object
+  ) -> list[tuple[Document, float]]:
+    """Finds the k nearest documents to the query text.
+
+    Args:
+        query: the query text
+        k: number of documents to return
+        **kwargs: unused, accepted for compatibility
+
+    Returns:
+        list of (document, cosine distance) tuples, closest first
+    """
+    return self.similarity_search_by_vector_with_score(
+      self._embedding_function.embed_query(query), k=k
+    )
+
+  def similarity_search_by_vector(
+    self, embedding: list[float], k: int = 4, **kwargs: object
+  ) -> list[Document]:
+    """Finds the k nearest documents to the given vector."""
+    return [
+      doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k)
+    ]
+
+  def similarity_search(
+    self, query: str, k: int = 4, **kwargs: object
+  ) -> list[Document]:
+    """Finds the k nearest documents to the query text."""
+    return [doc for doc, _ in self.similarity_search_with_score(query, k=k)]
+
+  def _select_relevance_score_fn(self) -> Callable[[float], float]:
+    """Scores are cosine distances, so use the matching relevance function."""
+    return self._cosine_relevance_score_fn
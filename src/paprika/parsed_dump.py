@@ -0,0 +1,139 @@
+"""Debug dump of the parsed recipes, as JSON Lines.
+
+The dump is written by a background thread, one recipe per line, as the
+recipes are handed to it, so it neither builds the whole document in memory
+nor holds up the build. At most `QUEUE_SIZE` recipes wait to be written, so
+a writer falling behind slows the build down rather than holding the recipes
+(and their photos) in memory. Photo payloads (base64 images) are left out,
+only their names and hashes are kept.
+"""
+
+import json
+import logging
+import queue
+import threading
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Optional
+
+from src.paprika.parser import Recipe
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 32
+"""Recipes waiting to be written before `ParsedDumpWriter.write` blocks"""
+PUT_POLL_S = 0.1
+"""How often a blocked `ParsedDumpWriter.write` checks the writer failed"""
+PHOTO_PAYLOAD_FIELDS = {"photo_data"}
+"""Fields of a recipe holding image data"""
+PHOTO_PAYLOAD_KEYS = {"data"}
+"""Keys of the entries of `Recipe.photos` holding image data"""
+
+
+def without_photos(recipe: Recipe) -> dict[str, Any]:
+  """Dumps a recipe without its photo payloads.
+
+  Args:
+      recipe: the recipe
+
+  Returns:
+      the recipe as a JSON serializable dict
+  """
+  data = recipe.model_dump(mode="json", exclude=PHOTO_PAYLOAD_FIELDS)
+  data["photos"] = [
+    {key: value for key, value in photo.items() if key not in PHOTO_PAYLOAD_KEYS}
+    if isinstance(photo, dict)
+    else photo
+    for photo in data["photos"]
+  ]
+  return data
+
+
+class ParsedDumpWriter:
+  """Writes recipes to a JSON Lines file from a background thread.
+
+  Use as a context manager; recipes handed to `write` are written in order,
+  and leaving the context waits for all of them to be written. If writing
+  fails, `write` raises from then on.
+  """
+
+  _DONE = None
+
+  def __init__(self, path: Path) -> None:
+    """Creates the writer.
+
+    Args:
+        path: the file to write
+    """
+    self.path = path
+    self.written = 0
+    self._queue: queue.Queue[Optional[Recipe]] = queue.Queue(maxsize=QUEUE_SIZE)
+    self._error: Optional[BaseException] = None
+    self._thread = threading.Thread(target=self._run, name="parsed-dump", daemon=True)
+
+  def __enter__(self) -> "ParsedDumpWriter":
+    """Starts the writer thread."""
+    self._thread.start()
+    return self
+
+  def write(self, recipe: Recipe) -> None:
+    """Queues a recipe to be written, blocking while `QUEUE_SIZE` recipes
+    already wait.
+
+    Args:
+        recipe: the recipe
+
+    Raises:
+        RuntimeError: if writing the dump failed
+    """
+    self._put(recipe)
+    self._raise_error()
+
+  def _put(self, recipe: Optional[Recipe]) -> None:
+    """Queues a recipe (or the end of the dump), unless the writer failed,
+    i.e. stopped taking them.
+    """
+    while self._error is None:
+      try:
+        self._queue.put(recipe, timeout=PUT_POLL_S)
+      except queue.Full:
+        continue
+      else:
+        return
+
+  def _raise_error(self) -> None:
+    """Raises the error of the writer thread, if it failed.
+
+    Raises:
+        RuntimeError: if writing the dump failed
+    """
+    if self._error is not None:
+      err_msg = f"failed to write {self.path}"
+      raise RuntimeError(err_msg) from self._error
+
+  def _run(self) -> None:
+    """Writes the queued recipes until done."""
+    try:
+      with open(self.path, "w") as output:
+        while (recipe := self._queue.get()) is not self._DONE:
+          output.write(json.dumps(without_photos(recipe), ensure_ascii=False))
+          output.write("\n")
+          self.written += 1
+    except BaseException as e:  # reported when closing
+      self._error = e
+
+  def __exit__(
+    self,
+    exc_type: Optional[type[BaseException]],
+    exc: Optional[BaseException],
+    traceback: Optional[TracebackType],
+  ) -> None:
+    """Waits for the queued recipes to be written.
+
+    Raises:
+        RuntimeError: if writing the dump failed
+    """
+    self._put(self._DONE)
+    self._thread.join()
+    self._raise_error()
+    logger.info(f"wrote {self.written} parsed recipes to {self.path}")
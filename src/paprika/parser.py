@@ -1,10 +1,11 @@
 """This module contains functions and datatypes to parse a paprika export."""
 
 import gzip
+import hashlib
 import json
 import zipfile
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Iterator, Optional
 
 from pydantic import BaseModel
 
@@ -38,19 +39,19 @@ class Recipe(BaseModel):
   categories: list[str] = []
 
 
-def parse(path: Path) -> list[Recipe]:
-  """Given path to exported archive from paprika, extracts each recipe!
+def iter_parse(path: Path) -> Iterator[Recipe]:
+  """Given path to exported archive from paprika, extracts the recipes one
+  at a time (see `parse`).
 
   Args:
       path: path to archive
 
-  Returns:
-      list of all recipes in the archive as-is
+  Yields:
+      each recipe in the archive as-is
   """
   # Per https://paprikaapp.zendesk.com/hc/en-us/articles/360051324613-What-export-formats-do-you-support
   # we know that this archive is a zip!
 
-  recipes: list[Recipe] = []
   # 1. parse as zip
   with zipfile.ZipFile(path, "r") as archive:
     # 2. extract each compressed recipe from the zip
@@ -59,5 +60,32 @@ def parse(path: Path) -> list[Recipe]:
         archive.open(recipe_name, "r") as zipped_fp,
         gzip.open(zipped_fp) as unzipped_fp,
       ):
-        recipes.append(Recipe(**json.load(unzipped_fp)))
-  return recipes
+        yield Recipe(**json.load(unzipped_fp))
+
+
+def parse(path: Path) -> list[Recipe]:
+  """Given path to exported archive from paprika, extracts each recipe!
+
+  Args:
+      path: path to archive
+
+  Returns:
+      list of all recipes in the archive as-is
+  """
+  return list(iter_parse(path))
+
+
+def archive_digest(path: Path) -> str:
+  """Digest of an exported archive, identifies a build from it.
+
+  Args:
+      path: path to archive
+
+  Returns:
+      hex sha256 of the archive
+  """
+  digest = hashlib.sha256()
+  with open(path, "rb") as fp:
+    while block := fp.read(1 << 20):
+      digest.update(block)
+  return digest.hexdigest()
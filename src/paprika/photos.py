@@ -0,0 +1,135 @@
+"""Content-addressed store of the recipe photos.
+
+Recipes of a paprika export carry their photos as base64 strings
+(`photo_data`, and `data` in the entries of `photos`), which the build never
+indexes. The `photos` stage of the ETL pipeline moves them out of the
+recipes, as they are parsed, into files keyed by the sha256 of the image
+(the export's `photo_hash`). So the later stages only carry the hash, and a
+photo shared by several recipes (or tenants, or exports) is written once.
+A photo can then be served straight from its file, without the export, see
+`PhotoStore.locate()` (the UI does not show photos yet).
+
+Example::
+
+    photos = PhotoStore()
+    recipe = photos.extract(recipe)  # recipe.photo_data is None
+    path = photos.locate(recipe.photo_hash)
+"""
+
+import base64
+import hashlib
+import logging
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Optional
+
+from src import env, metrics
+from src.paprika.parser import Recipe
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SUFFIX = ".jpg"
+"""File suffix of a photo whose name has none (paprika exports JPEGs)"""
+
+
+class PhotoStore:
+  """Directory of photos named by the sha256 of their content."""
+
+  def __init__(self, root: Optional[Path] = None) -> None:
+    """Creates the store.
+
+    Args:
+        root: directory of the photos (default `PHOTOS_DIR`)
+    """
+    self.root = root or env.PHOTOS_DIR
+    self.written = 0
+    """number of photos written"""
+    self.deduplicated = 0
+    """number of photos already in the store"""
+
+  def _path(self, photo_hash: str, suffix: str) -> Path:
+    """File of a photo, sharded by the first byte of its hash."""
+    return self.root / photo_hash[:2] / f"{photo_hash}{suffix}"
+
+  def locate(self, photo_hash: str) -> Optional[Path]:
+    """Finds the file of a photo.
+
+    Args:
+        photo_hash: the sha256 of the photo (i.e. `photo_hash` of a recipe)
+
+    Returns:
+        the file, None if the photo is not in the store
+    """
+    photo_hash = photo_hash.lower()
+    return next(self._path(photo_hash, "").parent.glob(f"{photo_hash}.*"), None)
+
+  def put(
+    self, data: str, photo_hash: Optional[str] = None, name: Optional[str] = None
+  ) -> str:
+    """Stores a photo, unless the store already holds it.
+
+    The file is written to a temporary name and then renamed, so a reader
+    never sees a partial photo.
+
+    Args:
+        data: the photo, base64 encoded
+        photo_hash: the sha256 the export gives for it, checked against its
+          content
+        name: file name of the photo in the export, for its suffix
+
+    Returns:
+        the sha256 of the photo, its key in the store
+    """
+    content = base64.b64decode(data)
+    digest = hashlib.sha256(content).hexdigest()
+    if photo_hash is not None and photo_hash.lower() != digest:
+      logger.warning(f"photo {name} does not match its hash {photo_hash}, rehashed")
+
+    if self.locate(digest) is not None:
+      self.deduplicated += 1
+      metrics.counter("photos_deduplicated").inc()
+      return digest
+
+    path = self._path(digest, Path(name or "").suffix.lower() or DEFAULT_SUFFIX)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    temp.write_bytes(content)
+    os.replace(temp, path)
+    self.written += 1
+    metrics.counter("photos_written").inc()
+    return digest
+
+  def extract(self, recipe: Recipe) -> Recipe:
+    """Moves the photos of a recipe into the store.
+
+    Args:
+        recipe: the parsed recipe
+
+    Returns:
+        the recipe without photo payloads: `photo_hash` (and `hash` of the
+        entries of `photos`) refer to the stored photos
+    """
+    update: dict[str, Any] = {}
+    if recipe.photo_data:
+      update["photo_hash"] = self.put(
+        recipe.photo_data, recipe.photo_hash, recipe.photo
+      )
+      update["photo_data"] = None
+
+    if any(isinstance(photo, dict) and photo.get("data") for photo in recipe.photos):
+      update["photos"] = [
+        self._extract_entry(photo) if isinstance(photo, dict) else photo
+        for photo in recipe.photos
+      ]
+
+    return recipe.model_copy(update=update) if update else recipe
+
+  def _extract_entry(self, photo: dict[str, Any]) -> dict[str, Any]:
+    """Moves the photo of an entry of `Recipe.photos` into the store."""
+    data = photo.get("data")
+    if not data:
+      return photo
+    entry = {key: value for key, value in photo.items() if key != "data"}
+    entry["hash"] = self.put(data, photo.get("hash"), photo.get("filename"))
+    return entry
@@ -0,0 +1,338 @@
+"""Streaming ETL pipeline: parse → (photos →) clean → chunk → embed → write.
+
+Recipes flow through the stages in micro-batches, each stage running in its
+own thread and handing its output to the next one through a bounded queue.
+So the whole export is never held in memory at once, the embedding model
+works on one batch while the previous one is written and the next one is
+cleaned, and a slow stage holds back (instead of buffering) the ones before
+it.
+
+Example::
+
+    stats = run_pipeline(env.PAPRIKA_EXPORT_PATH)
+    save_snapshot()
+"""
+
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+from langchain_core.documents import Document
+
+from src import env
+from src.paprika.chunker import Chunker
+from src.paprika.cleanse_and_enrich import Recipe as CleanRecipe
+from src.paprika.cleanse_and_enrich import clean_and_enrich_recipes
+from src.paprika.parser import Recipe, iter_parse
+from src.paprika.photos import PhotoStore
+from src.paprika.vectorstore import (
+  LOAD_BATCH_SIZE,
+  DocumentWriter,
+  SplitReport,
+  embed_documents,
+  split_chunks,
+)
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+"""Marks the end of the stream in a queue"""
+
+
+@dataclass
+class PipelineStats:
+  """Measurements of a pipeline run."""
+
+  recipes: int = 0
+  """number of parsed recipes"""
+  photos: int = 0
+  """number of photos moved to the photo store (not already in it)"""
+  cleaned: int = 0
+  """number of recipes left after cleaning"""
+  documents: int = 0
+  """number of documents embedded and written"""
+  skipped: int = 0
+  """number of documents already written by an interrupted build"""
+  writes: int = 0
+  """number of writes to the vector db"""
+  split: Optional[SplitReport] = None
+  """counts of the chunks over the model's sequence limit (when splitting by
+  tokens)"""
+  busy_s: dict[str, float] = field(default_factory=dict)
+  """time each stage spent working (not waiting on the others)"""
+  wall_s: float = 0.0
+
+
+class _Pipeline:
+  """Runs the stages, each in its own thread, between bounded queues."""
+
+  def __init__(self, queue_size: int) -> None:
+    """Creates the pipeline.
+
+    Args:
+        queue_size: number of micro-batches buffered between two stages
+    """
+    self.queue_size = queue_size
+    self.stats = PipelineStats()
+    self.threads: list[threading.Thread] = []
+    self.errors: list[tuple[str, BaseException]] = []
+    self._failed = threading.Event()
+
+  def _queue(self) -> "queue.Queue[Any]":
+    return queue.Queue(maxsize=self.queue_size)
+
+  def _fail(self, name: str, error: BaseException) -> None:
+    """Records the error of a stage, and makes the others stop."""
+    self.errors.append((name, error))
+    self._failed.set()
+
+  def _timed(self, name: str, func: Callable[[Any], object], batch: object) -> object:
+    """Runs a stage on a batch, adding to its busy time."""
+    start = time.perf_counter()
+    try:
+      return func(batch)
+    finally:
+      self.stats.busy_s[name] = self.stats.busy_s.get(name, 0.0) + (
+        time.perf_counter() - start
+      )
+
+  def source(self, name: str, batches: Iterator[Any]) -> "queue.Queue[Any]":
+    """Starts a stage producing the batches.
+
+    Args:
+        name: name of the stage
+        batches: the batches (pulled from the stage thread)
+
+    Returns:
+        the queue the batches are put on
+    """
+    outbox = self._queue()
+
+    def run() -> None:
+      try:
+        while not self._failed.is_set():
+          batch = self._timed(name, lambda _: next(batches, _DONE), None)
+          if batch is _DONE:
+            break
+          outbox.put(batch)
+      except BaseException as e:  # reported by `join`
+        self._fail(name, e)
+      finally:
+        outbox.put(_DONE)
+
+    self._start(name, run)
+    return outbox
+
+  def stage(
+    self, name: str, func: Callable[[Any], Any], inbox: "queue.Queue[Any]"
+  ) -> "queue.Queue[Any]":
+    """Starts a stage transforming the batches of the previous one.
+
+    Empty results (i.e. a batch whose recipes were all dropped, or None)
+    are not passed on. Once any stage failed, the batches are drained unprocessed,
+    so that no stage blocks on a full queue.
+
+    Args:
+        name: name of the stage
+        func: transforms a batch
+        inbox: queue of the previous stage
+
+    Returns:
+        the queue the transformed batches are put on
+    """
+    outbox = self._queue()
+
+    def put(batch: object) -> None:
+      if batch:
+        outbox.put(batch)
+
+    def run() -> None:
+      try:
+        self.drain(name, inbox, put, func)
+      finally:
+        outbox.put(_DONE)
+
+    self._start(name, run)
+    return outbox
+
+  def drain(
+    self,
+    name: str,
+    inbox: "queue.Queue[Any]",
+    sink: Callable[[Any], None],
+    func: Callable[[Any], Any] = lambda batch: batch,
+    on_done: Optional[Callable[[], None]] = None,
+  ) -> None:
+    """Consumes a queue until the end of the stream.
+
+    Args:
+        name: name of the stage
+        inbox: the queue
+        sink: called with the transformed batches
+        func: transforms a batch
+        on_done: called at the end of the stream
+    """
+    while True:
+      batch = inbox.get()
+      if self._failed.is_set():
+        if batch is _DONE:
+          return
+        continue
+      try:
+        if batch is _DONE:
+          if on_done is not None:
+            self._timed(name, lambda _: on_done(), None)
+          return
+        sink(self._timed(name, func, batch))
+      except BaseException as e:  # reported by `join`
+        self._fail(name, e)
+
+  def _start(self, name: str, run: Callable[[], None]) -> None:
+    thread = threading.Thread(target=run, name=f"etl-{name}", daemon=True)
+    thread.start()
+    self.threads.append(thread)
+
+  def join(self) -> None:
+    """Waits for the stages.
+
+    Raises:
+        RuntimeError: if a stage failed
+    """
+    for thread in self.threads:
+      thread.join()
+    if self.errors:
+      name, error = self.errors[0]
+      err_msg = f"ETL pipeline stage {name} failed"
+      raise RuntimeError(err_msg) from error
+
+
+def _batched(items: Iterator[Recipe], size: int) -> Iterator[list[Recipe]]:
+  """Groups items into lists of (at most) size items."""
+  while batch := list(islice(items, size)):
+    yield batch
+
+
+def run_pipeline(  # noqa: PLR0913
+  path: Path,
+  backend: Optional[str] = None,
+  *,
+  batch_size: Optional[int] = None,
+  queue_size: Optional[int] = None,
+  on_parsed: Optional[Callable[[Recipe], None]] = None,
+  build_id: Optional[str] = None,
+  tenant: Optional[str] = None,
+  photos: Optional[PhotoStore] = None,
+) -> PipelineStats:
+  """Builds the vector db from a paprika export, streaming the recipes
+  through the ETL stages in micro-batches.
+
+  If a vector db already exists, calling this function REMOVES
+  the entire vector db, unless it resumes an interrupted build
+  (see `DocumentWriter`).
+
+  Args:
+      path: path to the exported archive
+      backend: which vector store to load into, see `connect()`
+      batch_size: number of recipes per micro-batch, defaults to `ETL_BATCH_SIZE`
+      queue_size: number of micro-batches buffered between two stages,
+        defaults to `ETL_QUEUE_SIZE`
+      on_parsed: called with each parsed recipe (from the parse thread)
+      build_id: identifies the build, to resume it if interrupted
+      tenant: whose cookbook to build, see `location()`
+      photos: moves the photos of the recipes out of them (right after they
+        are parsed), so later stages do not carry them
+
+  Returns:
+      the stats of the run
+
+  Raises:
+      RuntimeError: if a stage failed (the vector db is left incomplete)
+  """
+  start = time.perf_counter()
+  pipeline = _Pipeline(queue_size or env.ETL_QUEUE_SIZE)
+  stats = pipeline.stats
+  if env.SPLITTER_MODE == "tokens":
+    stats.split = SplitReport()
+  writer = DocumentWriter(backend, build_id, tenant)
+
+  def parsed() -> Iterator[Recipe]:
+    for recipe in iter_parse(path):
+      stats.recipes += 1
+      if on_parsed is not None:
+        on_parsed(recipe)
+      yield recipe
+
+  def clean(batch: list[Recipe]) -> list[CleanRecipe]:
+    cleaned = clean_and_enrich_recipes(batch)
+    stats.cleaned += len(cleaned)
+    return cleaned
+
+  def embed(
+    docs: list[Document],
+  ) -> Optional[tuple[list[Document], list[list[float]]]]:
+    missing = writer.missing(docs)
+    stats.skipped += len(docs) - len(missing)
+    if not missing:
+      return None
+    return missing, embed_documents(missing)
+
+  parsed_batches = pipeline.source(
+    "parse", _batched(parsed(), batch_size or env.ETL_BATCH_SIZE)
+  )
+  if photos is not None:
+    written = photos.written
+
+    def extract(batch: list[Recipe]) -> list[Recipe]:
+      extracted = [photos.extract(recipe) for recipe in batch]
+      stats.photos = photos.written - written
+      return extracted
+
+    parsed_batches = pipeline.stage("photos", extract, parsed_batches)
+  cleaned_batches = pipeline.stage("clean", clean, parsed_batches)
+  doc_batches = pipeline.stage(
+    "chunk",
+    lambda batch: split_chunks(Chunker.make_chunks(batch), report=stats.split),
+    cleaned_batches,
+  )
+  embedded_batches = pipeline.stage("embed", embed, doc_batches)
+
+  # the writes are coalesced while the writer is busy, since every write has
+  # a fixed cost (i.e. the matrix backend copies its matrix)
+  pending: list[tuple[list[Document], list[list[float]]]] = []
+
+  def flush() -> None:
+    if not pending:
+      return
+    docs = [doc for docs, _ in pending for doc in docs]
+    writer.write(docs, [vector for _, vectors in pending for vector in vectors])
+    pending.clear()
+    stats.documents += len(docs)
+    stats.writes += 1
+
+  def write(batch: tuple[list[Document], list[list[float]]]) -> None:
+    pending.append(batch)
+    if (
+      embedded_batches.empty()
+      or sum(len(docs) for docs, _ in pending) >= LOAD_BATCH_SIZE
+    ):
+      flush()
+
+  pipeline.drain("write", embedded_batches, write, on_done=flush)
+  pipeline.join()
+  writer.close()
+
+  stats.busy_s = {name: round(busy, 3) for name, busy in stats.busy_s.items()}
+  stats.wall_s = round(time.perf_counter() - start, 3)
+  logger.info(
+    f"pipeline: {stats.recipes} recipes ({stats.photos} new photos) -> "
+    f"{stats.cleaned} cleaned -> "
+    f"{stats.documents} documents in {stats.writes} writes ({stats.skipped} "
+    f"already written), {stats.wall_s}s "
+    f"(busy {stats.busy_s})"
+  )
+  return stats
@@ -0,0 +1,336 @@
+"""Read-only, single file snapshots of the vector store.
+
+A snapshot packs the (quantized) embedding matrix, the IVF partitions and
+the documents + metadata of every chunk into one file which is memory-mapped
+by readers. Since the mapping is backed by the page cache, any number of app
+worker processes opening the same snapshot share one physical copy of the
+index, and opening it only reads a small header.
+
+File layout (all sections 64 byte aligned, little endian)::
+
+    [0, 4096)         MAGIC + uint32 header length + JSON header
+    vectors           (count, dim) float16 or int8
+    scales            (count,) float32
+    centroids         (nlist, dim) float32            (ivf only)
+    list_offsets      (nlist + 1,) uint64             (ivf only)
+    record_offsets    (count + 1,) uint64
+    records           concatenated JSON records
+
+For IVF snapshots the rows are ordered by partition, so every partition is a
+contiguous range of the matrix and a query reads `nprobe` contiguous slices.
+"""
+
+import json
+import logging
+import os
+import struct
+from pathlib import Path
+from typing import Any, Iterable, Optional, Sequence
+
+import numpy as np
+from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
+
+from src.paprika.matrix_store import (
+  MatrixDType,
+  MatrixIndex,
+  MatrixVectorStore,
+  _normalize,
+  _quantize,
+  _spherical_kmeans,
+)
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"CHEFSNAP"
+VERSION = 1
+HEADER_SIZE = 4096
+_ALIGN = 64
+_EXPORT_PAGE_SIZE = 4096
+
+
+def _align(offset: int) -> int:
+  """Rounds offset up to the section alignment."""
+  return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def write_snapshot(  # noqa: PLR0913
+  path: Path,
+  ids: Sequence[str],
+  embeddings: np.ndarray,
+  documents: Sequence[str],
+  metadatas: Sequence[dict[str, Any]],
+  *,
+  dtype: MatrixDType = "float16",
+  index: MatrixIndex = "flat",
+  nlist: int = 0,
+) -> None:
+  """Writes a snapshot file. The file is written next to `path` and then
+  renamed over it, so readers either see the old or the new snapshot.
+
+  Args:
+      path: where to write the snapshot
+      ids: id of each chunk
+      embeddings: (count, dim) embedding of each chunk
+      documents: text of each chunk
+      metadatas: metadata of each chunk
+      dtype: storage type of the vectors
+      index: `flat` or `ivf`
+      nlist: number of IVF partitions, 0 picks sqrt(count)
+  """
+  vectors = _normalize(embeddings)
+  count, dim = vectors.shape if len(vectors) else (0, 0)
+
+  # 1. partition the rows so each IVF list is contiguous
+  order = np.arange(count)
+  centroids = None
+  list_offsets = None
+  if index == "ivf" and count > 0:
+    nlist = min(nlist or max(1, int(np.sqrt(count))), count)
+    centroids = _spherical_kmeans(vectors, nlist)
+    assignments = np.argmax(vectors @ centroids.T, axis=1)
+    order = np.argsort(assignments, kind="stable")
+    list_offsets = np.searchsorted(assignments[order], np.arange(nlist + 1)).astype(
+      np.uint64
+    )
+  quantized, scales = _quantize(vectors[order], dtype)
+
+  # 2. encode the records in the same order as the matrix
+  encoded = [
+    json.dumps(
+      {"id": ids[i], "page_content": documents[i], "metadata": metadatas[i]}
+    ).encode()
+    for i in order.tolist()
+  ]
+  record_offsets = np.zeros(count + 1, dtype=np.uint64)
+  record_offsets[1:] = np.cumsum([len(record) for record in encoded])
+
+  # 3. lay out the sections
+  arrays: dict[str, np.ndarray] = {
+    "vectors": quantized,
+    "scales": scales,
+    "record_offsets": record_offsets,
+  }
+  if centroids is not None and list_offsets is not None:
+    arrays["centroids"] = centroids
+    arrays["list_offsets"] = list_offsets
+
+  sections: dict[str, dict[str, Any]] = {}
+  offset = HEADER_SIZE
+  for name, array in arrays.items():
+    sections[name] = {
+      "offset": offset,
+      "dtype": array.dtype.str,
+      "shape": list(array.shape),
+    }
+    offset = _align(offset + array.nbytes)
+  sections["records"] = {"offset": offset, "nbytes": int(record_offsets[-1])}
+
+  header = json.dumps(
+    {
+      "version": VERSION,
+      "count": count,
+      "dim": dim,
+      "dtype": dtype,
+      "index": "ivf" if centroids is not None else "flat",
+      "sections": sections,
+    }
+  ).encode()
+  prefix = MAGIC + struct.pack("<I", len(header)) + header
+  if len(prefix) > HEADER_SIZE:
+    err_msg = f"snapshot header too large ({len(prefix)} bytes)"
+    raise ValueError(err_msg)
+
+  # 4. write and atomically swap into place
+  path.parent.mkdir(parents=True, exist_ok=True)
+  tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+  with open(tmp_path, "wb") as fd:
+    fd.write(prefix)
+    for name, array in arrays.items():
+      fd.seek(sections[name]["offset"])
+      fd.write(np.ascontiguousarray(array).tobytes())
+    fd.seek(sections["records"]["offset"])
+    for record in encoded:
+      fd.write(record)
+    fd.flush()
+    os.fsync(fd.fileno())
+  os.replace(tmp_path, path)
+
+  logger.info(
+    f"wrote {dtype} snapshot of {count} vectors "
+    f"to {path} ({path.stat().st_size / 1e6:.1f} MB)"
+  )
+
+
+def _store_size(store: Chroma | MatrixVectorStore) -> int:
+  """Number of items in a chroma or matrix store."""
+  if isinstance(store, MatrixVectorStore):
+    return len(store)
+  return int(store._collection.count())
+
+
+def export_snapshot(
+  store: Chroma | MatrixVectorStore,
+  path: Path,
+  *,
+  dtype: MatrixDType = "float16",
+  index: MatrixIndex = "flat",
+  nlist: int = 0,
+) -> None:
+  """Exports every chunk (embedding, document and metadata) of a chroma
+  or matrix store into a snapshot file.
+
+  Args:
+      store: the populated vector store to export
+      path: where to write the snapshot
+      dtype: storage type of the vectors
+      index: `flat` or `ivf`
+      nlist: number of IVF partitions, 0 picks sqrt(count)
+  """
+  ids: list[str] = []
+  documents: list[str] = []
+  metadatas: list[dict[str, Any]] = []
+  pages: list[np.ndarray] = []
+
+  # page through the store so that the embeddings never exist as python lists
+  # of the whole corpus at once
+  total = _store_size(store)
+  for offset in range(0, total, _EXPORT_PAGE_SIZE):
+    page = store.get(
+      limit=_EXPORT_PAGE_SIZE,
+      offset=offset,
+      include=["embeddings", "documents", "metadatas"],
+    )
+    ids.extend(page["ids"])
+    documents.extend(page["documents"])
+    metadatas.extend(page["metadatas"])
+    pages.append(np.asarray(page["embeddings"], dtype=np.float32))
+
+  embeddings = np.concatenate(pages) if pages else np.zeros((0, 0), np.float32)
+  write_snapshot(
+    path,
+    ids,
+    embeddings,
+    documents,
+    metadatas,
+    dtype=dtype,
+    index=index,
+    nlist=nlist,
+  )
+
+
+class SnapshotVectorStore(MatrixVectorStore):
+  """Read-only vector store which memory-maps a snapshot file.
+
+  Opening only parses the header, the matrix and records are paged in
+  from the (shared) page cache as queries touch them.
+  """
+
+  def __init__(
+    self, embedding_function: Embeddings, path: Path, *, nprobe: int = 8
+  ) -> None:
+    """Maps the snapshot at path.
+
+    Args:
+        embedding_function: model used to embed queries, must be the model
+          the snapshot was built with
+        path: the snapshot file
+        nprobe: number of IVF partitions scanned per query
+    """
+    super().__init__(
+      embedding_function=embedding_function,
+      persist_directory=path,
+      index="ivf",
+      nprobe=nprobe,
+    )
+    self.path = path
+
+    with open(path, "rb") as fd:
+      prefix = fd.read(len(MAGIC) + 4)
+      if prefix[: len(MAGIC)] != MAGIC:
+        err_msg = f"{path} is not a vector snapshot"
+        raise ValueError(err_msg)
+      (header_len,) = struct.unpack("<I", prefix[len(MAGIC) :])
+      header = json.loads(fd.read(header_len))
+    if header["version"] != VERSION:
+      err_msg = f"unsupported snapshot version {header['version']}"
+      raise ValueError(err_msg)
+
+    sections = header["sections"]
+    self.dtype = header["dtype"]
+    self._count = int(header["count"])
+
+    def section(name: str) -> np.ndarray:
+      meta = sections[name]
+      return np.memmap(
+        path,
+        mode="r",
+        dtype=np.dtype(meta["dtype"]),
+        offset=meta["offset"],
+        shape=tuple(meta["shape"]),
+      )
+
+    if self._count == 0:
+      return
+
+    self._vectors = section("vectors")
+    self._scales = section("scales")
+    self._record_offsets = section("record_offsets")
+    self._blob = np.memmap(
+      path,
+      mode="r",
+      dtype=np.uint8,
+      offset=sections["records"]["offset"],
+      shape=(max(1, sections["records"]["nbytes"]),),
+    )
+    if header["index"] == "ivf":
+      self._centroids = np.asarray(section("centroids"))
+      offsets = section("list_offsets")
+      self._lists = [
+        np.arange(offsets[i], offsets[i + 1], dtype=np.int64)
+        for i in range(len(offsets) - 1)
+      ]
+
+    logger.info(
+      f"mapped snapshot with {self._count} vectors "
+      f"({header['dtype']}, {header['index']}) from {path}"
+    )
+
+  def __len__(self) -> int:
+    """Number of vectors in the snapshot."""
+    return self._count
+
+  def _record(self, row: int) -> dict[str, Any]:
+    """Decodes the record of a row straight from the mapped file."""
+    start, stop = self._record_offsets[row], self._record_offsets[row + 1]
+    record: dict[str, Any] = json.loads(self._blob[start:stop].tobytes())
+    return record
+
+  def get(
+    self,
+    ids: Optional[Sequence[str]] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    include: Sequence[str] = ("documents", "metadatas"),
+  ) -> dict[str, Any]:
+    """See `MatrixVectorStore.get`, the id lookup is built on first use."""
+    if ids is not None and not self._id_to_row:
+      self._id_to_row = {self._record(i)["id"]: i for i in range(len(self))}
+    return super().get(ids=ids, limit=limit, offset=offset, include=include)
+
+  def add_texts(
+    self,
+    texts: Iterable[str],
+    metadatas: Optional[list[dict[str, Any]]] = None,
+    *,
+    ids: Optional[list[str]] = None,
+    **kwargs: object,
+  ) -> list[str]:
+    """Snapshots are read-only, rebuild them with the ETL instead."""
+    err_msg = "vector snapshots are read-only"
+    raise NotImplementedError(err_msg)
+
+  def delete(self, ids: Optional[list[str]] = None, **kwargs: object) -> Optional[bool]:
+    """Snapshots are read-only, rebuild them with the ETL instead."""
+    err_msg = "vector snapshots are read-only"
+    raise NotImplementedError(err_msg)
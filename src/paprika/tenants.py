@@ -0,0 +1,213 @@
+"""Per-tenant cookbooks: every tenant has its own export and vector store.
+
+The ETL builds one store per tenant (`paprika_etl --tenant NAME`), from
+`TENANT_EXPORTS_DIR/<tenant>.paprikarecipes`. When serving, each session
+selects its tenant through the `current` context variable, and `TenantStores`
+opens the tenant's store on first use. All stores share the one embedding
+model, and only the most recently used stores are kept open, so memory grows
+with the active tenants rather than with all of them.
+
+Example::
+
+    stores = TenantStores(env.TENANT_CACHE_SIZE)
+    with stores.use("alice") as store:
+        docs = store.similarity_search("pancakes")
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+from src import env, metrics
+from src.paprika.vectorstore import (
+  TENANT_PATTERN,
+  VectorStore,
+  close,
+  connect,
+  location,
+)
+
+logger = logging.getLogger(__name__)
+
+current: ContextVar[Optional[str]] = ContextVar("tenant", default=None)
+"""Tenant of the current session, None for the default cookbook"""
+
+
+def export_path(tenant: Optional[str]) -> Path:
+  """Where the paprika export of a tenant is.
+
+  Args:
+      tenant: the tenant, None for the default cookbook
+
+  Returns:
+      path of the export archive
+  """
+  if tenant is None:
+    return env.PAPRIKA_EXPORT_PATH
+  return env.TENANT_EXPORTS_DIR / f"{tenant}.paprikarecipes"
+
+
+def list_tenants() -> list[str]:
+  """Tenants which have an export in `TENANT_EXPORTS_DIR`.
+
+  Returns:
+      names of the tenants, sorted
+  """
+  if not env.TENANT_EXPORTS_DIR.is_dir():
+    return []
+  return sorted(
+    path.stem
+    for path in env.TENANT_EXPORTS_DIR.glob("*.paprikarecipes")
+    if TENANT_PATTERN.fullmatch(path.stem)
+  )
+
+
+class TenantStores:
+  """Vector stores of the tenants, opened lazily and evicted least recently
+  used first.
+
+  A store is leased while it is searched (see `use`), and leased stores are
+  never evicted, so the cache may briefly hold more than `capacity` stores.
+  """
+
+  def __init__(
+    self,
+    capacity: int,
+    backend: Optional[str] = None,
+    opener: Optional[Callable[[Optional[str]], VectorStore]] = None,
+  ) -> None:
+    """Creates the (empty) cache.
+
+    Args:
+        capacity: number of idle stores kept open
+        backend: which vector store to connect to, see `connect()`
+        opener: opens the store of a tenant (default `connect()`)
+    """
+    self.capacity = capacity
+    self.backend = backend or env.VECTOR_BACKEND
+    self._open = opener or self._connect
+    self._lock = threading.Lock()
+    self._stores: OrderedDict[Optional[str], VectorStore] = OrderedDict()
+    self._leases: dict[Optional[str], int] = {}
+    self._opening: dict[Optional[str], Future[VectorStore]] = {}
+    """tenant -> its store, while it is being opened"""
+
+  def _connect(self, tenant: Optional[str]) -> VectorStore:
+    """Connects to the store of a tenant, which the ETL must have built.
+
+    Raises:
+        ValueError: if the tenant has no store
+    """
+    if not location(self.backend, tenant).exists():
+      err_msg = f"no cookbook was built for tenant {tenant!r}"
+      raise ValueError(err_msg)
+    return connect(self.backend, tenant=tenant)
+
+  def __len__(self) -> int:
+    """Number of open stores."""
+    return len(self._stores)
+
+  def __contains__(self, tenant: Optional[str]) -> bool:
+    """Whether the store of a tenant is open."""
+    return tenant in self._stores
+
+  @contextmanager
+  def use(self, tenant: Optional[str]) -> Iterator[VectorStore]:
+    """Leases the store of a tenant, opening it if needed.
+
+    Args:
+        tenant: the tenant, None for the default cookbook
+
+    Yields:
+        the store, which is not evicted until the lease ends
+    """
+    with self._lock:
+      # leased before it is open, so it is not evicted as soon as it is
+      self._leases[tenant] = self._leases.get(tenant, 0) + 1
+      store = self._stores.get(tenant)
+      opening = self._opening.get(tenant)
+      leader = store is None and opening is None
+      if leader:
+        opening = self._opening[tenant] = Future()
+
+    try:
+      if store is None:
+        assert opening is not None
+        store = self._open_store(tenant, opening) if leader else opening.result()
+    except BaseException:
+      self._release(tenant)
+      raise
+
+    with self._lock:
+      self._stores.move_to_end(tenant)
+      evicted = self._evict()
+    for store_to_close in evicted:
+      close(store_to_close)
+    try:
+      yield store
+    finally:
+      self._release(tenant)
+
+  def _open_store(
+    self, tenant: Optional[str], opening: Future[VectorStore]
+  ) -> VectorStore:
+    """Opens the store of a tenant for the sessions waiting for it.
+
+    The store is opened outside of the lock, so the other tenants are served
+    meanwhile, and once, however many sessions wait for it.
+
+    Args:
+        tenant: the tenant
+        opening: the future the waiting sessions get the store from
+
+    Returns:
+        the store, added to the cache
+    """
+    try:
+      # opening only maps/reads the store, the embedding model is shared
+      store = self._open(tenant)
+    except BaseException as e:
+      with self._lock:
+        del self._opening[tenant]
+      opening.set_exception(e)
+      raise
+
+    with self._lock:
+      self._stores[tenant] = store
+      del self._opening[tenant]
+    opening.set_result(store)
+    metrics.counter("tenant_store_opens").inc()
+    logger.info(f"opened vector store of tenant {tenant!r}")
+    return store
+
+  def _release(self, tenant: Optional[str]) -> None:
+    """Ends a lease, closing the stores it leaves over capacity."""
+    with self._lock:
+      self._leases[tenant] -= 1
+      if not self._leases[tenant]:
+        del self._leases[tenant]
+      evicted = self._evict()
+    for store_to_close in evicted:
+      close(store_to_close)
+
+  def _evict(self) -> list[VectorStore]:
+    """Removes the least recently used idle stores over capacity (with the
+    lock held).
+
+    Returns:
+        the removed stores, to be closed (outside of the lock)
+    """
+    evicted = []
+    idle = [tenant for tenant in self._stores if tenant not in self._leases]
+    while len(self._stores) > self.capacity and idle:
+      tenant = idle.pop(0)
+      evicted.append(self._stores.pop(tenant))
+      metrics.counter("tenant_store_evictions").inc()
+      logger.info(f"evicted vector store of tenant {tenant!r}")
+    metrics.gauge("tenant_stores_open").set(len(self._stores))
+    return evicted
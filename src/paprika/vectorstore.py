@@ -1,6 +1,13 @@
+import logging
+import os
+import re
 import shutil
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
 from functools import lru_cache
-from typing import TypeAlias
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional, TypeAlias
 
 from chromadb.config import Settings
 from langchain_chroma import Chroma
@@ -9,10 +16,18 @@ from langchain_core.embeddings import Embeddings
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+from src import env
 from src.env import REPO_ROOT
 from src.paprika.chunker import Chunk
+from src.paprika.matrix_store import MatrixVectorStore
+from src.paprika.snapshot import SnapshotVectorStore, export_snapshot
 
-VectorStore: TypeAlias = Chroma
+if TYPE_CHECKING:
+  from transformers import PreTrainedTokenizerBase
+
+logger = logging.getLogger(__name__)
+
+VectorStore: TypeAlias = Chroma | MatrixVectorStore | SnapshotVectorStore
 
 
 # NOTE: most of this code is adapted from LangChain docs
@@ -21,8 +36,26 @@ VectorStore: TypeAlias = Chroma
 
 CHROMA_ROOT = REPO_ROOT / "resources" / "chroma"
 """Directory for the chroma vector store to be persisted to"""
+MATRIX_ROOT = REPO_ROOT / "resources" / "matrix"
+"""Directory for the matrix vector store to be persisted to"""
+SNAPSHOT_PATH = REPO_ROOT / "resources" / "snapshot" / "recipes.snapshot"
+"""File the read-only snapshot of the vector store is exported to"""
+TENANTS_ROOT = REPO_ROOT / "resources" / "tenants"
+"""Directory holding the vector stores (and snapshots) of each tenant's
+cookbook, see `location()`"""
+TENANT_PATTERN = re.compile(r"[A-Za-z0-9_-]+")
+"""Allowed tenant names (they name directories)"""
 EMBEDDINGS_MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"
 """The model to use for vector/semantic search."""
+EMBEDDINGS_MAX_TOKENS = 384
+"""Sequence limit of the model (in word-pieces, incl. special tokens), longer
+texts are truncated when embedded."""
+LOAD_BATCH_SIZE = 4096
+"""Number of documents embedded and written per call when loading."""
+LEGACY_VERSION = "00000000T000000000000-legacy"
+"""Version name of a vector db built before versioning (sorts as the oldest)"""
+CHARACTER_CHUNK_SIZE = 1024
+CHARACTER_CHUNK_OVERLAP = 200
 
 
 @lru_cache(1)  # use LRU cache to make this a lazy loaded portion of the application
@@ -41,50 +74,589 @@ def _embeddings() -> Embeddings:
   )
 
 
-def connect() -> VectorStore:
-  """Create langchain connection to ChromaDB.
+@lru_cache(1)
+def _tokenizer() -> "PreTrainedTokenizerBase":
+  """Get the tokenizer of the embedding model (see `split_chunks`).
+
+  Returns:
+      the tokenizer
+  """
+  # transformers is slow to import, and only needed when building
+  from transformers import AutoTokenizer
+
+  tokenizer: PreTrainedTokenizerBase = AutoTokenizer.from_pretrained(
+    EMBEDDINGS_MODEL_NAME
+  )
+  return tokenizer
+
+
+def _count_tokens(text: str) -> int:
+  """Number of tokens the embedding model sees for a text (before truncation)."""
+  return len(_tokenizer().encode(text, add_special_tokens=True))
+
+
+def hnsw_collection_metadata() -> dict[str, Any]:
+  """Builds the chroma collection metadata which configures the HNSW index
+  from the `CHROMA_HNSW_*` environment variables.
+
+  Build parameters (space, construction_ef, M) only take effect when the
+  collection is created, i.e. on the next ETL run.
+
+  Returns:
+      the collection metadata
+  """
+  metadata: dict[str, Any] = {
+    "hnsw:space": env.CHROMA_HNSW_SPACE,
+    "hnsw:construction_ef": env.CHROMA_HNSW_CONSTRUCTION_EF,
+    "hnsw:search_ef": env.CHROMA_HNSW_SEARCH_EF,
+    "hnsw:M": env.CHROMA_HNSW_M,
+    "hnsw:batch_size": env.CHROMA_HNSW_BATCH_SIZE,
+    "hnsw:sync_threshold": env.CHROMA_HNSW_SYNC_THRESHOLD,
+  }
+  if env.CHROMA_HNSW_NUM_THREADS > 0:
+    metadata["hnsw:num_threads"] = env.CHROMA_HNSW_NUM_THREADS
+  return metadata
+
+
+def location(backend: str, tenant: Optional[str] = None) -> Path:
+  """Where a backend stores the cookbook of a tenant.
+
+  Args:
+      backend: the backend, see `connect()`
+      tenant: name of the tenant, None for the default cookbook
+        (`PAPRIKA_EXPORT_PATH`)
+
+  Returns:
+      the directory of the store (the file for `snapshot`)
+
+  Raises:
+      ValueError: if the tenant name is not allowed
+  """
+  if tenant is None:
+    if backend == "snapshot":
+      return SNAPSHOT_PATH
+    return MATRIX_ROOT if backend == "matrix" else CHROMA_ROOT
+
+  if not TENANT_PATTERN.fullmatch(tenant):
+    err_msg = f"invalid tenant name: {tenant!r}"
+    raise ValueError(err_msg)
+  if backend == "snapshot":
+    return TENANTS_ROOT / tenant / "snapshot" / "recipes.snapshot"
+  return TENANTS_ROOT / tenant / ("matrix" if backend == "matrix" else "chroma")
+
+
+def connect(
+  backend: Optional[str] = None,
+  embeddings: Optional[Embeddings] = None,
+  tenant: Optional[str] = None,
+) -> VectorStore:
+  """Create langchain connection to the vector store.
+
+  Args:
+      backend: `chroma` (HNSW index in ChromaDB), `matrix` (memory-mapped
+        matrix, see `src.paprika.matrix_store`) or `snapshot` (read-only,
+        memory-mapped snapshot file, see `src.paprika.snapshot`), defaults
+        to `VECTOR_BACKEND`
+      embeddings: embedding model of the store, defaults to the sentence
+        transformer model (one instance shared by all stores)
+      tenant: whose cookbook to connect to, see `location()`
+
+  Returns:
+      vectorstore langchain adapter
+  """
+  backend = backend or env.VECTOR_BACKEND
+  # a rebuild swaps in a new version, which this connection never sees
+  return _open(
+    backend, embeddings or _embeddings(), location(backend, tenant).resolve()
+  )
+
+
+def _open(backend: str, embeddings: Embeddings, path: Path) -> VectorStore:
+  """Opens the vector store at path (see `connect()`).
+
+  Args:
+      backend: the backend
+      embeddings: embedding model of the store
+      path: directory of the store (the file for `snapshot`)
 
   Returns:
       vectorstore langchain adapter
   """
-  CHROMA_ROOT.mkdir(parents=True, exist_ok=True)
+  if backend == "snapshot":
+    return SnapshotVectorStore(
+      embedding_function=embeddings,
+      path=path,
+      nprobe=env.MATRIX_IVF_NPROBE,
+    )
+  if backend == "matrix":
+    return MatrixVectorStore(
+      embedding_function=embeddings,
+      persist_directory=path,
+      dtype="int8" if env.MATRIX_DTYPE == "int8" else "float16",
+      index="ivf" if env.MATRIX_INDEX == "ivf" else "flat",
+      nlist=env.MATRIX_IVF_NLIST,
+      nprobe=env.MATRIX_IVF_NPROBE,
+    )
+  if backend != "chroma":
+    err_msg = f"unknown vector store backend: {backend}"
+    raise ValueError(err_msg)
+
+  path.mkdir(parents=True, exist_ok=True)
   return Chroma(
     collection_name="recipes",
-    embedding_function=_embeddings(),
+    embedding_function=embeddings,
     client_settings=Settings(anonymized_telemetry=False),
-    persist_directory=str(CHROMA_ROOT),
+    persist_directory=str(path),
+    collection_metadata=hnsw_collection_metadata(),
+  )
+
+
+def index_version(backend: str, tenant: Optional[str] = None) -> Optional[str]:
+  """Identifies the version of a vector db which `connect()` would open, so
+  that a rebuild can be detected (see `DocumentWriter`).
+
+  Args:
+      backend: the backend, see `connect()`
+      tenant: whose cookbook, see `location()`
+
+  Returns:
+      the version, None if the vector db was not built
+  """
+  path = location(backend, tenant)
+  if not path.exists():
+    return None
+  if backend == "snapshot":
+    # the snapshot file is replaced by a new one, see `write_snapshot`
+    stat = path.stat()
+    return f"{stat.st_ino}:{stat.st_mtime_ns}"
+  return str(path.resolve())
+
+
+def close(store: VectorStore) -> None:
+  """Releases what a store opened by `connect()` holds beyond its memory
+  (i.e. when a tenant's store is evicted).
+
+  Args:
+      store: the store, which must not be used afterwards
+  """
+  if isinstance(store, Chroma):
+    # chroma keeps a system per directory alive until its clients are closed
+    store._client.close()  # noqa: SLF001
+
+
+def search_with_relevance(
+  store: VectorStore, embedding: list[float], k: int
+) -> list[tuple[Document, float]]:
+  """Finds the k nearest documents to a vector, with their relevance scores.
+
+  Relevance is in [0, 1] (higher is more similar) whatever the distance of
+  the backend, so one threshold applies to all of them.
+
+  Args:
+      store: the store to search
+      embedding: the query vector
+      k: number of documents to return
+
+  Returns:
+      list of (document, relevance) tuples, most relevant first
+  """
+  if isinstance(store, Chroma):
+    # despite the name, these are the collection's distances
+    scored = store.similarity_search_by_vector_with_relevance_scores(embedding, k=k)
+  else:
+    scored = store.similarity_search_by_vector_with_score(embedding, k=k)
+  relevance = store._select_relevance_score_fn()  # noqa: SLF001
+  return [(doc, relevance(distance)) for doc, distance in scored]
+
+
+@dataclass
+class SplitReport:
+  """Counts of a `split_chunks` run, relative to the model's sequence limit."""
+
+  chunks: int = 0
+  documents: int = 0
+  over_limit: int = 0
+  """chunks longer than the sequence limit"""
+  truncated: int = 0
+  """documents longer than the sequence limit, which the model truncates"""
+  truncated_by_characters: int = 0
+  """documents the character splitter leaves longer than the sequence limit
+  (i.e. which were truncated before token splitting)"""
+
+
+def split_chunks(
+  chunks: list[Chunk],
+  mode: Optional[str] = None,
+  report: Optional[SplitReport] = None,
+) -> list[Document]:
+  """Turns recipe chunks into the documents to embed, splitting long ones.
+
+  Args:
+      chunks: the chunks to split
+      mode: `characters` (split by length in characters) or `tokens` (split
+        by the tokenizer of the embedding model, at its sequence limit, and
+        only the chunks over it), defaults to `SPLITTER_MODE`
+      report: counts the chunks and documents over the sequence limit
+        into this report (the tokenizer is needed in either mode)
+
+  Returns:
+      the documents
+  """
+  mode = mode or env.SPLITTER_MODE
+  if mode not in {"characters", "tokens"}:
+    err_msg = f"unknown splitter mode: {mode}"
+    raise ValueError(err_msg)
+
+  # our chunks are mostly small enough, but to avoid truncation
+  # split the long ones
+  character_splitter = RecursiveCharacterTextSplitter(
+    chunk_size=CHARACTER_CHUNK_SIZE,
+    chunk_overlap=CHARACTER_CHUNK_OVERLAP,
+    add_start_index=True,
+  )
+  token_splitter = RecursiveCharacterTextSplitter(
+    chunk_size=EMBEDDINGS_MAX_TOKENS,
+    chunk_overlap=env.SPLITTER_TOKEN_OVERLAP,
+    length_function=_count_tokens,
+    add_start_index=True,
   )
 
+  docs = []
+  for chunk in chunks:
+    metadata = chunk.metadata.model_dump()
+    if mode == "characters":
+      pieces = character_splitter.create_documents([chunk.content], [metadata])
+      over_limit = report is not None and _count_tokens(chunk.content) > (
+        EMBEDDINGS_MAX_TOKENS
+      )
+    elif _count_tokens(chunk.content) <= EMBEDDINGS_MAX_TOKENS:
+      pieces = [
+        Document(page_content=chunk.content, metadata={**metadata, "start_index": 0})
+      ]
+      over_limit = False
+    else:
+      pieces = token_splitter.create_documents([chunk.content], [metadata])
+      over_limit = True
+
+    if report is not None:
+      report.chunks += 1
+      report.documents += len(pieces)
+      if over_limit:
+        report.over_limit += 1
+        report.truncated_by_characters += sum(
+          _count_tokens(text) > EMBEDDINGS_MAX_TOKENS
+          for text in character_splitter.split_text(chunk.content)
+        )
+        report.truncated += sum(
+          _count_tokens(piece.page_content) > EMBEDDINGS_MAX_TOKENS for piece in pieces
+        )
+
+    for i, piece in enumerate(pieces):
+      piece.id = f"{chunk.id}/{i}"
+      docs.append(piece)
+  return docs
 
-def load_chunks(chunks: list[Chunk]) -> None:
+
+def _build_marker(backend: str, tenant: Optional[str]) -> Path:
+  """File marking an unfinished build of the vector db (see `DocumentWriter`).
+
+  Args:
+      backend: the backend being built
+      tenant: whose cookbook is being built
+
+  Returns:
+      path of the marker, next to the vector db directory
+  """
+  root = location(backend, tenant)
+  return root.with_name(f".{root.name}.build")
+
+
+def _versions_dir(root: Path) -> Path:
+  """Directory holding the built versions of a vector db (see `DocumentWriter`).
+
+  Args:
+      root: the vector db directory, which links to the live version
+
+  Returns:
+      path of the versions directory, next to the vector db directory
+  """
+  return root.with_name(f".{root.name}.versions")
+
+
+def _swap(root: Path, version: Path) -> None:
+  """Atomically points the vector db directory to a version, so that new
+  connections open it while the open ones keep using their version.
+
+  Args:
+      root: the vector db directory
+      version: directory of the version
+  """
+  if root.exists() and not root.is_symlink():
+    # vector db built before versioning, kept as the oldest version
+    root.rename(version.with_name(LEGACY_VERSION))
+  link = root.with_name(f".{root.name}.swap")
+  link.unlink(missing_ok=True)
+  link.symlink_to(version.relative_to(root.parent))
+  os.replace(link, root)
+
+
+def collect_versions(root: Path, keep: Optional[int] = None) -> list[Path]:
+  """Removes the oldest versions of a vector db, keeping the live one.
+
+  Args:
+      root: the vector db directory
+      keep: number of versions kept, the live one included (default
+        `VECTOR_STORE_KEEP_VERSIONS`)
+
+  Returns:
+      the removed versions
+  """
+  keep = max(keep or env.VECTOR_STORE_KEEP_VERSIONS, 1)
+  versions_dir = _versions_dir(root)
+  if not versions_dir.is_dir():
+    return []
+  live = root.resolve()
+  # names start with their build time, and dot files are the matrix backend's
+  # staging directories
+  versions = sorted(
+    (path for path in versions_dir.iterdir() if not path.name.startswith(".")),
+    reverse=True,
+  )
+  older = [path for path in versions if path != live]
+  removed = older[keep - 1 :]
+  for path in removed:
+    shutil.rmtree(path, ignore_errors=True)
+    logger.info(f"removed vector db version {path.name}")
+  return removed
+
+
+def load_documents(
+  docs: list[Document],
+  backend: Optional[str] = None,
+  build_id: Optional[str] = None,
+  tenant: Optional[str] = None,
+) -> None:
+  """Given documents (see `split_chunks`), embeds and imports them to vector db.
+
+  The documents are loaded into a new version of the vector db, which
+  replaces the live one once complete (see `DocumentWriter`).
+
+  Args:
+      docs: the documents to load.
+      backend: which vector store to load into, see `connect()`
+      build_id: identifies the build, to resume it if interrupted
+      tenant: whose cookbook to load, see `location()`
+  """
+  # 1. create a new version of the db (unless resuming)
+  writer = DocumentWriter(backend, build_id, tenant)
+  docs = writer.missing(docs)
+
+  # 2. embed and add all the documents
+  # (batched, since chroma rejects very large single writes)
+  for start in range(0, len(docs), LOAD_BATCH_SIZE):
+    batch = docs[start : start + LOAD_BATCH_SIZE]
+    writer.write(batch, embed_documents(batch))
+  writer.close()
+
+
+def embed_documents(docs: list[Document]) -> list[list[float]]:
+  """Embeds documents with the model of the vector store (see `DocumentWriter`).
+
+  Args:
+      docs: the documents to embed
+
+  Returns:
+      the vector of each document
+  """
+  return _embeddings().embed_documents([doc.page_content for doc in docs])
+
+
+class _PrecomputedEmbeddings(Embeddings):
+  """Hands the vector store the vectors of the next write, which were
+  computed beforehand (see `DocumentWriter`).
+  """
+
+  def __init__(self) -> None:
+    """Creates the embeddings, without pending vectors."""
+    self.pending: list[list[float]] = []
+
+  def embed_documents(self, texts: list[str]) -> list[list[float]]:
+    """Returns the pending vectors (which must be one per text)."""
+    vectors, self.pending = self.pending, []
+    assert len(vectors) == len(texts), "pending vectors do not match the write"
+    return vectors
+
+  def embed_query(self, text: str) -> list[float]:
+    """Embeds a query with the model of the vector store."""
+    return _embeddings().embed_query(text)
+
+
+class DocumentWriter:
+  """Writes documents which were already embedded (see `embed_documents`)
+  into a new vector db, so that embedding and writing can run concurrently.
+
+  The vector db is built blue/green: documents are written into a new
+  version (a directory next to the live vector db), which `close()`
+  validates and then swaps in by atomically replacing the vector db
+  directory with a link to it. Apps keep serving the previous version
+  during the build, and `connect()` opens the new one from then on. Old
+  versions are removed, except the `VECTOR_STORE_KEEP_VERSIONS` newest.
+
+  Documents are upserted by their id (see `split_chunks`), so writing a
+  document again replaces it. A build with a `build_id` (i.e. a digest of
+  the export) leaves a marker next to the vector db until `close()`; if the
+  next build has the same id, it resumes the interrupted one: the documents
+  already written to its version are kept and reported by `missing()`.
+  """
+
+  def __init__(
+    self,
+    backend: Optional[str] = None,
+    build_id: Optional[str] = None,
+    tenant: Optional[str] = None,
+  ) -> None:
+    """Creates the writer and the new (or resumed) version of the vector db.
+
+    Args:
+        backend: which vector store to load into, see `connect()`
+        build_id: identifies the build, to resume it if interrupted
+        tenant: whose cookbook to load, see `location()`
+    """
+    backend = backend or env.VECTOR_BACKEND
+    if backend == "snapshot":
+      # snapshots are read-only, they are exported from chroma by `save_snapshot`
+      backend = "chroma"
+    self._backend = backend
+    self._root = location(backend, tenant)
+    self._marker = _build_marker(backend, tenant)
+
+    # the marker holds the version being built and the id of its build
+    version, _, marker_build_id = (
+      self._marker.read_text().partition("\n")
+      if self._marker.exists()
+      else ("", "", "")
+    )
+    resume = build_id is not None and version and marker_build_id == build_id
+    if not resume:
+      # the version of an interrupted build is abandoned
+      abandoned = _versions_dir(self._root) / version
+      if version and abandoned.exists() and abandoned != self._root.resolve():
+        shutil.rmtree(abandoned)
+      version = f"{datetime.now():%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+    self.version = _versions_dir(self._root) / version
+    """directory of the version being built"""
+
+    self._embeddings = _PrecomputedEmbeddings()
+    self._store = _open(backend, self._embeddings, self.version)
+    self._unpersisted = 0
+    self._persisted = (
+      len(self._store) if isinstance(self._store, MatrixVectorStore) else 0
+    )
+    self.done: set[str] = set()
+    """ids of the documents already in the vector db"""
+    if resume:
+      self.done = set(self._store.get(include=[])["ids"])
+      logger.info(f"resuming build {build_id}: {len(self.done)} documents loaded")
+
+    self._marker.parent.mkdir(parents=True, exist_ok=True)
+    self._marker.write_text(f"{version}\n{build_id or ''}")
+
+  def missing(self, docs: list[Document]) -> list[Document]:
+    """Filters out the documents which are already in the vector db.
+
+    Args:
+        docs: the documents
+
+    Returns:
+        the documents to embed and write
+    """
+    return [doc for doc in docs if doc.id not in self.done]
+
+  def write(self, docs: list[Document], vectors: list[list[float]]) -> None:
+    """Upserts documents with their vectors (not thread-safe).
+
+    Args:
+        docs: the documents
+        vectors: the vector of each document
+    """
+    for start in range(0, len(docs), LOAD_BATCH_SIZE):
+      self._embeddings.pending = vectors[start : start + LOAD_BATCH_SIZE]
+      self._store.add_documents(documents=docs[start : start + LOAD_BATCH_SIZE])
+    self.done.update(doc.id for doc in docs if doc.id is not None)
+
+    # the matrix backend only keeps what it persisted, so checkpoint it; each
+    # checkpoint rewrites the whole matrix, so as often as the store doubled
+    # (the index is only trained once, by `close()`)
+    self._unpersisted += len(docs)
+    if isinstance(self._store, MatrixVectorStore) and self._unpersisted >= max(
+      LOAD_BATCH_SIZE, self._persisted
+    ):
+      self._store.persist(train_index=False)
+      self._persisted = len(self._store)
+      self._unpersisted = 0
+
+  def close(self) -> None:
+    """Persists the new version (if the backend needs it), validates it and
+    swaps it in, then removes the old versions.
+
+    Raises:
+        RuntimeError: if the new version is empty or does not hold every
+          written document (the live vector db is left as is)
+    """
+    if isinstance(self._store, MatrixVectorStore):
+      self._store.persist()
+
+    # validate what a new connection reads back from disk
+    written = _open(self._backend, self._embeddings, self.version)
+    ids = set(written.get(include=[])["ids"])
+    close(written)
+    if not ids or ids != self.done:
+      err_msg = (
+        f"vector db version {self.version.name} is invalid: it holds {len(ids)} "
+        f"documents, {len(self.done)} were written"
+      )
+      raise RuntimeError(err_msg)
+
+    _swap(self._root, self.version)
+    self._marker.unlink(missing_ok=True)
+    logger.info(f"swapped in vector db version {self.version.name} ({len(ids)} docs)")
+    collect_versions(self._root)
+
+
+def load_chunks(
+  chunks: list[Chunk], backend: Optional[str] = None, build_id: Optional[str] = None
+) -> None:
   """Given list of recipe chunks, imports those chunks to vector db.
 
-  If a vector db already exists, calling this function REMOVES
-  the entire vector db.
+  The chunks are loaded into a new version of the vector db, which replaces
+  the live one once complete (see `DocumentWriter`).
 
   Use the `connect()` function in this module to connect to the db
   populated by this function.
 
   Args:
       chunks: the chunks to load.
+      backend: which vector store to load into, see `connect()`
+      build_id: identifies the build, to resume it if interrupted
   """
-  # 1. remove the db if it already exists
-  if CHROMA_ROOT.exists():
-    shutil.rmtree(CHROMA_ROOT)
+  load_documents(split_chunks(chunks), backend, build_id)
 
-  # 2. create the langchain documents to import
-  docs = [
-    Document(page_content=chunk.content, metadata=chunk.metadata.model_dump())
-    for chunk in chunks
-  ]
 
-  # 3. our chunks are already small enough, but for safety
-  # do splitting to avoid truncation
-  text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=1024, chunk_overlap=200, add_start_index=True
-  )
-  docs = text_splitter.split_documents(docs)
+def save_snapshot(backend: Optional[str] = None, tenant: Optional[str] = None) -> None:
+  """Exports the vector store populated by `load_chunks` into the read-only
+  snapshot file which the `snapshot` backend of `connect()` maps.
 
-  # 4. connect to the db and add all the documents (this triggers embedding)
-  vector_store = connect()
-  vector_store.add_documents(documents=docs)
+  Args:
+      backend: which vector store to export, see `load_chunks()`
+      tenant: whose cookbook to export, see `location()`
+  """
+  backend = backend or env.VECTOR_BACKEND
+  store = connect("chroma" if backend == "snapshot" else backend, tenant=tenant)
+  assert not isinstance(store, SnapshotVectorStore), "cannot export a snapshot"
+  export_snapshot(
+    store,
+    location("snapshot", tenant),
+    dtype="int8" if env.MATRIX_DTYPE == "int8" else "float16",
+    index="ivf" if env.MATRIX_INDEX == "ivf" else "flat",
+    nlist=env.MATRIX_IVF_NLIST,
+  )
@@ -0,0 +1,184 @@
+"""Per-stage profiling of batch jobs (i.e. the ETL).
+
+Each stage of a job runs inside `StageProfiler.stage`, which records its wall
+time, CPU time, peak resident memory and the number of items it produced,
+and can also capture a cProfile of the stage. The report is JSON, so builds
+can be compared run to run.
+
+Example::
+
+    profiler = StageProfiler(enabled=True)
+    with profiler.stage("parse") as stage:
+      recipes = parse(path)
+      stage.items = len(recipes)
+    profiler.write(Path("profile.json"))
+"""
+
+import cProfile
+import io
+import json
+import logging
+import platform
+import pstats
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+PROC_STATUS = Path("/proc/self/status")
+PROC_CLEAR_REFS = Path("/proc/self/clear_refs")
+TOP_FUNCTIONS = 15
+"""Number of functions (by cumulative time) kept in the report per stage"""
+
+
+@dataclass
+class StageStats:
+  """Measurements of one stage."""
+
+  name: str
+  items: Optional[int] = None
+  """number of items the stage produced, set by the stage"""
+  wall_s: float = 0.0
+  cpu_s: float = 0.0
+  """CPU time of the whole process (all threads) during the stage"""
+  rss_start_mb: float = 0.0
+  peak_rss_mb: float = 0.0
+  """peak resident memory during the stage (since the start of the process
+  where the peak cannot be reset)"""
+  top_functions: list[dict[str, Any]] = field(default_factory=list)
+
+
+def _proc_status_mb(key: str) -> Optional[float]:
+  """Reads a memory size (i.e. `VmRSS`, `VmHWM`) of this process in MB."""
+  if not PROC_STATUS.exists():
+    return None
+  for line in PROC_STATUS.read_text().splitlines():
+    if line.startswith(f"{key}:"):
+      return int(line.split()[1]) / 1e3  # kB
+  return None
+
+
+def _reset_peak_rss() -> None:
+  """Resets the peak resident memory of the process (Linux only)."""
+  try:
+    PROC_CLEAR_REFS.write_text("5")
+  except OSError:
+    pass
+
+
+def _peak_rss_mb() -> float:
+  """Peak resident memory of the process in MB."""
+  peak = _proc_status_mb("VmHWM")
+  if peak is not None:
+    return peak
+  maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  # bytes on macOS, kB elsewhere
+  return maxrss / 1e6 if sys.platform == "darwin" else maxrss / 1e3
+
+
+def _top_functions(profile: cProfile.Profile) -> list[dict[str, Any]]:
+  """Summarizes the functions of a profile with the highest cumulative time."""
+  stats = pstats.Stats(profile, stream=io.StringIO())
+  rows = []
+  for (filename, line, function), (_, calls, total, cumulative, _) in sorted(
+    stats.stats.items(),  # type: ignore[attr-defined]
+    key=lambda item: item[1][3],
+    reverse=True,
+  )[:TOP_FUNCTIONS]:
+    rows.append(
+      {
+        "function": f"{filename}:{line}({function})",
+        "calls": calls,
+        "total_s": round(total, 4),
+        "cumulative_s": round(cumulative, 4),
+      }
+    )
+  return rows
+
+
+class StageProfiler:
+  """Profiles the stages of a job, a no-op unless enabled."""
+
+  def __init__(self, enabled: bool, cprofile_dir: Optional[Path] = None) -> None:
+    """Creates the profiler.
+
+    Args:
+        enabled: whether to profile at all
+        cprofile_dir: also capture a cProfile per stage, written to
+          `<stage>.prof` files in this directory
+    """
+    self.enabled = enabled
+    self.cprofile_dir = cprofile_dir
+    self.stages: list[StageStats] = []
+    self.started = time.time()
+
+  @contextmanager
+  def stage(self, name: str) -> Iterator[StageStats]:
+    """Profiles a stage.
+
+    Args:
+        name: name of the stage
+
+    Yields:
+        the stats of the stage, to set the number of items on
+    """
+    stats = StageStats(name=name)
+    if not self.enabled:
+      yield stats
+      return
+
+    _reset_peak_rss()
+    stats.rss_start_mb = _proc_status_mb("VmRSS") or 0.0
+    profile = cProfile.Profile() if self.cprofile_dir is not None else None
+    wall, cpu = time.perf_counter(), time.process_time()
+    if profile is not None:
+      profile.enable()
+    try:
+      yield stats
+    finally:
+      if profile is not None:
+        profile.disable()
+      stats.wall_s = round(time.perf_counter() - wall, 3)
+      stats.cpu_s = round(time.process_time() - cpu, 3)
+      stats.peak_rss_mb = round(_peak_rss_mb(), 1)
+      stats.rss_start_mb = round(stats.rss_start_mb, 1)
+      if profile is not None and self.cprofile_dir is not None:
+        self.cprofile_dir.mkdir(parents=True, exist_ok=True)
+        profile.dump_stats(self.cprofile_dir / f"{name}.prof")
+        stats.top_functions = _top_functions(profile)
+      self.stages.append(stats)
+      logger.info(
+        f"stage {name}: {stats.wall_s}s wall, {stats.cpu_s}s cpu, "
+        f"peak rss {stats.peak_rss_mb}MB, {stats.items} items"
+      )
+
+  def report(self) -> dict[str, Any]:
+    """The report of the stages profiled so far.
+
+    Returns:
+        JSON serializable report
+    """
+    return {
+      "started": self.started,
+      "python": platform.python_version(),
+      "platform": platform.platform(),
+      "total_wall_s": round(sum(stage.wall_s for stage in self.stages), 3),
+      "stages": [asdict(stage) for stage in self.stages],
+    }
+
+  def write(self, path: Path) -> None:
+    """Writes the report as JSON (if enabled).
+
+    Args:
+        path: where to write the report
+    """
+    if not self.enabled:
+      return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(self.report(), indent=2))
+    logger.info(f"wrote profile report to {path}")
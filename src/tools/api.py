@@ -1,34 +1,60 @@
 import json
+from typing import Any, Callable, Optional
 
 import requests
 
+from src import tracing
 from src.tools.api_cache import ApiCache
+from src.tools.singleflight import SingleFlight
 
+_in_flight: SingleFlight[str] = SingleFlight("http")
 
-def safe_get(url: str, params: dict[str, str] | None = None) -> str:
+
+def safe_get(
+  url: str,
+  params: dict[str, str] | None = None,
+  shape: Optional[Callable[[Any], str]] = None,
+  shape_tag: str = "",
+) -> str:
   """Sends a GET request to the given URL with the given params, with try except to
   handle errors.
 
   Args:
       url: url of endpoint to hit
       params: dict of params to append to the request
+      shape: renders the parsed json response into the returned (and cached)
+        string, default the json as is
+      shape_tag: identifies the shaping (and its settings) in the cache, so
+        changing either does not return stale responses
 
   Returns:
-      string of json response from the endpoint
+      string of (shaped) json response from the endpoint
   """
   # get API cache and get response for call if cached
   api_cache = ApiCache()
-  cached_response = api_cache.get_response(url, params)
+  tag = shape_tag if shape is not None else ""
+  cached_response = api_cache.get_response(url, params, tag)
 
   # return if cached
   if cached_response:
     return cached_response
 
-  # try API call since response was not cached
-  try:
-    response = requests.get(url, params=params)
-    response.raise_for_status()
-    data = response.json()
-    return json.dumps(data)
-  except Exception as e:
-    return f"Unexpected error when sending GET req: {e}"
+  # try API call since response was not cached, sharing it with identical
+  # concurrent calls which missed the cache as well
+  key = api_cache.make_cache_key(url, params, tag)
+
+  def fetch() -> str:
+    try:
+      with tracing.span("mealdb_http", url=url):
+        response = requests.get(url, params=params)
+      response.raise_for_status()
+      data = response.json()
+      # parse + shape once and cache the result, not the raw payload
+      rendered = shape(data) if shape is not None else json.dumps(data)
+    except Exception as e:
+      return f"Unexpected error when sending GET req: {e}"
+
+    api_cache.set_response(key, rendered)
+    return rendered
+
+  return _in_flight.do(key, fetch)
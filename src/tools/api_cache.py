@@ -1,8 +1,9 @@
 import sqlite3
+import threading
 from typing import Optional
 from urllib.parse import urlencode
 
-from src.env import API_CACHE_DB_PATH
+from src import env
 
 CREATE_API_CACHE_STR = """
     CREATE TABLE IF NOT EXISTS api_cache (
@@ -10,12 +11,16 @@ CREATE_API_CACHE_STR = """
         response TEXT
     )
 """
+SQLITE_BUSY_TIMEOUT_S = 30
+"""How long a writer waits for another process holding the DB lock."""
 
 
 class ApiCache:
   """A persistent cache that stores API calls and responses."""
 
   _instance: Optional["ApiCache"] = None  # class level instance
+  _initialized: bool = False
+  _init_lock = threading.Lock()
 
   def __new__(cls, *args: object, **kwargs: object) -> "ApiCache":
     """Create singleton for persistent API cache.
@@ -27,61 +32,78 @@ class ApiCache:
     Returns:
         singleton of ApiCache
     """
-    if not cls._instance:
-      cls._instance = super(ApiCache, cls).__new__(cls, *args, **kwargs)
+    with cls._init_lock:
+      if not cls._instance:
+        cls._instance = super(ApiCache, cls).__new__(cls, *args, **kwargs)
     return cls._instance
 
   def __init__(self) -> None:
     """Returns singleton of ApiCache with initialized SQLite database if exists.
     Else initializes an SQLite database and table for the API cache.
     """
-    # if initialized don't initialize
-    if hasattr(self, "_initialized") and self._initialized:
-      return
-
-    # create database and table
-    API_CACHE_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-
-    self.conn = sqlite3.connect(str(API_CACHE_DB_PATH))
-    self.cursor = self.conn.cursor()
-    self.cursor.execute(CREATE_API_CACHE_STR)
-    self.conn.commit()
-
-  def make_cache_key(self, url: str, params: dict[str, str] | None) -> str:
+    # tool threads may create the singleton at once, only one initializes it
+    with ApiCache._init_lock:
+      # if initialized don't initialize
+      if hasattr(self, "_initialized") and self._initialized:
+        return
+
+      # create database and table
+      env.API_CACHE_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+
+      # the singleton is shared by threads (tools run off the event loop) and the
+      # DB file by app worker processes, hence the lock and write-ahead-log mode
+      self.lock = threading.Lock()
+      self.conn = sqlite3.connect(
+        str(env.API_CACHE_DB_PATH),
+        timeout=SQLITE_BUSY_TIMEOUT_S,
+        check_same_thread=False,
+      )
+      self.conn.execute("PRAGMA journal_mode=WAL")
+      self.cursor = self.conn.cursor()
+      self.cursor.execute(CREATE_API_CACHE_STR)
+      self.conn.commit()
+      self._initialized = True
+
+  def make_cache_key(
+    self, url: str, params: dict[str, str] | None, tag: str = ""
+  ) -> str:
     """Takes in URL and params for the API call and turns it into key for cache.
 
     Args:
         url: the URL of the API call
         params: queries to include in the API call
+        tag: identifies a transformed (i.e. shaped) form of the response
 
     Returns:
-        the complete URL string the API call is to, including queries
+        the complete URL string the API call is to, including queries (and tag)
     """
     url_postfix = ""
     if params is not None:
       sorted_params = dict(sorted(params.items()))
       url_postfix = f"?{urlencode(sorted_params)}"
+    if tag:
+      url_postfix += f"#{tag}"
 
     return url + url_postfix
 
-  def get_response(self, url: str, params: dict[str, str] | None) -> str:
+  def get_response(self, url: str, params: dict[str, str] | None, tag: str = "") -> str:
     """Tries to get the response for the API call if it exists in the database.
     Else returns empty string.
 
     Args:
         url: the URL of the API call
         params: queries to include in the API call
+        tag: identifies a transformed (i.e. shaped) form of the response
 
     Returns:
-        either the response from the API call or None
+        either the response from the API call or empty string
     """
-    key = self.make_cache_key(url, params)
-    return (
-      self.cursor.execute(
+    key = self.make_cache_key(url, params, tag)
+    with self.lock:
+      row = self.cursor.execute(
         "SELECT response FROM api_cache WHERE key=?", (key,)
       ).fetchone()
-      or ""
-    )
+    return row[0] if row else ""
 
   def set_response(self, key: str, response: str) -> None:
     """Tries to get the response for the API call if it exists in the database.
@@ -94,7 +116,9 @@ class ApiCache:
     Returns:
         either the response from the API call or None
     """
-    self.cursor.execute(
-      "INSERT OR REPLACE INTO api_cache (key, response) VALUES (?, ?)", (key, response)
-    )
-    self.conn.commit()
+    with self.lock:
+      self.cursor.execute(
+        "INSERT OR REPLACE INTO api_cache (key, response) VALUES (?, ?)",
+        (key, response),
+      )
+      self.conn.commit()
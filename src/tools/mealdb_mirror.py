@@ -0,0 +1,315 @@
+"""Local mirror of MealDB in SQLite.
+
+The whole MealDB dataset (a few hundred meals) is small enough to keep on
+disk, so the MealDB tools can answer from a local database with a full text
+index instead of making a network round trip per call. The network is only
+used to (periodically) re-sync the mirror.
+
+Queries return the same raw payloads as the MealDB API, so the responses go
+through the same shaping as the network backend.
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import string
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Optional, TypedDict
+
+import requests
+
+from src import env, tracing
+
+logger = logging.getLogger(__name__)
+
+OPTION_TYPES = ("i", "c", "a")
+"""MealDB filter option types: ingredient, category and area"""
+REQUEST_TIMEOUT_S = 30
+
+CREATE_MIRROR_STR = """
+    CREATE TABLE meals (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        category TEXT COLLATE NOCASE,
+        area TEXT COLLATE NOCASE,
+        data TEXT NOT NULL
+    );
+    CREATE INDEX meals_category ON meals (category);
+    CREATE INDEX meals_area ON meals (area);
+    CREATE TABLE meal_ingredients (
+        meal_id TEXT NOT NULL,
+        ingredient TEXT NOT NULL COLLATE NOCASE
+    );
+    CREATE INDEX meal_ingredients_ingredient ON meal_ingredients (ingredient);
+    CREATE TABLE options (
+        type TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        data TEXT NOT NULL,
+        PRIMARY KEY (type, position)
+    );
+    CREATE TABLE meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    CREATE VIRTUAL TABLE meals_fts USING fts5 (
+        name, content='meals', content_rowid='rowid'
+    );
+"""
+
+
+class MealDBSnapshot(TypedDict):
+  """Everything the mirror holds, as returned by the MealDB API."""
+
+  meals: list[dict[str, Any]]
+  """full meals (as from `search.php`)"""
+  options: dict[str, list[dict[str, Any]]]
+  """option type (`i`, `c` or `a`) -> options (as from `list.php`)"""
+
+
+def _http_get(endpoint: str, params: dict[str, str]) -> Any:  # noqa: ANN401
+  """Gets and parses a MealDB API endpoint."""
+  response = requests.get(
+    f"{env.MEALDB_BASE_URL}/{endpoint}", params=params, timeout=REQUEST_TIMEOUT_S
+  )
+  response.raise_for_status()
+  return response.json()
+
+
+def fetch_snapshot(
+  get: Callable[[str, dict[str, str]], Any] = _http_get,
+) -> MealDBSnapshot:
+  """Downloads all of MealDB. Meals are listed by first letter since the API
+  has no endpoint listing all of them.
+
+  Args:
+      get: fetches and parses an endpoint with the given params
+
+  Returns:
+      the snapshot of MealDB
+  """
+  meals: dict[str, dict[str, Any]] = {}
+  for letter in string.ascii_lowercase:
+    for meal in get("search.php", {"f": letter}).get("meals") or []:
+      meals[meal["idMeal"]] = meal
+  options = {
+    option_type: get("list.php", {option_type: "list"}).get("meals") or []
+    for option_type in OPTION_TYPES
+  }
+  logger.info(f"fetched {len(meals)} meals from MealDB")
+  return {"meals": list(meals.values()), "options": options}
+
+
+def _ingredients(meal: dict[str, Any]) -> set[str]:
+  """Non-empty ingredients of a meal."""
+  return {
+    value.strip()
+    for key, value in meal.items()
+    if key.startswith("strIngredient") and value and value.strip()
+  }
+
+
+def write_mirror(path: Path, snapshot: MealDBSnapshot) -> None:
+  """Writes the mirror database. It is built next to `path` and then renamed
+  over it, so readers either see the old or the new mirror.
+
+  Args:
+      path: where to write the mirror
+      snapshot: the MealDB data to mirror
+  """
+  path.parent.mkdir(parents=True, exist_ok=True)
+  tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+  tmp_path.unlink(missing_ok=True)
+
+  conn = sqlite3.connect(tmp_path)
+  try:
+    conn.executescript(CREATE_MIRROR_STR)
+    conn.executemany(
+      "INSERT OR REPLACE INTO meals (id, name, category, area, data) "
+      "VALUES (?, ?, ?, ?, ?)",
+      (
+        (
+          meal["idMeal"],
+          meal["strMeal"],
+          meal.get("strCategory"),
+          meal.get("strArea"),
+          json.dumps(meal),
+        )
+        for meal in snapshot["meals"]
+      ),
+    )
+    conn.executemany(
+      "INSERT INTO meal_ingredients (meal_id, ingredient) VALUES (?, ?)",
+      (
+        (meal["idMeal"], ingredient)
+        for meal in snapshot["meals"]
+        for ingredient in _ingredients(meal)
+      ),
+    )
+    conn.executemany(
+      "INSERT INTO options (type, position, data) VALUES (?, ?, ?)",
+      (
+        (option_type, position, json.dumps(option))
+        for option_type, options in snapshot["options"].items()
+        for position, option in enumerate(options)
+      ),
+    )
+    conn.execute("INSERT INTO meals_fts (rowid, name) SELECT rowid, name FROM meals")
+    conn.execute(
+      "INSERT INTO meta (key, value) VALUES ('synced_at', ?)", (str(time.time()),)
+    )
+    conn.commit()
+  finally:
+    conn.close()
+  os.replace(tmp_path, path)
+  logger.info(f"wrote MealDB mirror of {len(snapshot['meals'])} meals to {path}")
+
+
+def sync(path: Path) -> None:
+  """Downloads MealDB and (re)writes the mirror at path.
+
+  Args:
+      path: where to write the mirror
+  """
+  write_mirror(path, fetch_snapshot())
+
+
+class MealDBMirror:
+  """Answers MealDB API queries from the local mirror.
+
+  Safe to share between threads. Picks up a re-synced mirror (a new file
+  renamed over the old one) on the next query.
+  """
+
+  def __init__(self, path: Path) -> None:
+    """Opens the mirror.
+
+    Args:
+        path: the mirror database
+    """
+    self.path = path
+    self.lock = threading.Lock()
+    self._conn: Optional[sqlite3.Connection] = None
+    self._inode = -1
+
+  def _query(self, sql: str, params: tuple[str, ...] = ()) -> list[tuple[Any, ...]]:
+    """Runs a query, reopening the database if it was re-synced.
+
+    Args:
+        sql: the query
+        params: parameters of the query
+
+    Returns:
+        the rows of the result
+    """
+    inode = self.path.stat().st_ino
+    with self.lock:
+      if self._conn is None or inode != self._inode:
+        if self._conn is not None:
+          self._conn.close()
+        self._conn = sqlite3.connect(
+          f"file:{self.path}?mode=ro", uri=True, check_same_thread=False
+        )
+        self._inode = inode
+      with tracing.span("mealdb_local"):
+        return self._conn.execute(sql, params).fetchall()
+
+  def synced_at(self) -> float:
+    """Unix time of the last sync of the mirror."""
+    rows = self._query("SELECT value FROM meta WHERE key = 'synced_at'")
+    return float(rows[0][0]) if rows else 0.0
+
+  def search_meal_by_name(self, meal_name: str) -> dict[str, Any]:
+    """Local `search.php?s=`: meals whose name has every word of the query
+    (as a word prefix), best matches first.
+
+    Args:
+        meal_name: name of the meal to search for
+
+    Returns:
+        MealDB response with the full matching meals
+    """
+    words = re.findall(r"\w+", meal_name.lower())
+    if not words:
+      rows = self._query("SELECT data FROM meals ORDER BY name")
+    else:
+      match = " ".join(f'"{word}"*' for word in words)
+      rows = self._query(
+        "SELECT meals.data FROM meals_fts "
+        "JOIN meals ON meals.rowid = meals_fts.rowid "
+        "WHERE meals_fts MATCH ? ORDER BY meals_fts.rank",
+        (match,),
+      )
+    return {"meals": [json.loads(data) for (data,) in rows] or None}
+
+  def filter_recipes(self, params: dict[str, str]) -> dict[str, Any]:
+    """Local `filter.php`: meals with an ingredient (`i`), in a category (`c`)
+    or from an area (`a`), case insensitive.
+
+    Args:
+        params: a single filter, as for the API
+
+    Returns:
+        MealDB response with summaries of the matching meals
+    """
+    if len(params) != 1:
+      return {"meals": None}
+    ((key, value),) = params.items()
+    if key == "i":
+      sql = (
+        "SELECT DISTINCT meals.data FROM meal_ingredients "
+        "JOIN meals ON meals.id = meal_ingredients.meal_id "
+        "WHERE meal_ingredients.ingredient = ? ORDER BY meals.name"
+      )
+      value = value.replace("_", " ")
+    elif key == "c":
+      sql = "SELECT data FROM meals WHERE category = ? ORDER BY name"
+    elif key == "a":
+      sql = "SELECT data FROM meals WHERE area = ? ORDER BY name"
+    else:
+      err_msg = f"unknown filter {key}"
+      raise ValueError(err_msg)
+
+    meals = [json.loads(data) for (data,) in self._query(sql, (value.strip(),))]
+    summaries = [
+      {key: meal.get(key) for key in ("strMeal", "strMealThumb", "idMeal")}
+      for meal in meals
+    ]
+    return {"meals": summaries or None}
+
+  def list_filter_options(self, option_type: str) -> dict[str, Any]:
+    """Local `list.php`: the options of a filter type.
+
+    Args:
+        option_type: `i`, `c` or `a`
+
+    Returns:
+        MealDB response with the options
+    """
+    rows = self._query(
+      "SELECT data FROM options WHERE type = ? ORDER BY position", (option_type,)
+    )
+    return {"meals": [json.loads(data) for (data,) in rows] or None}
+
+  def start_refresh(self, interval_s: float) -> None:
+    """Starts a daemon thread re-syncing the mirror from MealDB whenever it is
+    older than the interval.
+
+    Args:
+        interval_s: maximum age of the mirror
+    """
+
+    def refresh() -> None:
+      while True:
+        age = time.time() - self.synced_at()
+        time.sleep(max(interval_s - age, 0))
+        try:
+          sync(self.path)
+        except Exception as e:  # keep serving the old mirror
+          logger.warning(f"failed to refresh MealDB mirror: {e}")
+          time.sleep(interval_s)
+
+    threading.Thread(target=refresh, name="mealdb-refresh", daemon=True).start()
@@ -1,14 +1,120 @@
+import json
 from enum import Enum
-from typing import Optional
+from functools import lru_cache
+from typing import Any, Optional
 
 from langchain.tools import tool
 
+from src import env
+from src.executors import io_pool, run_on
 from src.tools.api import safe_get
+from src.tools.mealdb_mirror import MealDBMirror, sync
 
-MEALDB_BASE_URL = "https://www.themealdb.com/api/json/v1/1"
-SEARCH_MEAL_BY_NAME_URL = f"{MEALDB_BASE_URL}/search.php"
-FILTER_BY_X_URL = f"{MEALDB_BASE_URL}/filter.php"
-LIST_OPTIONS_URL = f"{MEALDB_BASE_URL}/list.php"
+MAX_INGREDIENTS = 20
+"""MealDB meals have `strIngredient1..20` and `strMeasure1..20` fields"""
+SHAPE_VERSION = 1
+"""Bump when the shaped renderings change, so cached ones are not reused"""
+
+
+def _meals(data: Any) -> list[dict[str, Any]]:  # noqa: ANN401
+  """Gets the meals of a MealDB response (`meals` is null if none match)."""
+  meals = data.get("meals") if isinstance(data, dict) else None
+  return meals if isinstance(meals, list) else []
+
+
+def _dumps(data: dict[str, Any]) -> str:
+  """Renders a shaped response as compact json."""
+  return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def _capped(items: list[Any]) -> dict[str, Any]:
+  """Caps a list of results at `MEALDB_MAX_RESULTS`, noting the total."""
+  shaped: dict[str, Any] = {"meals": items[: env.MEALDB_MAX_RESULTS]}
+  if len(items) > env.MEALDB_MAX_RESULTS:
+    shaped["total"] = len(items)
+  return shaped
+
+
+def shape_meals(data: Any) -> str:  # noqa: ANN401
+  """Renders full MealDB meals (i.e. from search by name) compactly: name,
+  area, category, the non-empty ingredient/measure pairs and instructions.
+  Images, links and the many empty/null fields are dropped.
+
+  Args:
+      data: parsed MealDB response
+
+  Returns:
+      compact json of the meals
+  """
+  shaped = []
+  for meal in _meals(data):
+    ingredients = []
+    for i in range(1, MAX_INGREDIENTS + 1):
+      ingredient = (meal.get(f"strIngredient{i}") or "").strip()
+      measure = (meal.get(f"strMeasure{i}") or "").strip()
+      if ingredient:
+        ingredients.append(f"{measure} {ingredient}".strip())
+    shaped.append(
+      {
+        "name": meal.get("strMeal"),
+        "area": meal.get("strArea"),
+        "category": meal.get("strCategory"),
+        "ingredients": ingredients,
+        "instructions": (meal.get("strInstructions") or "").strip(),
+      }
+    )
+  return _dumps(_capped(shaped))
+
+
+def shape_meal_names(data: Any) -> str:  # noqa: ANN401
+  """Renders MealDB meal summaries (i.e. from filter) as their names.
+
+  Args:
+      data: parsed MealDB response
+
+  Returns:
+      compact json of the meal names
+  """
+  return _dumps(_capped([meal.get("strMeal") for meal in _meals(data)]))
+
+
+def shape_options(data: Any) -> str:  # noqa: ANN401
+  """Renders MealDB filter options as a list of their names (i.e. dropping
+  the long ingredient descriptions).
+
+  Args:
+      data: parsed MealDB response
+
+  Returns:
+      compact json of the options
+  """
+  options = [
+    value
+    for option in _meals(data)
+    for key, value in option.items()
+    if key in {"strIngredient", "strCategory", "strArea"} and value
+  ]
+  return _dumps({"options": options})
+
+
+def _shape_tag(name: str) -> str:
+  """Cache tag of a shaping, including the settings it depends on."""
+  return f"{name}-v{SHAPE_VERSION}-max{env.MEALDB_MAX_RESULTS}"
+
+
+@lru_cache(maxsize=1)
+def _mirror() -> MealDBMirror:
+  """The local MealDB mirror (`MEALDB_BACKEND=local`), synced first if missing.
+
+  Returns:
+      the mirror, refreshing itself in the background
+  """
+  if not env.MEALDB_MIRROR_PATH.exists():
+    sync(env.MEALDB_MIRROR_PATH)
+  mirror = MealDBMirror(env.MEALDB_MIRROR_PATH)
+  if env.MEALDB_REFRESH_INTERVAL_S > 0:
+    mirror.start_refresh(env.MEALDB_REFRESH_INTERVAL_S)
+  return mirror
 
 
 class FilterOptionTypes(str, Enum):
@@ -25,6 +131,7 @@ class MealDBWrapper:
   """Wrapper class for LangChain tools to reference MealDB endpoints if needed."""
 
   @staticmethod
+  @run_on(io_pool)
   @tool
   def search_meal_by_name(meal_name: str) -> str:
     """Calls MealDB search meal by name endpoint with the given meal_name.
@@ -35,11 +142,19 @@ class MealDBWrapper:
         meal_name: name of meal to query MealDB for a recipe for
 
     Returns:
-        string of json response from MealDB
+        compact json of the matching meals
     """
-    return safe_get(SEARCH_MEAL_BY_NAME_URL, {"s": meal_name})
+    if env.MEALDB_BACKEND == "local":
+      return shape_meals(_mirror().search_meal_by_name(meal_name))
+    return safe_get(
+      f"{env.MEALDB_BASE_URL}/search.php",
+      {"s": meal_name},
+      shape=shape_meals,
+      shape_tag=_shape_tag("meals"),
+    )
 
   @staticmethod
+  @run_on(io_pool)
   @tool
   def filter_recipes(
     ingredient: Optional[str] = None,
@@ -63,7 +178,7 @@ class MealDBWrapper:
         area: area to filter meals for (i.e. Canada)
 
     Returns:
-        string of json response from MealDB containing meals with main ingredient
+        compact json of the names of the meals matching the filter
     """
     # only include in params if the function is called with it
     params = {
@@ -76,9 +191,17 @@ class MealDBWrapper:
     if len(params) > 1:
       return "Could not filter with more than one keyword"
 
-    return safe_get(FILTER_BY_X_URL, params)
+    if env.MEALDB_BACKEND == "local":
+      return shape_meal_names(_mirror().filter_recipes(params))
+    return safe_get(
+      f"{env.MEALDB_BASE_URL}/filter.php",
+      params,
+      shape=shape_meal_names,
+      shape_tag=_shape_tag("names"),
+    )
 
   @staticmethod
+  @run_on(io_pool)
   @tool
   def list_filter_options(filter_option_type: FilterOptionTypes) -> str:
     """Calls MealDB endpoint to get a list of filter options for the given type.
@@ -95,7 +218,13 @@ class MealDBWrapper:
         filter_option_type: types of filters to get options for
 
     Returns:
-        string of json response from MealDB containing options of things to filter by
-        for the given type
+        compact json of the options of things to filter by for the given type
     """
-    return safe_get(LIST_OPTIONS_URL, {filter_option_type.value: "list"})
+    if env.MEALDB_BACKEND == "local":
+      return shape_options(_mirror().list_filter_options(filter_option_type.value))
+    return safe_get(
+      f"{env.MEALDB_BASE_URL}/list.php",
+      {filter_option_type.value: "list"},
+      shape=shape_options,
+      shape_tag=_shape_tag("options"),
+    )
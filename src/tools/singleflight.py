@@ -0,0 +1,69 @@
+"""Coalescing of identical concurrent calls ("single-flight").
+
+When several sessions make the same tool call at the same moment (i.e. the
+example prompts of the app), only the first caller computes the result and
+the others wait for and share it, rather than all missing the cache at once.
+"""
+
+import threading
+from concurrent.futures import Future
+from typing import Callable, Generic, Hashable, TypeVar
+
+from src import metrics
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+  """Runs at most one computation per key at a time, sharing its result with
+  every caller asking for the same key while it is in flight. Results are
+  not kept after the computation finishes (that is what caches are for).
+
+  Thread safe, for use from the tool pools.
+  """
+
+  def __init__(self, name: str) -> None:
+    """Creates the group.
+
+    Args:
+        name: name of the group in the metrics (`singleflight_<name>_*`)
+    """
+    self.name = name
+    self._lock = threading.Lock()
+    self._in_flight: dict[Hashable, Future[T]] = {}
+
+  def do(self, key: Hashable, func: Callable[[], T]) -> T:
+    """Computes func, or waits for the in-flight computation of the same key.
+
+    Args:
+        key: identifies identical calls
+        func: the computation
+
+    Returns:
+        the result of the (shared) computation
+
+    Raises:
+        Exception: whatever the (shared) computation raised
+    """
+    metrics.counter(f"singleflight_{self.name}_calls").inc()
+    with self._lock:
+      future = self._in_flight.get(key)
+      leader = future is None
+      if future is None:
+        future = self._in_flight[key] = Future()
+
+    if not leader:
+      metrics.counter(f"singleflight_{self.name}_coalesced").inc()
+      return future.result()
+
+    try:
+      result = func()
+    except BaseException as e:
+      future.set_exception(e)
+      raise
+    else:
+      future.set_result(result)
+      return result
+    finally:
+      with self._lock:
+        del self._in_flight[key]
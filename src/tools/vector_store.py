@@ -1,8 +1,23 @@
+import logging
+from contextlib import nullcontext
+from functools import partial
+from typing import ContextManager
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun, Callbacks
+from langchain_core.documents import Document
 from langchain_core.prompts import PromptTemplate
+from langchain_core.retrievers import BaseRetriever
 from langchain_core.tools import Tool, retriever
 from pydantic import BaseModel
 
-from src.paprika.vectorstore import VectorStore
+from src import metrics, tracing
+from src.agent import speculation
+from src.executors import retrieval_pool, run_on
+from src.paprika import tenants
+from src.paprika.live_index import LiveStore
+from src.paprika.tenants import TenantStores
+from src.paprika.vectorstore import VectorStore, search_with_relevance
+from src.tools.singleflight import SingleFlight
 
 VECTORSTORE_PROMPT_TEMPLATE = (
   "-- RECIPE DOCUMENT --\n"
@@ -12,16 +27,122 @@ VECTORSTORE_PROMPT_TEMPLATE = (
   "-- END RECIPE DOCUMENT --\n"
 )
 
+NO_RESULTS = "No recipe in the cookbook is relevant to this query."
+"""Tool result when no chunk is relevant enough (see `score_threshold`)"""
+CHARS_PER_TOKEN = 4
+"""Rough number of characters per model token, to estimate the tokens saved"""
+
+logger = logging.getLogger(__name__)
+
+_in_flight: SingleFlight[str] = SingleFlight("retrieval")
+
+
+def normalize_query(query: str) -> str:
+  """Normalizes a retrieval query so trivially different queries (case,
+  whitespace) are treated as identical.
+
+  Args:
+      query: the query
+
+  Returns:
+      the normalized query
+  """
+  return " ".join(query.lower().split())
+
+
+def _use(
+  vectorstore: VectorStore | TenantStores | LiveStore,
+) -> ContextManager[VectorStore]:
+  """The store to search in the current session: the tenant's store if there
+  are several, or the live version of a reloaded store (leased while searched).
+
+  Args:
+      vectorstore: the store, the stores of the tenants, or the reloaded store
+
+  Returns:
+      context manager yielding the store
+  """
+  if isinstance(vectorstore, TenantStores):
+    return vectorstore.use(tenants.current.get())
+  if isinstance(vectorstore, LiveStore):
+    return vectorstore.use()
+  return nullcontext(vectorstore)
+
+
+def _truncate(doc: Document, max_chars: int) -> Document:
+  """Cuts the content of a document to a number of characters (0 unlimited)."""
+  if not max_chars or len(doc.page_content) <= max_chars:
+    return doc
+  content = doc.page_content[:max_chars].rstrip() + "..."
+  return doc.model_copy(update={"page_content": content})
+
+
+class TracedRetriever(BaseRetriever):
+  """Retriever of the `k` chunks most similar to a query, tracing the query
+  embedding and the vector search as separate phases.
+
+  With a `score_threshold`, only the chunks at least that relevant are kept
+  (adaptive k, between 0 and `k`), and with `max_chars` each chunk is cut to
+  that length. The prompt tokens this saves compared to the `k` whole chunks
+  are logged and recorded in the `retrieval_tokens_saved` histogram.
+  """
+
+  vectorstore: VectorStore | TenantStores | LiveStore
+  k: int
+  score_threshold: float = 0.0
+  """minimum relevance (0 to 1) of a returned chunk, 0 returns all `k`"""
+  max_chars: int = 0
+  """maximum number of characters of a returned chunk, 0 unlimited"""
+
+  model_config = {"arbitrary_types_allowed": True}
+
+  def _get_relevant_documents(
+    self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+  ) -> list[Document]:
+    """Embeds the query and searches the vector store with it."""
+    with _use(self.vectorstore) as store:
+      embeddings = store.embeddings
+      assert embeddings is not None, "vector store has no embedding model"
+      with tracing.span("embedding"):
+        embedding = embeddings.embed_query(query)
+      with tracing.span("vector_query", backend=type(store).__name__):
+        if not self.score_threshold:
+          found = store.similarity_search_by_vector(embedding, k=self.k)
+          docs = found
+        else:
+          scored = search_with_relevance(store, embedding, self.k)
+          found = [doc for doc, _ in scored]
+          docs = [doc for doc, score in scored if score >= self.score_threshold]
+
+    if not self.score_threshold and not self.max_chars:
+      return docs
+    docs = [_truncate(doc, self.max_chars) for doc in docs]
+    saved = sum(len(doc.page_content) for doc in found) - sum(
+      len(doc.page_content) for doc in docs
+    )
+    tokens_saved = saved // CHARS_PER_TOKEN
+    metrics.histogram("retrieval_docs").observe(len(docs))
+    metrics.histogram("retrieval_tokens_saved").observe(tokens_saved)
+    logger.info(
+      f"retrieved {len(docs)}/{len(found)} chunks for {query!r}, "
+      f"~{tokens_saved} prompt tokens saved"
+    )
+    return docs
+
 
 class VectorStoreTools(BaseModel):
   """Wrapper around the custom-made vector store to provide lookup tools
   for agents to use.
 
-  Assumes that the vectorstore already has data!
+  Assumes that the vectorstore already has data! With `TenantStores`, each
+  search goes to the store of the session's tenant (`tenants.current`), and
+  with `LiveStore` to its current version.
   """
 
-  vectorstore: VectorStore
+  vectorstore: VectorStore | TenantStores | LiveStore
   k: int = 5  # the number of results to return
+  score_threshold: float = 0.0  # see `TracedRetriever`
+  max_chars: int = 0
 
   model_config = {"arbitrary_types_allowed": True}
 
@@ -42,9 +163,44 @@ class VectorStoreTools(BaseModel):
     """
     prompt_template = PromptTemplate.from_template(self.VECTORSTORE_PROMPT_TEMPLATE)
 
-    return retriever.create_retriever_tool(
-      retriever=self.vectorstore.as_retriever(search_kwargs={"k": self.k}),
+    tool = retriever.create_retriever_tool(
+      retriever=TracedRetriever(
+        vectorstore=self.vectorstore,
+        k=self.k,
+        score_threshold=self.score_threshold,
+        max_chars=self.max_chars,
+      ),
       name="recipe_retriever",
       description="Useful for searching for recipes relevant to a user's query.",
       document_prompt=prompt_template,
     )
+
+    # identical concurrent queries (i.e. the app's example prompts) share one
+    # embedding + search
+    search = tool.func
+    assert search is not None
+    store_id = id(self.vectorstore)
+
+    def coalesced_search(query: str, callbacks: Callbacks = None) -> str:
+      # (tools of the same store may filter and cut their results differently)
+      key = (
+        store_id,
+        tenants.current.get(),
+        self.k,
+        self.score_threshold,
+        self.max_chars,
+        normalize_query(query),
+      )
+      # with a score threshold, a query may find nothing relevant
+      return _in_flight.do(key, partial(search, query, callbacks)) or NO_RESULTS
+
+    def speculative_search(query: str, callbacks: Callbacks = None) -> str:
+      prefetched = speculation.claim(query)
+      if prefetched is not None:
+        return prefetched
+      return coalesced_search(query, callbacks)
+
+    tool.func = speculative_search
+
+    # embedding the query + searching blocks, so keep it off the event loop
+    return run_on(retrieval_pool)(tool)
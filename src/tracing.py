@@ -0,0 +1,157 @@
+"""Local, per-turn latency tracing.
+
+Phases of a chat turn (model calls, LLM cache lookups, query embedding,
+vector search, MealDB requests, rendering) are wrapped in spans. With
+`LATENCY_TRACING` enabled, every span is logged as a JSON record tagged with
+the id of its turn, and its duration is recorded in the `span_<name>_s`
+histogram of the in-process metrics. Disabled, `span` hands out one shared
+no-op context manager, so instrumented code pays a flag check per span.
+
+Example::
+
+    with tracing.span("mealdb_http", url=url):
+      response = requests.get(url)
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from contextlib import AbstractContextManager, nullcontext
+from contextvars import ContextVar
+from types import TracebackType
+from typing import Any, Awaitable, Callable, Optional
+
+from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResponse
+from langchain.agents.middleware.types import ToolCallRequest
+from langchain_core.messages import ToolMessage
+from langgraph.types import Command
+
+from src import env, metrics
+
+logger = logging.getLogger(__name__)
+
+_NOOP: AbstractContextManager[None] = nullcontext()
+
+turn_id: ContextVar[Optional[str]] = ContextVar("turn_id", default=None)
+"""Id of the chat turn being traced (inherited by tasks and tool pools)"""
+
+
+class Span(AbstractContextManager[None]):
+  """Times a block, recording it in the metrics and logging it."""
+
+  def __init__(self, name: str, attrs: dict[str, Any]) -> None:
+    """Creates the span.
+
+    Args:
+        name: name of the phase
+        attrs: extra fields of the log record
+    """
+    self.name = name
+    self.attrs = attrs
+    self.start = 0.0
+
+  def __enter__(self) -> None:
+    """Starts timing."""
+    self.start = time.perf_counter()
+
+  def __exit__(
+    self,
+    exc_type: Optional[type[BaseException]],
+    exc: Optional[BaseException],
+    traceback: Optional[TracebackType],
+  ) -> None:
+    """Records the duration."""
+    duration = time.perf_counter() - self.start
+    metrics.histogram(f"span_{self.name}_s").observe(duration)
+    record = {
+      "span": self.name,
+      "turn": turn_id.get(),
+      "ms": round(duration * 1000, 3),
+      **self.attrs,
+    }
+    if exc_type is not None:
+      record["error"] = exc_type.__name__
+    logger.info(json.dumps(record, default=str))
+
+
+def span(name: str, **attrs: Any) -> AbstractContextManager[None]:  # noqa: ANN401
+  """Traces a phase of a turn.
+
+  Args:
+      name: name of the phase
+      **attrs: extra fields of the log record
+
+  Returns:
+      context manager timing the phase (a no-op when tracing is disabled)
+  """
+  if not env.LATENCY_TRACING:
+    return _NOOP
+  return Span(name, attrs)
+
+
+def new_turn() -> str:
+  """Starts a new turn in the current context.
+
+  Returns:
+      the id of the turn
+  """
+  new_id = uuid.uuid4().hex[:12]
+  turn_id.set(new_id)
+  return new_id
+
+
+class TracingMiddleware(AgentMiddleware):
+  """Agent middleware tracing each model call and tool call."""
+
+  async def awrap_model_call(
+    self,
+    request: ModelRequest,
+    handler: Callable[[ModelRequest], Awaitable[ModelResponse]],
+  ) -> ModelResponse:
+    """Traces an (async) model call."""
+    with span("model_call", messages=len(request.messages)):
+      return await handler(request)
+
+  def wrap_model_call(
+    self,
+    request: ModelRequest,
+    handler: Callable[[ModelRequest], ModelResponse],
+  ) -> ModelResponse:
+    """Traces a model call."""
+    with span("model_call", messages=len(request.messages)):
+      return handler(request)
+
+  async def awrap_tool_call(
+    self,
+    request: ToolCallRequest,
+    handler: Callable[[ToolCallRequest], Awaitable[ToolMessage | Command[Any]]],
+  ) -> ToolMessage | Command[Any]:
+    """Traces an (async) tool call."""
+    with span("tool_call", tool=request.tool_call["name"]):
+      return await handler(request)
+
+  def wrap_tool_call(
+    self,
+    request: ToolCallRequest,
+    handler: Callable[[ToolCallRequest], ToolMessage | Command[Any]],
+  ) -> ToolMessage | Command[Any]:
+    """Traces a tool call."""
+    with span("tool_call", tool=request.tool_call["name"]):
+      return handler(request)
+
+
+def start_metrics_dump(interval_s: float) -> None:
+  """Starts a daemon thread logging all metrics as JSON periodically.
+
+  Args:
+      interval_s: time between two dumps
+  """
+
+  def dump() -> None:
+    while True:
+      time.sleep(interval_s)
+      logger.info(json.dumps({"metrics": metrics.snapshot()}))
+
+  threading.Thread(target=dump, name="metrics-dump", daemon=True).start()
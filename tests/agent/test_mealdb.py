@@ -1,4 +1,36 @@
-from src.tools.mealdb_wrapper import FilterOptionTypes, MealDBWrapper
+import json
+
+import pytest
+
+from src import env
+from src.tools.mealdb_wrapper import (
+  FilterOptionTypes,
+  MealDBWrapper,
+  shape_meal_names,
+  shape_meals,
+)
+
+MAX_RESULTS = 2
+ARRABIATA = {
+  "idMeal": "52771",
+  "strMeal": "Spicy Arrabiata Penne",
+  "strDrinkAlternate": None,
+  "strCategory": "Vegetarian",
+  "strArea": "Italian",
+  "strInstructions": "Bring a large pot of water to a boil. ",
+  "strMealThumb": "https://www.themealdb.com/images/media/meals/ustsqw1468250014.jpg",
+  "strTags": "Pasta,Curry",
+  "strYoutube": "https://www.youtube.com/watch?v=1IszT_guI08",
+  "strIngredient1": "penne rigate",
+  "strMeasure1": "1 pound",
+  "strIngredient2": "olive oil",
+  "strMeasure2": "1/4 cup",
+  "strIngredient3": "Parmigiano-Reggiano",
+  "strMeasure3": " ",
+  **{f"strIngredient{i}": "" for i in range(4, 21)},
+  **{f"strMeasure{i}": None for i in range(4, 21)},
+  "strSource": None,
+}
 
 
 def test_search_meal_by_name() -> None:
@@ -57,3 +89,47 @@ def test_list_filter_options() -> None:
 
     # THEN: we get back relevant results
     assert expected[index] in result.lower()
+
+
+def test_shape_meals() -> None:
+  """Make sure full meals are rendered compactly."""
+  # GIVEN: a raw MealDB search response
+  data = {"meals": [ARRABIATA]}
+
+  # WHEN: we shape it
+  shaped = json.loads(shape_meals(data))
+
+  # THEN: only the useful fields and non-empty ingredients are kept
+  assert shaped == {
+    "meals": [
+      {
+        "name": "Spicy Arrabiata Penne",
+        "area": "Italian",
+        "category": "Vegetarian",
+        "ingredients": [
+          "1 pound penne rigate",
+          "1/4 cup olive oil",
+          "Parmigiano-Reggiano",
+        ],
+        "instructions": "Bring a large pot of water to a boil.",
+      }
+    ]
+  }
+
+  # AND: no matches render as an empty list
+  assert json.loads(shape_meals({"meals": None})) == {"meals": []}
+
+
+def test_shaped_results_are_capped(monkeypatch: pytest.MonkeyPatch) -> None:
+  """Make sure shaped responses hold at most `MEALDB_MAX_RESULTS` meals."""
+  # GIVEN: a result cap and a raw MealDB filter response with more meals
+  monkeypatch.setattr(env, "MEALDB_MAX_RESULTS", MAX_RESULTS)
+  data = {
+    "meals": [{"strMeal": f"meal {i}", "idMeal": str(i)} for i in range(5)],
+  }
+
+  # WHEN: we shape it
+  shaped = json.loads(shape_meal_names(data))
+
+  # THEN: the meals are capped, noting how many there were
+  assert shaped == {"meals": ["meal 0", "meal 1"], "total": 5}
@@ -0,0 +1,120 @@
+"""Tests of the MealDB tools answering from the local mirror, built from the
+bundled fixture snapshot (no network).
+"""
+
+import json
+from pathlib import Path
+from typing import Generator
+
+import pytest
+
+from src import env
+from src.tools import mealdb_wrapper
+from src.tools.mealdb_mirror import MealDBMirror, MealDBSnapshot, write_mirror
+from src.tools.mealdb_wrapper import FilterOptionTypes, MealDBWrapper
+
+SNAPSHOT_PATH = env.REPO_ROOT / "tests" / "fixtures" / "mealdb" / "snapshot.json"
+
+
+@pytest.fixture
+def snapshot() -> MealDBSnapshot:
+  """The bundled MealDB fixture snapshot."""
+  data: MealDBSnapshot = json.loads(SNAPSHOT_PATH.read_text())
+  return data
+
+
+@pytest.fixture
+def local_mealdb(
+  tmp_path: Path, snapshot: MealDBSnapshot, monkeypatch: pytest.MonkeyPatch
+) -> Generator[Path, None, None]:
+  """Points the MealDB tools to a mirror of the fixture snapshot.
+
+  Yields:
+      path of the mirror
+  """
+  mirror_path = tmp_path / "mealdb.db"
+  write_mirror(mirror_path, snapshot)
+  monkeypatch.setattr(env, "MEALDB_BACKEND", "local")
+  monkeypatch.setattr(env, "MEALDB_MIRROR_PATH", mirror_path)
+  monkeypatch.setattr(env, "MEALDB_REFRESH_INTERVAL_S", 0)
+  mealdb_wrapper._mirror.cache_clear()
+  yield mirror_path
+  mealdb_wrapper._mirror.cache_clear()
+
+
+@pytest.mark.usefixtures("local_mealdb")
+def test_local_search_meal_by_name() -> None:
+  """Make sure meals are found by (any order, prefix of) words of their name."""
+  # GIVEN: the MealDB tools on the local mirror
+  tool_wrapper = MealDBWrapper()
+
+  # WHEN: we search for meals by name
+  katsu = json.loads(tool_wrapper.search_meal_by_name.run("katsu chicken curry"))
+  salmon = json.loads(tool_wrapper.search_meal_by_name.run("salm fennel"))
+  nothing = json.loads(tool_wrapper.search_meal_by_name.run("beef wellington"))
+
+  # THEN: we get back the matching meals, shaped
+  assert [meal["name"] for meal in katsu["meals"]] == ["Katsu Chicken curry"]
+  assert katsu["meals"][0]["area"] == "Japanese"
+  assert "4 Chicken Breast" in katsu["meals"][0]["ingredients"]
+  assert [meal["name"] for meal in salmon["meals"]] == [
+    "Baked salmon with fennel & tomatoes"
+  ]
+  assert nothing == {"meals": []}
+
+
+@pytest.mark.usefixtures("local_mealdb")
+def test_local_filter_recipes() -> None:
+  """Make sure meals are filtered by ingredient, category and area."""
+  # GIVEN: the MealDB tools on the local mirror
+  tool_wrapper = MealDBWrapper()
+
+  # WHEN: we filter by each of ingredient, category and area
+  query_args = [
+    {"ingredient": "chicken"},
+    {"category": "Seafood"},
+    {"area": "canadian"},
+    {"ingredient": "chicken_breast"},
+  ]
+  expected = [
+    ["Brown Stew Chicken"],
+    ["Baked salmon with fennel & tomatoes"],
+    ["BeaverTails"],
+    ["Katsu Chicken curry"],
+  ]
+  for args, want in zip(query_args, expected, strict=True):
+    result = json.loads(tool_wrapper.filter_recipes.run(args))
+
+    # THEN: we get back the names of the matching meals
+    assert result == {"meals": want}
+
+
+@pytest.mark.usefixtures("local_mealdb")
+def test_local_list_filter_options() -> None:
+  """Make sure the filter options are listed for every type."""
+  # GIVEN: the MealDB tools on the local mirror
+  tool_wrapper = MealDBWrapper()
+
+  # WHEN: we list the options of each filter type
+  expected = ["Chicken", "Seafood", "Canadian"]
+  for filter_type, want in zip(FilterOptionTypes, expected, strict=True):
+    result = json.loads(tool_wrapper.list_filter_options.run(filter_type))
+
+    # THEN: we get back the option names
+    assert want in result["options"]
+
+
+def test_mirror_picks_up_resync(local_mealdb: Path, snapshot: MealDBSnapshot) -> None:
+  """Make sure an open mirror answers from a re-synced database."""
+  # GIVEN: an open mirror
+  mirror = MealDBMirror(local_mealdb)
+  assert mirror.search_meal_by_name("beavertails")["meals"]
+
+  # WHEN: the mirror is re-synced without that meal
+  snapshot["meals"] = [
+    meal for meal in snapshot["meals"] if meal["strMeal"] != "BeaverTails"
+  ]
+  write_mirror(local_mealdb, snapshot)
+
+  # THEN: the next query sees the new data
+  assert mirror.search_meal_by_name("beavertails")["meals"] is None
@@ -0,0 +1,65 @@
+"""Unit tests for coalescing identical concurrent tool calls."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src import metrics
+from src.tools.singleflight import SingleFlight
+from src.tools.vector_store import normalize_query
+
+CALLERS = 8
+
+
+def test_identical_calls_share_one_computation() -> None:
+  """Make sure concurrent calls with the same key compute once."""
+  # GIVEN: a single-flight group and a slow computation
+  group: SingleFlight[str] = SingleFlight("test_share")
+  computed = []
+
+  def compute() -> str:
+    computed.append(threading.current_thread().name)
+    time.sleep(0.2)
+    return "result"
+
+  # WHEN: several callers ask for the same key at once
+  with ThreadPoolExecutor(CALLERS) as pool:
+    results = list(pool.map(lambda _: group.do("key", compute), range(CALLERS)))
+
+  # THEN: they all got the result of a single computation
+  assert results == ["result"] * CALLERS
+  assert len(computed) == 1
+  snapshot = metrics.snapshot()
+  assert snapshot["singleflight_test_share_calls"] == CALLERS
+  assert snapshot["singleflight_test_share_coalesced"] == CALLERS - 1
+
+  # AND: later calls compute again (results are not cached)
+  group.do("key", compute)
+  assert len(computed) == 1 + 1
+
+
+def test_failures_are_shared() -> None:
+  """Make sure waiting callers see the failure of the shared computation."""
+  # GIVEN: a single-flight group and a failing computation
+  group: SingleFlight[str] = SingleFlight("test_fail")
+
+  def compute() -> str:
+    time.sleep(0.2)
+    err_msg = "boom"
+    raise RuntimeError(err_msg)
+
+  # WHEN: several callers ask for the same key at once
+  with ThreadPoolExecutor(CALLERS) as pool:
+    futures = [pool.submit(group.do, "key", compute) for _ in range(CALLERS)]
+
+    # THEN: all of them fail
+    for future in futures:
+      with pytest.raises(RuntimeError, match="boom"):
+        future.result()
+
+
+def test_normalize_query() -> None:
+  """Make sure queries differing in case and whitespace coalesce."""
+  assert normalize_query("  Chocolate chip\nCOOKIES ") == "chocolate chip cookies"
@@ -0,0 +1,97 @@
+"""Unit tests for speculative prefetching of recipe retrieval."""
+
+import time
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from src import env, metrics
+from src.agent import speculation
+
+SEARCH_S = 0.2
+
+
+def _slow_search(query: str) -> str:
+  """Stands in for embedding + vector search."""
+  time.sleep(SEARCH_S)
+  return f"results for {query}"
+
+
+def test_overlap() -> None:
+  """Make sure shortened versions of the prompt count as close, but not
+  queries on part of it.
+  """
+  prompt = "I want to make a chocolate chip cookies."
+  assert speculation.overlap("chocolate chip cookies", prompt) == 1
+  assert speculation.overlap("vegan lasagna", prompt) == 0
+  assert speculation.overlap("", prompt) == 0
+  assert speculation.overlap("chocolate", prompt) < env.SPECULATIVE_RETRIEVAL_OVERLAP
+  assert (
+    speculation.overlap(
+      "chocolate chip cookies", "chocolate chip cookies and a lemon tart"
+    )
+    < env.SPECULATIVE_RETRIEVAL_OVERLAP
+  )
+
+
+def test_prefetched_results_are_used(monkeypatch: pytest.MonkeyPatch) -> None:
+  """Make sure a close query gets the prefetched result and a far one not."""
+  # GIVEN: an agent with speculative retrieval
+  monkeypatch.setattr(env, "SPECULATIVE_RETRIEVAL", True)
+  agent = RunnableLambda(lambda x: x)
+  speculation.register(agent, _slow_search)
+  hits = metrics.counter("speculative_retrieval_hits").value
+
+  # WHEN: a turn starts
+  turn = speculation.speculate(agent, "How do I cook a perfect steak?")
+  assert turn is not None
+
+  # THEN: a different query does not use the prefetched result
+  assert turn.claim("vegan lasagna") is None
+
+  # AND: after the model planned, its shortened prompt gets the result
+  # without waiting for a search
+  time.sleep(SEARCH_S)
+  start = time.perf_counter()
+  assert turn.claim("cook perfect steak") == (
+    "results for How do I cook a perfect steak?"
+  )
+  assert time.perf_counter() - start < SEARCH_S
+  assert metrics.counter("speculative_retrieval_hits").value == hits + 1
+
+  # AND: it is used only once
+  assert turn.claim("perfect steak") is None
+
+
+def test_failed_prefetch_is_a_miss(
+  monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
+) -> None:
+  """Make sure a prefetch which failed is not counted as used."""
+  # GIVEN: an agent whose speculative search fails
+  monkeypatch.setattr(env, "SPECULATIVE_RETRIEVAL", True)
+  agent = RunnableLambda(lambda x: x)
+
+  def fail(query: str) -> str:
+    err_msg = "index unavailable"
+    raise RuntimeError(err_msg)
+
+  speculation.register(agent, fail)
+  turn = speculation.speculate(agent, "How do I cook a perfect steak?")
+  assert turn is not None
+
+  # WHEN: the model calls the retriever with the prompt, and the turn ends
+  with caplog.at_level("INFO", logger=speculation.__name__):
+    assert turn.claim("cook perfect steak") is None
+    turn.finish()
+
+  # THEN: the speculation was a miss
+  assert not turn.hit
+  assert "speculative retrieval miss" in caplog.text
+
+
+def test_disabled_by_default() -> None:
+  """Make sure nothing is prefetched unless enabled."""
+  agent = RunnableLambda(lambda x: x)
+  speculation.register(agent, _slow_search)
+  assert not env.SPECULATIVE_RETRIEVAL
+  assert speculation.speculate(agent, "steak") is None
@@ -1,5 +1,15 @@
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src import env
+from src.paprika import vectorstore
+from src.paprika.chunker import Chunker
+from src.paprika.cleanse_and_enrich import clean_and_enrich_recipes
+from src.paprika.parser import parse
 from src.paprika.vectorstore import VectorStore
-from src.tools.vector_store import VectorStoreTools
+from src.tools.vector_store import NO_RESULTS, VectorStoreTools
+
+EXPORT_PATH = env.REPO_ROOT / "tests" / "fixtures" / "paprika" / "export.paprikarecipes"
+MAX_CHARS = 40
 
 
 def test_vector_store_works(setup_vectorstore: VectorStore) -> None:
@@ -17,3 +27,34 @@ def test_vector_store_works(setup_vectorstore: VectorStore) -> None:
 
   # THEN: we get back relevant results
   assert "cookies" in result.lower()
+
+
+def test_adaptive_retrieval(fake_embeddings: DeterministicFakeEmbedding) -> None:
+  """Make sure a score threshold returns only the relevant chunks (possibly
+  none), cut to the character budget.
+  """
+  # GIVEN: a vectorstore, and a tool with a score threshold and a budget
+  docs = vectorstore.split_chunks(
+    Chunker.make_chunks(clean_and_enrich_recipes(parse(EXPORT_PATH)))
+  )
+  vectorstore.load_documents(docs, "matrix")
+  tools = VectorStoreTools(
+    vectorstore=vectorstore.connect("matrix"),
+    score_threshold=0.9,
+    max_chars=MAX_CHARS,
+  )
+  tool = tools.recipe_retriever
+  longest = max(docs, key=lambda doc: len(doc.page_content))
+
+  # WHEN: we search for the text of a chunk
+  result = tool.run(longest.page_content)
+
+  # THEN: only that chunk is returned, truncated
+  assert result.count("-- RECIPE DOCUMENT --") == 1
+  assert f"Content: {longest.page_content[:MAX_CHARS].rstrip()}...\n" in result
+
+  # WHEN: we search for something unrelated to every chunk
+  result = tool.run("the quick brown fox")
+
+  # THEN: the agent is told nothing is relevant
+  assert result == NO_RESULTS
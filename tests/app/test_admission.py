@@ -0,0 +1,72 @@
+"""Unit tests for the admission queue limiting concurrent chat turns."""
+
+import asyncio
+from unittest.mock import ANY
+
+import pytest
+
+from src import metrics
+from src.app.admission import AdmissionQueue, QueueFullError
+
+
+async def _positions(admission: AdmissionQueue) -> list[int]:
+  """Waits for a slot, collecting the reported positions in line."""
+  return [position async for position in admission.admit()]
+
+
+@pytest.mark.asyncio
+async def test_turns_queue_for_free_slots() -> None:
+  """Make sure turns beyond the limit wait in line and are refused when the
+  line is full.
+  """
+  # GIVEN: a queue with one slot and room for one waiting turn
+  admission = AdmissionQueue(concurrency=1, max_size=1)
+
+  # WHEN: the first turn arrives
+  # THEN: it runs right away
+  assert await _positions(admission) == []
+
+  # WHEN: a second turn arrives
+  waiting = asyncio.create_task(_positions(admission))
+  await asyncio.sleep(0)
+
+  # THEN: it waits in line
+  assert not waiting.done()
+  assert admission.waiting
+  assert metrics.snapshot()["app_queue_depth"]["value"] == 1
+
+  # AND: a third turn is refused
+  with pytest.raises(QueueFullError):
+    await _positions(admission)
+
+  # WHEN: the first turn finishes
+  admission.release()
+
+  # THEN: the waiting turn gets the slot after being told its position
+  assert await asyncio.wait_for(waiting, timeout=1) == [1]
+  assert admission.running == 1
+  assert not admission.waiting
+  assert metrics.snapshot()["app_queue_wait_s"]["count"] > 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_turns_leave_the_line() -> None:
+  """Make sure turns cancelled while waiting do not hold up the line."""
+  # GIVEN: a busy queue with a turn waiting
+  admission = AdmissionQueue(concurrency=1, max_size=2)
+  await _positions(admission)
+  cancelled = asyncio.create_task(_positions(admission))
+  waiting = asyncio.create_task(_positions(admission))
+  await asyncio.sleep(0)
+  assert admission.waiting == [ANY, ANY]
+
+  # WHEN: the first waiting turn is cancelled and the running one finishes
+  cancelled.cancel()
+  await asyncio.sleep(0)
+  admission.release()
+
+  # THEN: the next turn in line moves up and gets the slot
+  first_position, *_ = await asyncio.wait_for(waiting, timeout=1)
+  assert first_position == len([cancelled, waiting])
+  assert admission.running == 1
+  assert not admission.waiting
@@ -6,16 +6,28 @@ Gradio works (and obeys contract). Therefore, we only test the main callback
 `handle_input`.
 """
 
+import asyncio
+import itertools
+from typing import AsyncIterator
+
 import pytest
-from gradio import ChatMessage
+from gradio import ChatMessage, Request
 from langchain.agents import create_agent
 from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
-from langchain_core.messages import AIMessage, ToolCall, ToolMessage
+from langchain_core.messages import (
+  AIMessage,
+  AnyMessage,
+  HumanMessage,
+  ToolCall,
+  ToolMessage,
+)
+from langgraph.checkpoint.memory import InMemorySaver
 
 from src import env
-from src.app import handle_input
+from src.app import handle_input, render_turn
 
 REPO_ROOT = env.REPO_ROOT
+MAX_CHARS = 10
 
 
 @pytest.mark.asyncio
@@ -76,3 +88,79 @@ async def test_happy_path() -> None:
       want_so_far.append(wanted_outputs_i[len(want_so_far)])
 
       assert want_so_far == items
+
+
+@pytest.mark.asyncio
+async def test_sessions_have_separate_histories() -> None:
+  """Make sure concurrent sessions, and the tenants of a session, each
+  continue their own conversation.
+  """
+  # GIVEN: an agent remembering conversations
+  model = GenericFakeChatModel(messages=itertools.repeat("ok"))
+  agent = create_agent(model=model, tools=[], checkpointer=InMemorySaver())
+
+  async def chat(session: str, tenant: str, prompt: str) -> None:
+    query_params = {"tenant": tenant} if tenant else {}
+    request = Request(session_hash=session, query_params=query_params)
+    async for _ in handle_input(agent, prompt, [], request):
+      pass
+
+  # WHEN: sessions chat at the same time, for two turns, one of them with
+  # two cookbooks
+  for turn in range(2):
+    await asyncio.gather(
+      chat("a", "", f"a{turn}"),
+      chat("b", "", f"b{turn}"),
+      chat("b", "alice", f"alice{turn}"),
+    )
+
+  # THEN: each conversation only holds its own prompts
+  for thread_id, prompt in [("/a", "a"), ("/b", "b"), ("alice/b", "alice")]:
+    state = await agent.aget_state({"configurable": {"thread_id": thread_id}})
+    prompts = [
+      message.content
+      for message in state.values["messages"]
+      if isinstance(message, HumanMessage)
+    ]
+    assert prompts == [f"{prompt}0", f"{prompt}1"]
+
+
+async def _messages(*messages: AnyMessage) -> AsyncIterator[AnyMessage]:
+  """Streams canned agent messages."""
+  for message in messages:
+    yield message
+
+
+@pytest.mark.asyncio
+async def test_batched_rendering(monkeypatch: pytest.MonkeyPatch) -> None:
+  """Make sure the batched mode makes one update per agent message, and that
+  large tool outputs are cut and collapsed.
+  """
+  # GIVEN: a tool output limit
+  monkeypatch.setattr(env, "APP_TOOL_OUTPUT_MAX_CHARS", MAX_CHARS)
+
+  # AND: a turn calling two tools, one with a large output
+  calls = [
+    ToolCall(name="fake_tool1", args={}, id="some-id"),
+    ToolCall(name="fake_tool2", args={}, id="some-other-id"),
+  ]
+  large = "x" * (MAX_CHARS + 5)
+  chunks = _messages(
+    AIMessage(content="", tool_calls=calls),
+    ToolMessage(content="small", name="fake_tool1", tool_call_id="some-id"),
+    ToolMessage(content=large, name="fake_tool2", tool_call_id="some-other-id"),
+    AIMessage(content="bar"),
+  )
+
+  # WHEN: the turn is rendered in batched mode
+  updates = [list(update) async for update in render_turn(chunks, "batched")]
+
+  # THEN: both tool calls were sent in one update, then one per message
+  assert [len(update) for update in updates] == [2, 3, 4, 5]
+
+  # AND: the small output is shown as is, the large one cut and collapsed
+  small_output, large_output = updates[-1][2:4]
+  assert small_output.content == "small"
+  assert "status" not in small_output.metadata
+  assert large_output.content == f"{'x' * MAX_CHARS}\n\n... (5 more characters)"
+  assert large_output.metadata["status"] == "done"
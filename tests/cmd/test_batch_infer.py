@@ -0,0 +1,133 @@
+"""Unit tests for the batch inference command.
+
+The agent is the real one without tools, around a fake model answering
+each prompt, so every prompt runs through `do_inference`.
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Optional, Sequence
+
+import pytest
+from langchain.agents import create_agent
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel, LanguageModelInput
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import Runnable
+from langgraph.checkpoint.memory import InMemorySaver
+
+from src.cmd.batch_infer import read_prompts, run_batch
+
+PROMPTS = ["pancakes", "please fail", "lasagna", "curry"]
+CONCURRENCY = 2
+
+
+class _EchoModel(BaseChatModel):
+  """Answers with the last prompt, and fails on prompts asking to."""
+
+  fail: bool = True
+
+  @property
+  def _llm_type(self) -> str:
+    """Type of the model (for LangChain)."""
+    return "echo"
+
+  def bind_tools(
+    self,
+    tools: Sequence[Any],
+    **kwargs: Any,  # noqa: ANN401
+  ) -> Runnable[LanguageModelInput, AIMessage]:
+    """Accepts (and ignores) the tools."""
+    return self
+
+  def _generate(
+    self,
+    messages: list[BaseMessage],
+    stop: Optional[list[str]] = None,
+    run_manager: Optional[CallbackManagerForLLMRun] = None,
+    **kwargs: Any,  # noqa: ANN401
+  ) -> ChatResult:
+    """Echoes the conversation's prompts."""
+    prompts = [str(message.content) for message in messages]
+    if self.fail and "fail" in prompts[-1]:
+      err_msg = "model crashed"
+      raise ValueError(err_msg)
+    answer = AIMessage(content=f"answer to {' + '.join(prompts)}")
+    return ChatResult(generations=[ChatGeneration(message=answer)])
+
+
+def _results(output: Path) -> dict[str, dict[str, Any]]:
+  """The results written so far, by prompt id."""
+  results = [json.loads(line) for line in output.read_text().splitlines()]
+  by_id = {result["id"]: result for result in results}
+  assert len(by_id) == len(results), "a prompt has several results"
+  return by_id
+
+
+@pytest.mark.asyncio
+async def test_batch_is_checkpointed_and_resumed(tmp_path: Path) -> None:
+  """Make sure every prompt is answered once, as its own conversation, across
+  an interrupted run and its resumption.
+  """
+  # GIVEN: a batch of prompts
+  prompts = tmp_path / "prompts.jsonl"
+  prompts.write_text(
+    "\n".join(json.dumps({"id": f"p{i}", "prompt": p}) for i, p in enumerate(PROMPTS))
+  )
+  model = _EchoModel()
+  agent = create_agent(model=model, tools=[], checkpointer=InMemorySaver())
+
+  # AND: the output of a run killed after answering the first prompt, while
+  # writing the next result
+  output = tmp_path / "answers.jsonl"
+  first = {"id": "p0", "prompt": PROMPTS[0], "answer": "earlier", "error": None}
+  output.write_text(json.dumps(first) + '\n{"id": "p1", "ans')
+
+  # WHEN: the batch runs
+  summary = await run_batch(
+    agent, read_prompts(prompts), output, concurrency=CONCURRENCY
+  )
+
+  # THEN: the answered prompt was skipped, the others ran on their own
+  results = _results(output)
+  assert results["p0"]["answer"] == "earlier"
+  assert results["p2"]["answer"] == "answer to lasagna"
+  assert results["p3"]["answer"] == "answer to curry"
+  assert results["p2"]["latency_s"] > 0
+
+  # AND: the failed prompt was recorded
+  assert "model crashed" in results["p1"]["error"]
+  assert summary["skipped"] == 1
+  assert summary["answered"] == len(PROMPTS) - 2
+  assert summary["errors"] == 1
+  assert summary["prompts_per_s"] > 0
+  assert 0 < summary["latency_p50_s"] <= summary["latency_p99_s"]
+
+  # WHEN: the batch is resumed once the model recovered
+  model.fail = False
+  summary = await run_batch(
+    agent, read_prompts(prompts), output, concurrency=CONCURRENCY
+  )
+
+  # THEN: only the failed prompt ran again
+  assert summary["skipped"] == len(PROMPTS) - 1
+  assert summary["answered"] == 1
+  assert _results(output)["p1"]["answer"] == "answer to please fail"
+
+  # AND: no conversation was kept
+  assert not agent.checkpointer.storage  # type: ignore[union-attr]
+
+
+def test_duplicate_ids_are_refused(tmp_path: Path) -> None:
+  """Make sure two prompts cannot share an id, to which results are matched."""
+  # GIVEN: prompts reusing an id
+  prompts = tmp_path / "prompts.jsonl"
+  prompts.write_text(
+    "\n".join(json.dumps({"id": "p", "prompt": prompt}) for prompt in PROMPTS)
+  )
+
+  # WHEN: they are read
+  # THEN: the second one with that id is refused
+  with pytest.raises(ValueError, match="prompts.jsonl:2: duplicate prompt id"):
+    list(read_prompts(prompts))
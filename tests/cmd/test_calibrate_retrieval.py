@@ -0,0 +1,82 @@
+"""Unit tests for the calibration of the retrieval threshold.
+
+Uses a deterministic fake embedding model, under which a query embeds exactly
+like the chunk with the same text and unrelated to all others.
+"""
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src import env
+from src.cmd.calibrate_retrieval import (
+  LabelledQuery,
+  ScoredChunk,
+  recommend,
+  score_queries,
+  sweep,
+)
+from src.paprika import vectorstore
+from src.paprika.chunker import Chunker
+from src.paprika.cleanse_and_enrich import clean_and_enrich_recipes
+from src.paprika.parser import parse
+from src.tools.vector_store import CHARS_PER_TOKEN
+
+EXPORT_PATH = env.REPO_ROOT / "tests" / "fixtures" / "paprika" / "export.paprikarecipes"
+K = 5
+MIN_RELEVANCE = 0.99
+CHARS = 400
+THRESHOLDS = [0.0, 0.3, 0.6, 0.9]
+
+
+def test_queries_are_scored(fake_embeddings: DeterministicFakeEmbedding) -> None:
+  """Make sure each query finds its chunk first, labelled relevant."""
+  # GIVEN: a vector store, and queries labelled with the recipe they match
+  docs = vectorstore.split_chunks(
+    Chunker.make_chunks(clean_and_enrich_recipes(parse(EXPORT_PATH)))
+  )
+  vectorstore.load_documents(docs, "matrix")
+  queries = [
+    LabelledQuery(doc.page_content, {doc.metadata["name"]}) for doc in docs[:3]
+  ]
+
+  # WHEN: the queries are scored
+  results = score_queries(vectorstore.connect("matrix"), queries, K)
+
+  # THEN: every query got k chunks, its own first and fully relevant
+  assert all(len(found) == K for found in results)
+  assert all(found[0].relevant for found in results)
+  assert all(found[0].relevance > MIN_RELEVANCE for found in results)
+
+
+def test_recommended_threshold_keeps_relevant_chunks() -> None:
+  """Make sure the highest threshold keeping the relevant chunks is picked."""
+  # GIVEN: two queries, whose relevant chunks score above 0.6
+  results = [
+    [
+      ScoredChunk(0.9, relevant=True, chars=CHARS),
+      ScoredChunk(0.7, relevant=True, chars=CHARS),
+      ScoredChunk(0.4, relevant=False, chars=CHARS),
+    ],
+    [
+      ScoredChunk(0.5, relevant=False, chars=CHARS),
+      ScoredChunk(0.2, relevant=False, chars=CHARS),
+      ScoredChunk(0.1, relevant=False, chars=CHARS),
+    ],
+  ]
+
+  # WHEN: the thresholds are swept
+  rows = sweep(results, THRESHOLDS)
+  best = recommend(rows, target_recall=1.0)
+
+  # THEN: 0.6 is recommended, which drops every irrelevant chunk
+  assert best == {
+    "threshold": THRESHOLDS[2],
+    "docs_per_query": 1.0,
+    "recall": 1.0,
+    "precision": 1.0,
+    "empty_share": 0.5,
+    "tokens_saved_per_query": 4 * CHARS / CHARS_PER_TOKEN / len(results),
+  }
+
+  # AND: without a threshold every chunk is returned
+  assert rows[0]["docs_per_query"] == len(results[0])
+  assert rows[0]["tokens_saved_per_query"] == 0
@@ -0,0 +1,77 @@
+"""Unit tests for the offline load generator.
+
+The vector store is a small matrix store with fake embeddings, so no
+embedding model is downloaded; everything else is what the command runs.
+"""
+
+import json
+from pathlib import Path
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+from src import env
+from src.agent import agent as agent_module
+from src.cmd.load_sim import (
+  DEFAULT_PROMPTS,
+  DEFAULT_SNAPSHOT,
+  SimulatedChatModel,
+  mealdb_stub,
+  run_sim,
+)
+from src.paprika.matrix_store import MatrixVectorStore
+from src.tools.mealdb_mirror import MealDBMirror, write_mirror
+
+SESSIONS = 6
+TURNS = 2
+
+
+@pytest.mark.asyncio
+async def test_simulated_sessions_are_summarized(
+  tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+  """Make sure simulated sessions run through the app and get summarized."""
+  # GIVEN: a small cookbook, and MealDB served by the stub
+  store = MatrixVectorStore(DeterministicFakeEmbedding(size=16), tmp_path / "store")
+  store.add_texts(
+    ["chicken, curry paste", "pasta, tomato"],
+    metadatas=[
+      {"name": "Chicken curry", "section": "ingredients"},
+      {"name": "Penne", "section": "ingredients"},
+    ],
+  )
+  monkeypatch.setattr(agent_module, "connect", lambda: store)
+  write_mirror(tmp_path / "mealdb.db", json.loads(DEFAULT_SNAPSHOT.read_text()))
+  monkeypatch.setattr(env, "API_CACHE_DB_PATH", tmp_path / "api_cache.db")
+  monkeypatch.setattr(env, "MEALDB_BACKEND", "api")
+
+  with mealdb_stub(MealDBMirror(tmp_path / "mealdb.db"), latency_s=0.01) as url:
+    monkeypatch.setattr(env, "MEALDB_BASE_URL", url)
+    # AND: an agent with a fast simulated model
+    agent = agent_module.setup_agent(SimulatedChatModel(latency_s=0.01))
+
+    # WHEN: concurrent sessions run
+    summary = await run_sim(
+      agent, SESSIONS, concurrency=3, turns=TURNS, prompts=DEFAULT_PROMPTS
+    )
+
+  # THEN: every turn completed and was measured
+  assert summary["errors"] == 0
+  assert summary["turns"] == SESSIONS * TURNS
+  assert summary["turns_per_s"] > 0
+  assert 0 < summary["turn_p50_s"] <= summary["turn_p95_s"] <= summary["turn_p99_s"]
+  assert summary["rss_end_mb"] > 0
+
+  # AND: each session continued its own conversation
+  checkpointer: InMemorySaver = agent.checkpointer  # type: ignore[attr-defined]
+  threads = {
+    saved.config["configurable"]["thread_id"] for saved in checkpointer.list(None)
+  }
+  assert len(threads) == SESSIONS
+  for thread_id in threads:
+    latest = checkpointer.get_tuple({"configurable": {"thread_id": thread_id}})
+    assert latest is not None
+    messages = latest.checkpoint["channel_values"]["messages"]
+    assert sum(isinstance(message, HumanMessage) for message in messages) == TURNS
@@ -6,13 +6,15 @@ stays consistent across changes, not necessarily
 that the repackaging logic is perfect.
 """
 
+import io
+import json
 import sys
 from pathlib import Path
 from shutil import copyfile
 
 import pytest
 
-from src.cmd.paprika_repackage import main
+from src.cmd.paprika_repackage import iter_json_array, main
 from src.env import REPO_ROOT
 from src.paprika.parser import parse
 
@@ -41,6 +43,61 @@ def test_happy_path(tmp_path: Path) -> None:
   assert parse(temp_output) == parse(wanted_output)
 
 
+def test_streaming(tmp_path: Path) -> None:
+  """Make sure streaming through the process pool makes the same export."""
+  # GIVEN: input and expected output files
+  wanted_input = REPO_ROOT / "tests" / "fixtures" / "paprika" / "export.json"
+  wanted_output = REPO_ROOT / "tests" / "fixtures" / "paprika" / "export.paprikarecipes"
+  temp_output = tmp_path / "export.paprikarecipes"
+
+  # WHEN: we run the command in streaming mode, one recipe per task
+  main(
+    [
+      str(wanted_input),
+      str(temp_output),
+      "--stream",
+      "--workers",
+      "2",
+      "--batch-size",
+      "1",
+    ]
+  )
+
+  # THEN: the output file is as expected, with the recipes in order
+  assert parse(temp_output) == parse(wanted_output)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 16])
+def test_iter_json_array(chunk_size: int) -> None:
+  """Make sure the array items are decoded whatever the read boundaries.
+
+  Args:
+      chunk_size: number of characters read at a time
+  """
+  # GIVEN: an array whose items span several reads
+  items = [{"uid": "a", "notes": "x" * 50}, 12345, [], "]", {"nested": [1, {}]}]
+  text = f" [ {json.dumps(items[0])},{json.dumps(items[1])} ,\n"
+  text += ", ".join(json.dumps(item) for item in items[2:]) + " ]\n"
+
+  # WHEN: it is decoded incrementally
+  decoded = list(iter_json_array(io.StringIO(text), chunk_size))
+
+  # THEN: every item is decoded
+  assert decoded == items
+  assert list(iter_json_array(io.StringIO("[]"), chunk_size)) == []
+
+
+@pytest.mark.parametrize("text", ["{}", "[1 2]", "[1,"])
+def test_iter_json_array_malformed(text: str) -> None:
+  """Make sure malformed arrays raise instead of being silently truncated.
+
+  Args:
+      text: the malformed JSON
+  """
+  with pytest.raises(ValueError):  # noqa: PT011
+    list(iter_json_array(io.StringIO(text), 1))
+
+
 @pytest.mark.parametrize(
   "argv",
   [
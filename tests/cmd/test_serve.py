@@ -0,0 +1,89 @@
+"""Unit tests for the session-sticky load balancer of the serve command.
+
+The workers are replaced by an in-memory transport which answers with the
+worker that received the request, so no app processes are started.
+"""
+
+from typing import AsyncIterator
+
+import httpx
+from starlette.testclient import TestClient
+
+from src.cmd.serve import STICKY_COOKIE, Balancer
+
+
+class _Body(httpx.AsyncByteStream):
+  """Unread response body, like the ones of real network responses."""
+
+  def __init__(self, content: bytes) -> None:
+    self.content = content
+
+  async def __aiter__(self) -> AsyncIterator[bytes]:
+    yield self.content
+
+
+class _FakeWorkers(httpx.AsyncBaseTransport):
+  """Answers with the port of the worker which got the request."""
+
+  async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+    await request.aread()
+    return httpx.Response(200, stream=_Body(str(request.url.port).encode()))
+
+
+def test_sessions_are_sticky() -> None:
+  """Make sure a session keeps talking to the worker it was first sent to."""
+  # GIVEN: a balancer in front of two workers
+  balancer = Balancer(
+    ["http://127.0.0.1:9001", "http://127.0.0.1:9002"],
+    transport=_FakeWorkers(),
+  )
+
+  with TestClient(balancer.app()) as session_a, TestClient(balancer.app()) as session_b:
+    # AND: worker 1 is busier than worker 2
+    balancer.in_flight[0] = 5
+
+    # WHEN: two new sessions make a request each
+    first_a = session_a.get("/gradio_api/info")
+    balancer.in_flight[0] = 0
+    balancer.in_flight[1] = 5
+    first_b = session_b.get("/gradio_api/info")
+
+    # THEN: new sessions go to the least loaded worker and get pinned to it
+    assert first_a.text == "9002"
+    assert first_a.cookies[STICKY_COOKIE] == "1"
+    assert first_b.text == "9001"
+    assert first_b.cookies[STICKY_COOKIE] == "0"
+
+    # AND: later requests of each session stay on its worker regardless of load
+    for _ in range(3):
+      assert session_a.post("/gradio_api/queue/join", json={}).text == "9002"
+      assert session_b.get("/").text == "9001"
+
+
+class _EchoHeaders(httpx.AsyncBaseTransport):
+  """Answers with the forwarded host and scheme the worker got."""
+
+  async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+    await request.aread()
+    forwarded = (
+      f"{request.headers['x-forwarded-proto']}://{request.headers['x-forwarded-host']}"
+    )
+    return httpx.Response(200, stream=_Body(forwarded.encode()))
+
+
+def test_client_host_is_forwarded() -> None:
+  """Make sure workers learn the host and scheme the client talks to."""
+  # GIVEN: a balancer in front of a worker
+  balancer = Balancer(["http://127.0.0.1:9001"], transport=_EchoHeaders())
+
+  with TestClient(balancer.app(), base_url="https://cheffy.example") as client:
+    # WHEN: a client makes a request, directly or through another proxy
+    direct = client.get("/")
+    proxied = client.get(
+      "/",
+      headers={"X-Forwarded-Host": "public.example", "X-Forwarded-Proto": "http"},
+    )
+
+  # THEN: the worker sees the host and scheme of the client, not its own
+  assert direct.text == "https://cheffy.example"
+  assert proxied.text == "http://public.example"
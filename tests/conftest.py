@@ -1,3 +1,4 @@
 pytest_plugins = [
   "fixtures.paprika_etl",
+  "fixtures.vectorstore",
 ]
@@ -27,6 +27,7 @@ def setup_vectorstore(
   """
   # GIVEN: vectorstore location and paprika export
   vectorstore.CHROMA_ROOT = tmp_path_factory.mktemp("chroma")
+  vectorstore.SNAPSHOT_PATH = tmp_path_factory.mktemp("snapshot") / "recipes.snapshot"
   env.PAPRIKA_EXPORT_PATH = tmp_path_factory.mktemp("export") / "export.paprikarecipes"
   shutil.copyfile(
     REPO_ROOT / "tests" / "fixtures" / "paprika" / "export.paprikarecipes",
@@ -39,6 +40,12 @@ def setup_vectorstore(
   # THEN: we can connect to the vectorstore
   yield vectorstore.connect()
 
-  # FINALLY: cleanup
-  if vectorstore.CHROMA_ROOT.exists():
-    shutil.rmtree(vectorstore.CHROMA_ROOT)
+  # FINALLY: cleanup (the vectorstore is a link to its live version, next to
+  # the directory of its versions and the marker of an unfinished build)
+  root = vectorstore.CHROMA_ROOT
+  if root.is_symlink():
+    root.unlink()
+  elif root.exists():
+    shutil.rmtree(root)
+  shutil.rmtree(vectorstore._versions_dir(root), ignore_errors=True)
+  vectorstore._build_marker("chroma", None).unlink(missing_ok=True)
@@ -0,0 +1,27 @@
+from pathlib import Path
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src.paprika import vectorstore
+
+
+@pytest.fixture
+def fake_embeddings(
+  tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> DeterministicFakeEmbedding:
+  """Points the matrix backend at a temporary directory, with a deterministic
+  fake embedding model (so that tests exercise the vector store rather than
+  the slow to load sentence transformer).
+
+  Args:
+      tmp_path: pytest tmp path fixture
+      monkeypatch: pytest monkeypatch fixture
+
+  Returns:
+      the fake embedding model used by the vector store
+  """
+  embeddings = DeterministicFakeEmbedding(size=64)
+  monkeypatch.setattr(vectorstore, "MATRIX_ROOT", tmp_path / "matrix")
+  monkeypatch.setattr(vectorstore, "_embeddings", lambda: embeddings)
+  return embeddings
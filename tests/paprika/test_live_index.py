@@ -0,0 +1,85 @@
+"""Unit tests for the hot reload of the served vector store."""
+
+import os
+import shutil
+from pathlib import Path
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src import env, metrics
+from src.paprika import vectorstore
+from src.paprika.chunker import Chunker
+from src.paprika.cleanse_and_enrich import clean_and_enrich_recipes
+from src.paprika.live_index import IndexWatcher, LiveStore
+from src.paprika.parser import parse
+
+EXPORT_PATH = env.REPO_ROOT / "tests" / "fixtures" / "paprika" / "export.paprikarecipes"
+
+
+def _ids(live: LiveStore) -> list[str]:
+  """Ids of the documents in the current version of the store."""
+  with live.use() as store:
+    return list(store.get(include=[])["ids"])
+
+
+def test_new_version_is_swapped_in_between_searches(
+  fake_embeddings: DeterministicFakeEmbedding, tmp_path: Path
+) -> None:
+  """Make sure a rebuilt store is swapped in, while searches in flight finish on
+  the version they started with.
+  """
+  # GIVEN: a served store, and a search in flight
+  docs = vectorstore.split_chunks(
+    Chunker.make_chunks(clean_and_enrich_recipes(parse(EXPORT_PATH)))
+  )
+  vectorstore.load_documents(docs[:1], "matrix")
+  live = LiveStore(backend="matrix")
+  watcher = IndexWatcher(live, rebuild=False, export_path=tmp_path / "missing")
+  assert not watcher.check()
+
+  with live.use() as in_flight:
+    # WHEN: the store is rebuilt and the watcher checks for it
+    vectorstore.load_documents(docs, "matrix")
+    assert watcher.check()
+
+    # THEN: the search in flight still uses the old version
+    assert in_flight.get(include=[])["ids"] == [docs[0].id]
+
+    # AND: new searches use the new version
+    assert _ids(live) == [doc.id for doc in docs]
+
+  # AND: the new version is only swapped in once
+  assert not watcher.check()
+
+
+def test_export_change_rebuilds(
+  fake_embeddings: DeterministicFakeEmbedding, tmp_path: Path
+) -> None:
+  """Make sure a changed export is rebuilt, then swapped in."""
+  # GIVEN: a served store built from an older export
+  export = tmp_path / "export.paprikarecipes"
+  shutil.copyfile(EXPORT_PATH, export)
+  docs = vectorstore.split_chunks(
+    Chunker.make_chunks(clean_and_enrich_recipes(parse(export)))
+  )
+  vectorstore.load_documents(docs[:1], "matrix")
+  live = LiveStore(backend="matrix")
+  watcher = IndexWatcher(live, rebuild=True, export_path=export)
+
+  # AND: another app process serving it
+  other_live = LiveStore(backend="matrix")
+  other_watcher = IndexWatcher(other_live, rebuild=True, export_path=export)
+
+  # WHEN: the export changes
+  stat = export.stat()
+  os.utime(export, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+  rebuilds = metrics.counter("index_rebuilds").value
+  assert watcher.check()
+
+  # THEN: the store was rebuilt from it and swapped in
+  assert _ids(live) == [doc.id for doc in docs]
+
+  # AND: the other process swaps in that version, without rebuilding again
+  assert other_watcher.check()
+  assert _ids(other_live) == [doc.id for doc in docs]
+  assert metrics.counter("index_rebuilds").value == rebuilds + 1
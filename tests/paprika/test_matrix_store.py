@@ -0,0 +1,100 @@
+"""Unit tests for the memory-mapped matrix vector store backend."""
+
+from pathlib import Path
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src.paprika.matrix_store import MatrixDType, MatrixIndex, MatrixVectorStore
+
+TEXTS = [f"recipe number {i}" for i in range(200)]
+
+
+@pytest.mark.parametrize(
+  "dtype, index",
+  [("float16", "flat"), ("int8", "flat"), ("float16", "ivf"), ("int8", "ivf")],
+)
+def test_search_after_persist(
+  tmp_path: Path, dtype: MatrixDType, index: MatrixIndex
+) -> None:
+  """Make sure an exact text is its own nearest neighbour in every mode."""
+  # GIVEN: a populated and persisted store
+  embeddings = DeterministicFakeEmbedding(size=64)
+  MatrixVectorStore.from_texts(
+    TEXTS,
+    embeddings,
+    persist_directory=tmp_path / "matrix",
+    dtype=dtype,
+    index=index,
+    nprobe=4,
+  )
+
+  # WHEN: we re-open the store and search for stored texts
+  store = MatrixVectorStore(
+    embedding_function=embeddings,
+    persist_directory=tmp_path / "matrix",
+    index=index,
+    nprobe=4,
+  )
+
+  # THEN: the stored text comes back first with (almost) zero distance
+  assert len(store) == len(TEXTS)
+  for text in TEXTS[:20]:
+    doc, distance = store.similarity_search_with_score(text, k=3)[0]
+    assert doc.page_content == text
+    assert distance == pytest.approx(0.0, abs=0.02)
+
+
+def test_upsert_and_delete(tmp_path: Path) -> None:
+  """Make sure writes with existing ids replace rather than duplicate."""
+  # GIVEN: a store with a couple of documents
+  store = MatrixVectorStore(
+    embedding_function=DeterministicFakeEmbedding(size=16),
+    persist_directory=tmp_path / "matrix",
+  )
+  store.add_texts(["a", "b"], metadatas=[{"n": 1}, {"n": 2}], ids=["1", "2"])
+
+  # WHEN: we upsert one id, delete another and persist
+  store.add_texts(["c"], metadatas=[{"n": 3}], ids=["1"])
+  store.delete(["2"])
+  store.persist()
+
+  # THEN: only the upserted document is left
+  got = store.get()
+  assert got["ids"] == ["1"]
+  assert got["documents"] == ["c"]
+  assert got["metadatas"] == [{"n": 3}]
+
+
+def test_buffered_adds_and_recovery(tmp_path: Path) -> None:
+  """Make sure rows added over many calls, and upserted among them, are all
+  persisted, and a store whose swap was interrupted is restored.
+  """
+  # GIVEN: a store written in many small batches, upserting as it goes
+  embeddings = DeterministicFakeEmbedding(size=16)
+  store = MatrixVectorStore(
+    embedding_function=embeddings, persist_directory=tmp_path / "matrix"
+  )
+  for start in range(0, len(TEXTS), 10):
+    store.add_texts(
+      TEXTS[start : start + 10], ids=[str(i) for i in range(start, start + 10)]
+    )
+    store.add_texts(["upserted"], ids=[str(start)])
+  store.persist()
+
+  # WHEN: a later persist is interrupted between setting the old directory
+  # aside and moving the new one in
+  old = tmp_path / ".matrix.interrupted.old"
+  (tmp_path / "matrix").rename(old)
+
+  # THEN: re-opening the store restores it, with every row
+  store = MatrixVectorStore(
+    embedding_function=embeddings, persist_directory=tmp_path / "matrix"
+  )
+  assert not old.exists()
+  assert len(store) == len(TEXTS)
+  got = store.get(ids=["10", "11"])
+  assert got["documents"] == ["upserted", TEXTS[11]]
+  doc, distance = store.similarity_search_with_score(TEXTS[11], k=1)[0]
+  assert doc.page_content == TEXTS[11]
+  assert distance == pytest.approx(0.0, abs=0.02)
@@ -0,0 +1,55 @@
+"""Unit tests for the JSON Lines dump of the parsed recipes."""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from src import env
+from src.paprika.parsed_dump import QUEUE_SIZE, ParsedDumpWriter
+from src.paprika.parser import parse
+
+EXPORT_PATH = env.REPO_ROOT / "tests" / "fixtures" / "paprika" / "export.paprikarecipes"
+
+
+def test_dump_streams_recipes_without_photos(tmp_path: Path) -> None:
+  """Make sure every recipe is dumped on its own line, without photo data."""
+  # GIVEN: parsed recipes with photos
+  recipes = parse(EXPORT_PATH)
+  assert all(recipe.photo_data for recipe in recipes)
+
+  # WHEN: they are dumped
+  with ParsedDumpWriter(tmp_path / "parsed.jsonl") as dump:
+    for recipe in recipes:
+      dump.write(recipe)
+
+  # THEN: there is one line per recipe, in order
+  lines = (tmp_path / "parsed.jsonl").read_text().splitlines()
+  dumped = [json.loads(line) for line in lines]
+  assert [recipe["uid"] for recipe in dumped] == [recipe.uid for recipe in recipes]
+
+  # AND: the photos were left out, but not their hashes
+  assert all("photo_data" not in recipe for recipe in dumped)
+  assert [recipe["photo_hash"] for recipe in dumped] == [
+    recipe.photo_hash for recipe in recipes
+  ]
+
+
+def test_failed_dump_stops_writes(tmp_path: Path) -> None:
+  """Make sure a dump which cannot be written fails the writes, rather than
+  queueing every recipe until the end.
+  """
+  # GIVEN: a dump to a directory which does not exist
+  recipes = parse(EXPORT_PATH)
+  written = 0
+
+  # WHEN: many more recipes than fit in the queue are dumped
+  # THEN: writing fails before all of them were queued
+  with (
+    pytest.raises(RuntimeError, match="failed to write"),
+    ParsedDumpWriter(tmp_path / "missing" / "parsed.jsonl") as dump,
+  ):
+    for recipe in recipes * QUEUE_SIZE:
+      dump.write(recipe)
+      written += 1
+  assert written < len(recipes) * QUEUE_SIZE
@@ -0,0 +1,111 @@
+"""Unit tests for the content-addressed photo store."""
+
+import base64
+import gzip
+import json
+import zipfile
+from pathlib import Path
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src import env
+from src.paprika import pipeline, vectorstore
+from src.paprika.parser import parse
+from src.paprika.photos import PhotoStore
+
+EXPORT_PATH = env.REPO_ROOT / "tests" / "fixtures" / "paprika" / "export.paprikarecipes"
+
+
+def _without_first_photo(path: Path) -> Path:
+  """Copy of the fixture export whose first recipe has no photo."""
+  with (
+    zipfile.ZipFile(EXPORT_PATH) as archive,
+    zipfile.ZipFile(path, "w") as copy,
+  ):
+    for i, name in enumerate(archive.namelist()):
+      recipe = json.loads(gzip.decompress(archive.read(name)))
+      if i == 0:
+        recipe.update(photo=None, photo_data=None, photo_hash=None, photos=[])
+      copy.writestr(name, gzip.compress(json.dumps(recipe).encode()))
+  return path
+
+
+def test_photos_are_moved_out_and_deduplicated(tmp_path: Path) -> None:
+  """Make sure the recipes only keep the hash of their photo, which is stored
+  once whatever the number of recipes it belongs to.
+  """
+  # GIVEN: parsed recipes with photos, and a photo store
+  recipes = parse(EXPORT_PATH)
+  assert all(recipe.photo_data for recipe in recipes)
+  photos = PhotoStore(tmp_path / "photos")
+
+  # WHEN: the photos are extracted
+  extracted = [photos.extract(recipe) for recipe in recipes]
+
+  # THEN: the recipes no longer carry them, only their hash
+  assert all(recipe.photo_data is None for recipe in extracted)
+  assert [recipe.photo_hash for recipe in extracted] == [
+    str(recipe.photo_hash).lower() for recipe in recipes
+  ]
+
+  # AND: each photo is stored under its hash
+  for recipe, original in zip(extracted, recipes, strict=True):
+    path = photos.locate(str(recipe.photo_hash))
+    assert path is not None
+    assert path.suffix == ".jpg"
+    assert path.read_bytes() == base64.b64decode(str(original.photo_data))
+  assert photos.written == len(recipes)
+
+  # WHEN: the same photos are extracted again (i.e. from another export)
+  for recipe in recipes:
+    photos.extract(recipe)
+
+  # THEN: they are not written twice
+  assert photos.written == len(recipes)
+  assert photos.deduplicated == len(recipes)
+  assert photos.locate("0" * 64) is None
+
+
+def test_pipeline_carries_photo_hashes(
+  fake_embeddings: DeterministicFakeEmbedding, tmp_path: Path
+) -> None:
+  """Make sure the pipeline stores the photos, and the documents refer to them."""
+  # GIVEN: a photo store
+  photos = PhotoStore(tmp_path / "photos")
+
+  # WHEN: the export is streamed through the pipeline
+  stats = pipeline.run_pipeline(EXPORT_PATH, "matrix", photos=photos)
+
+  # THEN: its photos were stored by a stage of their own
+  assert stats.photos == len(parse(EXPORT_PATH))
+  assert "photos" in stats.busy_s
+
+  # AND: every document refers to the photo of its recipe
+  written = vectorstore.connect("matrix").get(include=["metadatas"])
+  assert all(
+    photos.locate(metadata["photo_hash"]) is not None
+    for metadata in written["metadatas"]
+  )
+
+
+def test_recipes_without_photo(
+  fake_embeddings: DeterministicFakeEmbedding, tmp_path: Path
+) -> None:
+  """Make sure a recipe without photo goes through the pipeline on its own."""
+  # GIVEN: an export with a recipe without photo
+  export = _without_first_photo(tmp_path / "export.paprikarecipes")
+  photos = PhotoStore(tmp_path / "photos")
+
+  # WHEN: it is streamed through the pipeline one recipe per micro-batch
+  stats = pipeline.run_pipeline(export, "matrix", batch_size=1, photos=photos)
+
+  # THEN: only the other recipes' photos were stored
+  assert stats.recipes == len(parse(export))
+  assert stats.photos == stats.recipes - 1
+
+  # AND: the documents of the recipe without photo refer to none
+  written = vectorstore.connect("matrix").get(include=["metadatas"])
+  hashes = {
+    metadata["name"]: metadata["photo_hash"] for metadata in written["metadatas"]
+  }
+  assert hashes[parse(export)[0].name] == ""
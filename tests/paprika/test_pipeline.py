@@ -0,0 +1,67 @@
+"""Unit tests for the streaming ETL pipeline."""
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src import env
+from src.paprika import pipeline, vectorstore
+from src.paprika.chunker import Chunker
+from src.paprika.cleanse_and_enrich import clean_and_enrich_recipes
+from src.paprika.matrix_store import MatrixVectorStore
+from src.paprika.parser import Recipe, parse
+
+EXPORT_PATH = env.REPO_ROOT / "tests" / "fixtures" / "paprika" / "export.paprikarecipes"
+
+
+def test_pipeline_loads_same_documents_as_sequential_path(
+  fake_embeddings: DeterministicFakeEmbedding,
+) -> None:
+  """Make sure streaming micro-batches loads every document, in order."""
+  # GIVEN: the documents the sequential path would load
+  expected = vectorstore.split_chunks(
+    Chunker.make_chunks(clean_and_enrich_recipes(parse(EXPORT_PATH)))
+  )
+
+  # WHEN: the export is streamed one recipe per micro-batch
+  parsed: list[Recipe] = []
+  stats = pipeline.run_pipeline(
+    EXPORT_PATH, "matrix", batch_size=1, queue_size=1, on_parsed=parsed.append
+  )
+
+  # THEN: the same documents were written, with their embeddings
+  store = MatrixVectorStore(
+    embedding_function=fake_embeddings, persist_directory=vectorstore.MATRIX_ROOT
+  )
+  written = store.get(include=["documents", "metadatas"])
+  assert written["documents"] == [doc.page_content for doc in expected]
+  assert written["metadatas"] == [doc.metadata for doc in expected]
+  [best] = store.similarity_search(expected[0].page_content, k=1)
+  assert best.page_content == expected[0].page_content
+
+  # AND: every recipe was handed out and counted
+  assert [recipe.uid for recipe in parsed] == [
+    recipe.uid for recipe in parse(EXPORT_PATH)
+  ]
+  assert stats.recipes == len(parsed)
+  assert stats.documents == len(expected)
+  assert set(stats.busy_s) == {"parse", "clean", "chunk", "embed", "write"}
+
+
+def test_failing_stage_stops_pipeline(
+  fake_embeddings: DeterministicFakeEmbedding, monkeypatch: pytest.MonkeyPatch
+) -> None:
+  """Make sure the error of a stage is raised, instead of the pipeline hanging."""
+
+  # GIVEN: an embedding stage which fails
+  def fail(docs: list[Document]) -> list[list[float]]:
+    err_msg = "model crashed"
+    raise ValueError(err_msg)
+
+  monkeypatch.setattr(pipeline, "embed_documents", fail)
+
+  # WHEN: the pipeline runs
+  # THEN: the error of the stage is raised
+  with pytest.raises(RuntimeError, match="stage embed failed") as error:
+    pipeline.run_pipeline(EXPORT_PATH, "matrix", batch_size=1, queue_size=1)
+  assert isinstance(error.value.__cause__, ValueError)
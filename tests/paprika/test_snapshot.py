@@ -0,0 +1,56 @@
+"""Unit tests for exporting and mapping read-only vector snapshots."""
+
+from pathlib import Path
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src.paprika.matrix_store import MatrixIndex, MatrixVectorStore
+from src.paprika.snapshot import SnapshotVectorStore, export_snapshot
+
+TEXTS = [f"recipe number {i}" for i in range(300)]
+
+
+@pytest.mark.parametrize("index", ["flat", "ivf"])
+def test_snapshot_round_trip(tmp_path: Path, index: MatrixIndex) -> None:
+  """Make sure a snapshot answers queries like the store it was exported from."""
+  # GIVEN: a populated vector store
+  embeddings = DeterministicFakeEmbedding(size=64)
+  store = MatrixVectorStore.from_texts(
+    TEXTS,
+    embeddings,
+    metadatas=[{"n": i} for i in range(len(TEXTS))],
+    ids=[str(i) for i in range(len(TEXTS))],
+    persist_directory=tmp_path / "matrix",
+  )
+
+  # WHEN: we export it to a snapshot and map it
+  export_snapshot(store, tmp_path / "recipes.snapshot", index=index, dtype="int8")
+  snapshot = SnapshotVectorStore(embeddings, tmp_path / "recipes.snapshot", nprobe=4)
+
+  # THEN: every item made it into the snapshot
+  assert len(snapshot) == len(TEXTS)
+  assert snapshot.get(ids=["7"])["metadatas"] == [{"n": 7}]
+
+  # AND: queries find the same nearest documents
+  for text in TEXTS[:20]:
+    want = store.similarity_search(text, k=1)[0]
+    got = snapshot.similarity_search(text, k=1)[0]
+    assert got.page_content == want.page_content == text
+    assert got.metadata == want.metadata
+    assert got.id == want.id
+
+
+def test_snapshot_is_read_only(tmp_path: Path) -> None:
+  """Make sure snapshots refuse writes."""
+  # GIVEN: a mapped snapshot
+  embeddings = DeterministicFakeEmbedding(size=8)
+  store = MatrixVectorStore.from_texts(
+    ["a"], embeddings, persist_directory=tmp_path / "matrix"
+  )
+  export_snapshot(store, tmp_path / "recipes.snapshot")
+  snapshot = SnapshotVectorStore(embeddings, tmp_path / "recipes.snapshot")
+
+  # WHEN/THEN: writing fails
+  with pytest.raises(NotImplementedError):
+    snapshot.add_texts(["b"])
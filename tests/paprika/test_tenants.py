@@ -0,0 +1,148 @@
+"""Unit tests for the per-tenant cookbooks."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src import env
+from src.paprika import tenants, vectorstore
+from src.paprika.chunker import Chunker
+from src.paprika.cleanse_and_enrich import clean_and_enrich_recipes
+from src.paprika.matrix_store import MatrixVectorStore
+from src.paprika.parser import parse
+from src.paprika.tenants import TenantStores
+from src.paprika.vectorstore import VectorStore
+from src.tools.vector_store import TracedRetriever
+
+EXPORT_PATH = env.REPO_ROOT / "tests" / "fixtures" / "paprika" / "export.paprikarecipes"
+CAPACITY = 2
+
+
+def test_sessions_search_their_tenant(
+  fake_embeddings: DeterministicFakeEmbedding,
+  tmp_path: Path,
+  monkeypatch: pytest.MonkeyPatch,
+) -> None:
+  """Make sure each tenant gets its own store, which its sessions search."""
+  # GIVEN: two tenants whose cookbooks hold different documents
+  monkeypatch.setattr(vectorstore, "TENANTS_ROOT", tmp_path / "tenants")
+  docs = vectorstore.split_chunks(
+    Chunker.make_chunks(clean_and_enrich_recipes(parse(EXPORT_PATH)))
+  )
+  vectorstore.load_documents(docs[:1], "matrix", tenant="alice")
+  vectorstore.load_documents(docs[1:2], "matrix", tenant="bob")
+
+  # WHEN: each tenant's session searches through the shared retriever
+  stores = TenantStores(CAPACITY, "matrix")
+  retriever = TracedRetriever(vectorstore=stores, k=1)
+  found = {}
+  for tenant in ["alice", "bob"]:
+    tenants.current.set(tenant)
+    [found[tenant]] = retriever.invoke(docs[0].page_content)
+  tenants.current.set(None)
+
+  # THEN: each found its own (only) document
+  assert found["alice"].page_content == docs[0].page_content
+  assert found["bob"].page_content == docs[1].page_content
+
+  # AND: the stores live under the tenants' directories, sharing one model
+  assert vectorstore.location("matrix", "alice") == tmp_path / "tenants/alice/matrix"
+  with stores.use("alice") as alice, stores.use("bob") as bob:
+    assert alice.embeddings is bob.embeddings is fake_embeddings
+
+
+def test_idle_stores_are_evicted_least_recently_used_first(tmp_path: Path) -> None:
+  """Make sure stores are opened on first use, and only idle ones are evicted."""
+  # GIVEN: a cache of two stores
+  opened: list[Optional[str]] = []
+
+  def opener(tenant: Optional[str]) -> VectorStore:
+    opened.append(tenant)
+    return MatrixVectorStore(
+      embedding_function=DeterministicFakeEmbedding(size=8),
+      persist_directory=tmp_path / str(tenant),
+    )
+
+  stores = TenantStores(CAPACITY, opener=opener)
+
+  # WHEN: three tenants are used, the first one again in between
+  with stores.use("a"), stores.use("b"):
+    pass
+  with stores.use("a"):
+    pass
+  with stores.use("c"):
+    pass
+
+  # THEN: each store was opened once, and the least recently used one evicted
+  assert opened == ["a", "b", "c"]
+  assert "b" not in stores
+  assert len(stores) == CAPACITY
+
+  # WHEN: more tenants are used than fit, while all of them are leased
+  with stores.use("a"), stores.use("b"), stores.use("d"):
+    # THEN: none of them is evicted while in use
+    assert len(stores) == CAPACITY + 1
+
+  # AND: the cache shrinks back once they are idle
+  assert len(stores) == CAPACITY
+
+
+def test_stores_open_outside_of_the_lock(tmp_path: Path) -> None:
+  """Make sure a slow opening store holds up neither the other tenants nor
+  gets opened once per waiting session.
+  """
+  # GIVEN: a cache whose store of tenant "a" takes long to open
+  release = threading.Event()
+  opened: list[Optional[str]] = []
+
+  def opener(tenant: Optional[str]) -> VectorStore:
+    opened.append(tenant)
+    if tenant == "a":
+      release.wait(timeout=5)
+    return MatrixVectorStore(
+      embedding_function=DeterministicFakeEmbedding(size=8),
+      persist_directory=tmp_path / str(tenant),
+    )
+
+  stores = TenantStores(CAPACITY, opener=opener)
+
+  def use(tenant: str) -> VectorStore:
+    with stores.use(tenant) as store:
+      return store
+
+  # WHEN: sessions of tenant "a" wait for its store, and tenant "b" is used
+  with ThreadPoolExecutor(max_workers=4) as pool:
+    waiting = [pool.submit(use, "a") for _ in range(3)]
+    time.sleep(0.1)
+    other = pool.submit(use, "b")
+
+    # THEN: tenant "b" is served while "a" is still opening
+    other.result(timeout=2)
+    assert not release.is_set()
+    release.set()
+    got = [future.result() for future in waiting]
+
+  # AND: the store of tenant "a" was opened once, for every session
+  assert opened.count("a") == 1
+  assert all(store is got[0] for store in got)
+
+
+def test_unknown_tenant_is_refused(
+  tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+  """Make sure a tenant without a cookbook (or an invalid name) is refused."""
+  # GIVEN: no cookbook was built for any tenant
+  monkeypatch.setattr(vectorstore, "TENANTS_ROOT", tmp_path / "tenants")
+  stores = TenantStores(CAPACITY, "matrix")
+
+  # WHEN: a search is made for an unknown tenant, or a path
+  # THEN: it is refused, without creating anything
+  for tenant in ["carol", "../chroma"]:
+    with pytest.raises(ValueError, match="tenant"), stores.use(tenant):
+      pass
+  assert not (tmp_path / "tenants").exists()
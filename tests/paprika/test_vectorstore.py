@@ -0,0 +1,281 @@
+"""Unit tests for loading documents into the vector store."""
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src import env
+from src.paprika import vectorstore
+from src.paprika.chunker import Chunk, Chunker, ChunkMetadata
+from src.paprika.cleanse_and_enrich import clean_and_enrich_recipes
+from src.paprika.matrix_store import MatrixVectorStore
+from src.paprika.parser import parse
+
+EXPORT_PATH = env.REPO_ROOT / "tests" / "fixtures" / "paprika" / "export.paprikarecipes"
+BATCH_SIZE = 4
+KEEP_VERSIONS = 2
+MAX_TOKENS = 20
+OVERLAP = 4
+
+
+class _WordTokenizer:
+  """Tokenizes by words, adding two special tokens like the model's tokenizer."""
+
+  def encode(self, text: str, add_special_tokens: bool = True) -> list[str]:
+    """Splits the text into words."""
+    return ["<s>", *text.split(), "</s>"] if add_special_tokens else text.split()
+
+
+def _chunk(name: str, words: int) -> Chunk:
+  """A chunk of the given number of (distinct) words."""
+  return Chunk(
+    id=f"{name}/directions",
+    content=" ".join(f"{name}{i}" for i in range(words)),
+    metadata=ChunkMetadata(section="directions", name=name, tags="[]"),
+  )
+
+
+def _documents() -> list[Document]:
+  """The documents of the fixture export."""
+  return vectorstore.split_chunks(
+    Chunker.make_chunks(clean_and_enrich_recipes(parse(EXPORT_PATH)))
+  )
+
+
+def test_documents_have_stable_ids() -> None:
+  """Make sure documents get the same unique ids, in the same order, every run."""
+  # GIVEN: the documents made from an export
+  docs = _documents()
+
+  # WHEN: they are made again
+  again = _documents()
+
+  # THEN: ids are derived from the recipe, section and split
+  ids = [doc.id for doc in docs]
+  assert ids == [doc.id for doc in again]
+  assert len(set(ids)) == len(ids)
+  uid = parse(EXPORT_PATH)[0].uid
+  assert ids[0] == f"{uid}/name_cleaned/0"
+
+
+def test_interrupted_load_resumes(
+  fake_embeddings: DeterministicFakeEmbedding, monkeypatch: pytest.MonkeyPatch
+) -> None:
+  """Make sure a load of the same build resumes where it stopped."""
+  # GIVEN: a load which fails after its first batch
+  docs = _documents()
+  monkeypatch.setattr(vectorstore, "LOAD_BATCH_SIZE", BATCH_SIZE)
+  embedded: list[str] = []
+
+  def embed(batch: list[Document]) -> list[list[float]]:
+    if embedded and len(embedded) == BATCH_SIZE and not resumed:
+      err_msg = "interrupted"
+      raise KeyboardInterrupt(err_msg)
+    embedded.extend(doc.page_content for doc in batch)
+    return fake_embeddings.embed_documents([doc.page_content for doc in batch])
+
+  monkeypatch.setattr(vectorstore, "embed_documents", embed)
+  resumed = False
+  with pytest.raises(KeyboardInterrupt):
+    vectorstore.load_documents(docs, "matrix", build_id="build")
+
+  # WHEN: the load is run again
+  resumed = True
+  vectorstore.load_documents(docs, "matrix", build_id="build")
+
+  # THEN: only the documents which were not loaded yet were embedded
+  assert embedded == [doc.page_content for doc in docs]
+
+  # AND: every document is stored once, in order
+  store = MatrixVectorStore(
+    embedding_function=fake_embeddings, persist_directory=vectorstore.MATRIX_ROOT
+  )
+  assert store.get(include=[])["ids"] == [doc.id for doc in docs]
+
+
+def test_checkpoints_grow_with_the_store(
+  fake_embeddings: DeterministicFakeEmbedding, monkeypatch: pytest.MonkeyPatch
+) -> None:
+  """Make sure a load checkpoints the matrix ever less often, without
+  training the index until it is closed.
+  """
+  # GIVEN: a writer of the matrix backend, whose persists are recorded
+  monkeypatch.setattr(vectorstore, "LOAD_BATCH_SIZE", BATCH_SIZE)
+  persists: list[tuple[int, bool]] = []
+  persist = MatrixVectorStore.persist
+
+  def record(store: MatrixVectorStore, *, train_index: bool = True) -> None:
+    persists.append((len(store), train_index))
+    persist(store, train_index=train_index)
+
+  monkeypatch.setattr(MatrixVectorStore, "persist", record)
+  writer = vectorstore.DocumentWriter("matrix")
+
+  # WHEN: documents are written one batch at a time, then the writer closed
+  docs = [
+    Document(id=str(i), page_content=f"recipe number {i}")
+    for i in range(16 * BATCH_SIZE)
+  ]
+  for start in range(0, len(docs), BATCH_SIZE):
+    batch = docs[start : start + BATCH_SIZE]
+    writer.write(
+      batch, fake_embeddings.embed_documents([doc.page_content for doc in batch])
+    )
+  writer.close()
+
+  # THEN: the store was checkpointed each time it doubled, untrained
+  assert persists == [
+    (BATCH_SIZE, False),
+    (2 * BATCH_SIZE, False),
+    (4 * BATCH_SIZE, False),
+    (8 * BATCH_SIZE, False),
+    (16 * BATCH_SIZE, False),
+    (16 * BATCH_SIZE, True),
+  ]
+
+
+def test_other_build_starts_over(
+  fake_embeddings: DeterministicFakeEmbedding, monkeypatch: pytest.MonkeyPatch
+) -> None:
+  """Make sure a finished build, or the build of another export, is not resumed."""
+  # GIVEN: a finished build
+  docs = _documents()
+  vectorstore.load_documents(docs, "matrix", build_id="build")
+
+  # WHEN: the same build and another one are loaded
+  embedded: list[Document] = []
+
+  def embed(batch: list[Document]) -> list[list[float]]:
+    embedded.extend(batch)
+    return fake_embeddings.embed_documents([doc.page_content for doc in batch])
+
+  monkeypatch.setattr(vectorstore, "embed_documents", embed)
+  vectorstore.load_documents(docs, "matrix", build_id="build")
+  vectorstore.load_documents(docs[:1], "matrix", build_id="other")
+
+  # THEN: both started over
+  assert embedded == [*docs, docs[0]]
+  store = MatrixVectorStore(
+    embedding_function=fake_embeddings, persist_directory=vectorstore.MATRIX_ROOT
+  )
+  assert store.get(include=[])["ids"] == [docs[0].id]
+
+
+def test_split_by_tokens(monkeypatch: pytest.MonkeyPatch) -> None:
+  """Make sure only chunks over the token limit are split, with overlap."""
+  # GIVEN: a tokenizer, a short chunk and a long one (under 1024 characters)
+  monkeypatch.setattr(vectorstore, "_tokenizer", _WordTokenizer)
+  monkeypatch.setattr(vectorstore, "EMBEDDINGS_MAX_TOKENS", MAX_TOKENS)
+  monkeypatch.setattr(env, "SPLITTER_TOKEN_OVERLAP", OVERLAP)
+  short, long = _chunk("short", MAX_TOKENS // 2), _chunk("long", MAX_TOKENS * 3)
+
+  # WHEN: they are split by tokens
+  report = vectorstore.SplitReport()
+  docs = vectorstore.split_chunks([short, long], "tokens", report)
+
+  # THEN: the short chunk was left whole
+  assert docs[0].page_content == short.content
+  assert docs[0].id == f"{short.id}/0"
+
+  # AND: the long one was split into pieces under the limit, which overlap
+  pieces = [doc.page_content.split() for doc in docs[1:]]
+  assert len(pieces) > 1
+  assert all(len(piece) + 2 <= MAX_TOKENS for piece in pieces)
+  assert all(
+    first[-1] in second for first, second in zip(pieces, pieces[1:], strict=False)
+  )
+  assert [doc.id for doc in docs[1:]] == [f"{long.id}/{i}" for i in range(len(pieces))]
+
+  # AND: the long chunk is reported as truncated by character splitting
+  assert report == vectorstore.SplitReport(
+    chunks=2,
+    documents=len(docs),
+    over_limit=1,
+    truncated=0,
+    truncated_by_characters=1,
+  )
+
+
+def test_rebuild_swaps_in_new_version(
+  fake_embeddings: DeterministicFakeEmbedding, monkeypatch: pytest.MonkeyPatch
+) -> None:
+  """Make sure a rebuild never disturbs the store being served, and is swapped in
+  once complete.
+  """
+  # GIVEN: a store which is being served
+  docs = _documents()
+  vectorstore.load_documents(docs[:1], "matrix")
+  served = vectorstore.connect("matrix")
+  monkeypatch.setattr(env, "VECTOR_STORE_KEEP_VERSIONS", KEEP_VERSIONS)
+
+  # WHEN: it is rebuilt (several times), searching it in the middle of each build
+  found_during_build: list[str] = []
+
+  def embed(batch: list[Document]) -> list[list[float]]:
+    [best] = served.similarity_search(docs[0].page_content, k=1)
+    found_during_build.append(best.page_content)
+    return fake_embeddings.embed_documents([doc.page_content for doc in batch])
+
+  monkeypatch.setattr(vectorstore, "embed_documents", embed)
+  for _ in range(KEEP_VERSIONS + 1):
+    vectorstore.load_documents(docs, "matrix")
+
+  # THEN: the served store answered throughout, from the version it opened
+  assert found_during_build == [docs[0].page_content] * (KEEP_VERSIONS + 1)
+  assert len(served.get(include=[])["ids"]) == 1
+
+  # AND: new connections open the rebuilt store
+  assert vectorstore.connect("matrix").get(include=[])["ids"] == [
+    doc.id for doc in docs
+  ]
+
+  # AND: only the newest versions were kept, the live one included
+  root = vectorstore.MATRIX_ROOT
+  versions = list(root.with_name(f".{root.name}.versions").iterdir())
+  assert len(versions) == KEEP_VERSIONS
+  assert root.resolve() in versions
+
+
+def test_invalid_version_is_not_swapped_in(
+  fake_embeddings: DeterministicFakeEmbedding,
+) -> None:
+  """Make sure a build which did not write every document leaves the live store."""
+  # GIVEN: a live store
+  docs = _documents()
+  vectorstore.load_documents(docs, "matrix")
+
+  # WHEN: a build finishes without writing anything
+  writer = vectorstore.DocumentWriter("matrix")
+
+  # THEN: it is refused, and the live store is left as is
+  with pytest.raises(RuntimeError, match="invalid"):
+    writer.close()
+  assert vectorstore.connect("matrix").get(include=[])["ids"] == [
+    doc.id for doc in docs
+  ]
+
+
+def test_store_built_before_versioning_is_kept(
+  fake_embeddings: DeterministicFakeEmbedding,
+) -> None:
+  """Make sure a store built in place (before versioning) becomes a version."""
+  # GIVEN: a store built in place
+  docs = _documents()
+  legacy = MatrixVectorStore(
+    embedding_function=fake_embeddings, persist_directory=vectorstore.MATRIX_ROOT
+  )
+  legacy.add_documents(docs[:1])
+  legacy.persist()
+
+  # WHEN: it is rebuilt
+  vectorstore.load_documents(docs, "matrix")
+
+  # THEN: the store directory links to the new version, the old one is kept
+  root = vectorstore.MATRIX_ROOT
+  assert root.is_symlink()
+  versions = root.with_name(f".{root.name}.versions")
+  kept = MatrixVectorStore(
+    embedding_function=fake_embeddings,
+    persist_directory=versions / vectorstore.LEGACY_VERSION,
+  )
+  assert kept.get(include=[])["ids"] == [docs[0].id]
@@ -0,0 +1,56 @@
+"""Unit tests for offloading blocking work from the event loop."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from langchain_core.tools import tool
+
+from src import metrics
+from src.executors import EventLoopLagMonitor, io_pool, run_on
+
+BLOCKING_S = 0.2
+
+
+@run_on(io_pool)
+@tool
+def slow_tool(query: str) -> str:
+  """Blocks like a network call, returning the thread it ran on."""
+  time.sleep(BLOCKING_S)
+  return f"{query} on {threading.current_thread().name}"
+
+
+@pytest.mark.asyncio
+async def test_tools_run_on_their_pool() -> None:
+  """Make sure async tool calls run on the pool, keeping the loop free."""
+  # GIVEN: a blocking tool offloaded to the io pool
+  # WHEN: several calls run at once
+  start = time.perf_counter()
+  results = await asyncio.gather(*(slow_tool.ainvoke(str(i)) for i in range(4)))
+  elapsed = time.perf_counter() - start
+
+  # THEN: they ran on the io pool, in parallel
+  assert all(result.startswith(f"{i} on io") for i, result in enumerate(results))
+  assert elapsed < BLOCKING_S * len(results)
+
+  # AND: the tool still works synchronously
+  assert slow_tool.invoke("sync").startswith("sync on")
+
+
+@pytest.mark.asyncio
+async def test_lag_monitor_sees_blocked_loop() -> None:
+  """Make sure the monitor measures how long the loop was blocked."""
+  # GIVEN: a monitor watching the running loop
+  before = metrics.histogram("event_loop_lag_s").count
+  EventLoopLagMonitor(asyncio.get_running_loop(), interval_s=0.01).start()
+  await asyncio.sleep(0.05)
+
+  # WHEN: the loop is blocked
+  time.sleep(BLOCKING_S)
+  await asyncio.sleep(0.05)
+
+  # THEN: the lag was recorded
+  summary = metrics.histogram("event_loop_lag_s").summary()
+  assert summary["count"] > before
+  assert summary["max"] >= BLOCKING_S / 2
@@ -0,0 +1,97 @@
+"""Unit tests for the logging modes."""
+
+import logging
+from typing import Iterator
+
+import pytest
+
+from src import env, log_config
+
+MAX_CHARS = 10
+
+
+class _Payload:
+  """Payload counting how often it is formatted."""
+
+  def __init__(self) -> None:
+    self.formatted = 0
+
+  def __str__(self) -> str:
+    self.formatted += 1
+    return "x" * MAX_CHARS * 2
+
+
+class _Records(logging.Handler):
+  """Handler keeping the formatted messages."""
+
+  def __init__(self) -> None:
+    super().__init__()
+    self.messages: list[str] = []
+
+  def emit(self, record: logging.LogRecord) -> None:
+    self.messages.append(record.getMessage())
+
+
+@pytest.fixture
+def records() -> Iterator[_Records]:
+  """Writes the root logger's records to a list, restoring the configured
+  logging afterwards.
+  """
+  root = logging.getLogger()
+  handlers = root.handlers
+  handler = _Records()
+  root.handlers = [handler]
+  yield handler
+  log_config.flush()
+  root.handlers = handlers
+  log_config.configure(
+    env.LOG_MODE, env.LOG_PAYLOAD_MAX_CHARS, env.LOG_CHUNK_SAMPLE_RATE
+  )
+
+
+def test_production_mode_truncates_payloads(records: _Records) -> None:
+  """Make sure payloads are truncated in production mode, on the writer."""
+  # GIVEN: production mode logging every chunk
+  log_config.configure("production", MAX_CHARS, 1.0)
+
+  # WHEN: a chunk is logged
+  logging.getLogger(log_config.CHUNK_LOGGER).info(
+    "chunk: %s", log_config.truncated(_Payload())
+  )
+  log_config.flush()
+
+  # THEN: it was written truncated
+  assert records.messages == [f"chunk: {'x' * MAX_CHARS}... ({MAX_CHARS} more chars)"]
+
+
+def test_sampled_out_payloads_are_never_formatted(records: _Records) -> None:
+  """Make sure chunk records dropped by sampling cost no formatting."""
+  # GIVEN: production mode logging no chunks
+  log_config.configure("production", MAX_CHARS, 0.0)
+
+  # WHEN: chunks and another record are logged
+  payload = _Payload()
+  for _ in range(MAX_CHARS):
+    logging.getLogger(log_config.CHUNK_LOGGER).info(
+      "chunk: %s", log_config.truncated(payload)
+    )
+  logging.getLogger(__name__).info("not a chunk")
+  log_config.flush()
+
+  # THEN: only the other record was written, and the payload never formatted
+  assert records.messages == ["not a chunk"]
+  assert payload.formatted == 0
+
+
+def test_debug_mode_logs_full_payloads(records: _Records) -> None:
+  """Make sure debug mode keeps logging chunks in full."""
+  # GIVEN: debug mode
+  log_config.configure("debug", MAX_CHARS, 0.0)
+
+  # WHEN: a chunk is logged
+  logging.getLogger(log_config.CHUNK_LOGGER).info(
+    "%s", log_config.truncated(_Payload())
+  )
+
+  # THEN: it was written in full
+  assert records.messages == ["x" * MAX_CHARS * 2]
@@ -0,0 +1,50 @@
+"""Unit tests for per-turn latency tracing."""
+
+import json
+import logging
+
+import pytest
+
+from src import env, metrics, tracing
+
+
+def test_spans_are_noops_when_disabled(monkeypatch: pytest.MonkeyPatch) -> None:
+  """Make sure disabled tracing records nothing."""
+  # GIVEN: tracing disabled
+  monkeypatch.setattr(env, "LATENCY_TRACING", False)
+
+  # WHEN: a phase is traced
+  with tracing.span("disabled_phase"):
+    pass
+
+  # THEN: no span was recorded
+  assert "span_disabled_phase_s" not in metrics.snapshot()
+
+
+def test_spans_are_recorded_and_logged(
+  monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
+) -> None:
+  """Make sure enabled spans land in the histograms and the structured logs."""
+  # GIVEN: tracing enabled in a new turn
+  monkeypatch.setattr(env, "LATENCY_TRACING", True)
+  turn = tracing.new_turn()
+  histogram = metrics.histogram("span_enabled_phase_s")
+  count = histogram.count
+
+  # WHEN: a phase is traced, and another one fails
+  with caplog.at_level(logging.INFO, logger=tracing.__name__):
+    with tracing.span("enabled_phase", url="http://example"):
+      pass
+    with pytest.raises(KeyError), tracing.span("enabled_phase"):
+      raise KeyError
+
+  # THEN: both durations were recorded
+  assert histogram.count == count + 2
+
+  # AND: both were logged as json records of the turn
+  records = [json.loads(record.getMessage()) for record in caplog.records]
+  assert records[0]["span"] == "enabled_phase"
+  assert records[0]["turn"] == turn
+  assert records[0]["url"] == "http://example"
+  assert "error" not in records[0]
+  assert records[1]["error"] == "KeyError"